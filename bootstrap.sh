@@ -106,6 +106,9 @@ cat <<EOF > /var/www/nbgwas_rest/nbgwas.cfg
 JOB_PATH="/var/www/nbgwas_rest/tasks"
 WAIT_COUNT=600
 SLEEP_TIME=1
+PROTEIN_CODING_DIR="/var/www/nbgwas_rest/tasks/protein_coding_dir"
+PRECISION="float64"
+RESULT_CACHE_MAX_AGE=86400
 EOF
 
 mkdir -p /var/www/nbgwas_rest/tasks/submitted
@@ -115,6 +118,9 @@ mkdir -p /var/www/nbgwas_rest/tasks/delete_requests
 mkdir -p /var/www/nbgwas_rest/tasks/protein_coding_dir
 cp /var/www/html/nagadata/protein_coding/*txt /var/www/nbgwas_rest/tasks/protein_coding_dir/.
 
+# compile protein coding files so the task runner memory maps them
+naga_proteincoding.py /var/www/nbgwas_rest/tasks/protein_coding_dir
+
 chown -R apache.apache /var/www/nbgwas_rest/tasks
 
 mod_wsgi-express module-config > /etc/httpd/conf.modules.d/02-wsgi.conf
@@ -6,15 +6,22 @@ __author__ = """Chris Churas"""
 __email__ = 'churas.camera@gmail.com'
 __version__ = '0.7.1'
 
+import io
 import os
+import zlib
+import hashlib
 import shutil
 import json
 import uuid
 import time
 import flask
+import pandas as pd
 from flask import Flask, request, jsonify
 from flask_restplus import reqparse, abort, Api, Resource
 
+from nbgwas_rest import proteincoding
+from nbgwas_rest import snpio
+
 
 desc = """This system is designed to use biological networks to analyze GWAS results.
 
@@ -39,6 +46,29 @@ app.config[JOB_PATH_KEY] = '/tmp'
 app.config[WAIT_COUNT_KEY] = 60
 app.config[SLEEP_TIME_KEY] = 10
 
+# directory and suffix of protein coding files, same as
+# --protein_coding_dir and --protein_coding_suffix of
+# naga_taskrunner.py, used to reject uploaded snp level
+# summaries with chromosomes unknown to the protein coding
+# build. If PROTEIN_CODING_DIR is None chromosomes are not checked
+PROTEIN_CODING_DIR_KEY = 'PROTEIN_CODING_DIR'
+PROTEIN_CODING_SUFFIX_KEY = 'PROTEIN_CODING_SUFFIX'
+app.config[PROTEIN_CODING_DIR_KEY] = None
+app.config[PROTEIN_CODING_SUFFIX_KEY] = '.txt'
+
+# precision used by naga_taskrunner.py when a task does not set
+# one, same as --precision of naga_taskrunner.py, used in place
+# of an unset precision when looking for a result to reuse
+PRECISION_KEY = 'PRECISION'
+app.config[PRECISION_KEY] = 'float64'
+
+# max age in seconds of result that can be reused by a task
+# submitted later with the same parameters, results older than
+# this are recomputed so networks updated on NDEx under the same
+# UUID are picked up. If None results are reused regardless of age
+RESULT_CACHE_MAX_AGE_KEY = 'RESULT_CACHE_MAX_AGE'
+app.config[RESULT_CACHE_MAX_AGE_KEY] = 86400
+
 app.config.from_envvar(NBGWAS_REST_SETTINGS_ENV, silent=True)
 
 TASK_JSON = 'task.json'
@@ -108,8 +138,54 @@ SNP_LEVEL_SUMMARY_COL_LABELS = (SNP_LEVEL_SUMMARY_CHROM_COL + ',' +
                                 SNP_LEVEL_SUMMARY_BP_COL + ',' +
                                 SNP_LEVEL_SUMMARY_PVAL_COL)
 PCNET_UUID = 'f93f402c-86d4-11e7-a10d-0ac135e8bacf'
+
+# set in task to GZIP_COMPRESSION if uploaded snp level summary
+# is gzip or bgzip compressed, detected by GZIP_MAGIC bytes
+SNP_LEVEL_SUMMARY_COMPRESSION_PARAM = 'snp_level_summary_compression'
+GZIP_COMPRESSION = 'gzip'
+GZIP_MAGIC = b'\x1f\x8b'
+
+# snp level summary parsed into array bundle by create_task
+# so task runner does not have to parse the text again
+SNP_LEVEL_SUMMARY_BUNDLE = 'snp_level_summary.bundle'
+
+# number of bytes read at a time from snp level summary upload
+SNP_LEVEL_SUMMARY_BLOCK_SIZE = 1048576
+
+# sha256 of uploaded snp level summary set in task
+SNP_LEVEL_SUMMARY_SHA256_PARAM = 'snp_level_summary_sha256'
+
+# tasks with the same RESULT_CACHE_KEY_PARAM, a hash of the snp level
+# summary and RESULT_CACHE_PARAMS, have the same result. Files
+# named by key in RESULT_CACHE_DIR under JOB_PATH store ip address
+# and uuid of last task submitted with that key. If that task
+# completed without error, with the same precision, within
+# RESULT_CACHE_MAX_AGE seconds its result is copied to new tasks with
+# the key which are then put straight into done directory
+# with RESULT_SOURCE_PARAM set to uuid of the original task
+RESULT_CACHE_DIR = 'result_cache'
+RESULT_CACHE_KEY_PARAM = 'resultcachekey'
+RESULT_SOURCE_PARAM = 'resultsource'
 PROTEIN_CODING_PARAM = 'protein_coding'
 
+# diffusion solver parameters
+SOLVER_PARAM = 'solver'
+TOLERANCE_PARAM = 'tolerance'
+MAX_ITERATIONS_PARAM = 'maxiterations'
+RANK_PARAM = 'rank'
+
+RANDOM_WALK_SOLVER = 'random_walk'
+POWER_SOLVER = 'power'
+KRYLOV_SOLVER = 'krylov'
+LOWRANK_SOLVER = 'lowrank'
+SOLVERS = [RANDOM_WALK_SOLVER, POWER_SOLVER, KRYLOV_SOLVER, LOWRANK_SOLVER]
+
+# numeric precision of heat and diffusion
+PRECISION_PARAM = 'precision'
+FLOAT64_PRECISION = 'float64'
+FLOAT32_PRECISION = 'float32'
+PRECISIONS = [FLOAT64_PRECISION, FLOAT32_PRECISION]
+
 SNP_ANALYZER_TASK = 'snpanalyzer'
 
 FINALHEAT_RESULT = 'finalheat'
@@ -119,8 +195,29 @@ DIFF_BIN_RESULT = 'diffusedbinarized'
 
 RESULTKEY_KEY = 'resultkey'
 RESULTVALUE_KEY = 'resultvalue'
+
+# key in result denoting convergence statistics of diffusion
+# set only when solver is not RANDOM_WALK_SOLVER
+DIFFUSION_STATS_KEY = 'diffusionstats'
+
+# parameters that, along with snp level summary, determine result
+RESULT_CACHE_PARAMS = [NDEX_PARAM, PROTEIN_CODING_PARAM, WINDOW_PARAM,
+                       ALPHA_PARAM, SNP_LEVEL_SUMMARY_COL_LABEL_PARAM,
+                       SOLVER_PARAM, TOLERANCE_PARAM, MAX_ITERATIONS_PARAM,
+                       RANK_PARAM, PRECISION_PARAM]
 uuid_counter = 1
 
+# protein coding file path => tuple (modification time in nanoseconds,
+# size, set of chromosomes in file)
+protein_coding_chromosomes = {}
+
+
+class InvalidSnpLevelSummaryError(Exception):
+    """
+    Raised when uploaded snp level summary cannot be parsed
+    """
+    pass
+
 
 def get_uuid():
     """
@@ -165,6 +262,303 @@ def get_delete_request_dir():
     return os.path.join(app.config[JOB_PATH_KEY], DELETE_REQUESTS)
 
 
+def get_snp_level_summary_column_labels(labels):
+    """
+    Parses comma delimited snp level summary column labels
+    parameter falling back to default label for any that are missing
+    :param labels: comma delimited str of chromosome, basepair, and
+                   pvalue column labels or None
+    :return: list of chromosome, basepair, and pvalue column labels
+    """
+    res = [SNP_LEVEL_SUMMARY_CHROM_COL, SNP_LEVEL_SUMMARY_BP_COL,
+           SNP_LEVEL_SUMMARY_PVAL_COL]
+    if labels is None:
+        return res
+    for index, label in enumerate(labels.split(',')[:len(res)]):
+        res[index] = label
+    return res
+
+
+def _read_protein_coding_chromosomes(pc_file):
+    """
+    Reads chromosomes of protein coding file
+    :param pc_file: path to compiled or text protein coding file
+    :return: set of chromosomes as str
+    """
+    if pc_file.endswith(proteincoding.COMPILED_SUFFIX):
+        table = proteincoding.ProteinCodingTable.load(pc_file)
+        return set(table.get_chromosomes())
+    pc_table = pd.read_csv(pc_file, sep=r'\s+',
+                           names=['Chrom', 'Start', 'End'],
+                           index_col=0, dtype={'Chrom': str})
+    return set(pc_table['Chrom'])
+
+
+def _get_cached_protein_coding_chromosomes(pc_file):
+    """
+    Gets chromosomes of protein coding file from
+    protein_coding_chromosomes, reading the file again if its
+    modification time or size changed since it was cached
+    :param pc_file: path to compiled or text protein coding file
+    :return: set of chromosomes as str
+    """
+    stat = os.stat(pc_file)
+    cached = protein_coding_chromosomes.get(pc_file)
+    if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+        cached = (stat.st_mtime_ns, stat.st_size,
+                  _read_protein_coding_chromosomes(pc_file))
+        protein_coding_chromosomes[pc_file] = cached
+    return cached[2]
+
+
+def get_protein_coding_chromosomes(protein_coding):
+    """
+    Gets chromosomes of protein coding build from file in
+    PROTEIN_CODING_DIR, caching them until the file is replaced. A
+    compiled file for the build is used if one exists
+    :param protein_coding: name of protein coding build ie hg19
+    :return: set of chromosomes as str or None if
+             PROTEIN_CODING_DIR is not set or has no file
+             for protein_coding
+    """
+    pc_dir = app.config.get(PROTEIN_CODING_DIR_KEY)
+    if pc_dir is None or protein_coding is None:
+        return None
+    pc_file = os.path.join(pc_dir, str(protein_coding) +
+                           proteincoding.COMPILED_SUFFIX)
+    if os.path.isfile(pc_file):
+        return _get_cached_protein_coding_chromosomes(pc_file)
+
+    pc_file = os.path.join(pc_dir, str(protein_coding))
+    if app.config.get(PROTEIN_CODING_SUFFIX_KEY) is not None:
+        pc_file += str(app.config[PROTEIN_CODING_SUFFIX_KEY])
+    if not os.path.isfile(pc_file):
+        app.logger.warning('Protein coding file ' + pc_file +
+                           ' not found, skipping chromosome check')
+        return None
+    return _get_cached_protein_coding_chromosomes(pc_file)
+
+
+def save_snp_level_summary(taskpath, params):
+    """
+    Saves snp level summary upload to SNP_LEVEL_SUMMARY_PARAM file
+    in taskpath while parsing it, in the same pass, into
+    SNP_LEVEL_SUMMARY_BUNDLE file. Gzip and bgzip compressed uploads
+    are saved as is and decompressed while parsing
+    :param taskpath: path to task
+    :param params: task parameters
+    :raises InvalidSnpLevelSummaryError: if upload is missing a column
+            from the column labels, has values that are missing or
+            cannot be converted, has chromosomes not in protein coding
+            build, or has no SNPs
+    :return: tuple (GZIP_COMPRESSION if upload is compressed otherwise
+             None, sha256 hex digest of upload)
+    """
+    labels = get_snp_level_summary_column_labels(
+        params.get(SNP_LEVEL_SUMMARY_COL_LABEL_PARAM))
+    chromosomes = get_protein_coding_chromosomes(
+        params.get(PROTEIN_CODING_PARAM))
+    snpfile = os.path.join(taskpath, SNP_LEVEL_SUMMARY_PARAM)
+    bundlefile = os.path.join(taskpath, SNP_LEVEL_SUMMARY_BUNDLE)
+    sha256 = hashlib.sha256()
+    with open(snpfile, 'wb') as f:
+        tee = snpio.TeeReader(params[SNP_LEVEL_SUMMARY_PARAM].stream, f,
+                              hashobj=sha256)
+        stream = io.BufferedReader(tee,
+                                   buffer_size=SNP_LEVEL_SUMMARY_BLOCK_SIZE)
+        compression = None
+        if snpio.is_gzip_stream(stream):
+            compression = GZIP_COMPRESSION
+        try:
+            with snpio.open_snp_level_summary_stream(stream) as snps:
+                numsnps = snpio.\
+                    write_snp_level_summary_bundle(snps, bundlefile,
+                                                   labels[0], labels[1],
+                                                   labels[2],
+                                                   chromosomes=chromosomes)
+        except (ValueError, EOFError, zlib.error) as e:
+            raise InvalidSnpLevelSummaryError(str(e))
+        except OSError as e:
+            # corrupt gzip data raises OSError without an errno
+            if e.errno is not None:
+                raise
+            raise InvalidSnpLevelSummaryError(str(e))
+
+        if numsnps == 0:
+            raise InvalidSnpLevelSummaryError('No SNPs found')
+
+        # save anything after the data parsed, such as trailing
+        # empty gzip members
+        while len(stream.read(SNP_LEVEL_SUMMARY_BLOCK_SIZE)) > 0:
+            pass
+        f.flush()
+    os.chmod(snpfile, mode=0o775)
+    os.chmod(bundlefile, mode=0o775)
+    app.logger.debug(snpfile + ' saved and it is ' +
+                     str(os.path.getsize(snpfile)) + ' bytes with ' +
+                     str(numsnps) + ' snps')
+    return compression, sha256.hexdigest()
+
+
+def get_precision(params):
+    """
+    Gets precision the task runner uses for task
+    :param params: task parameters
+    :return: PRECISION_PARAM value of params or, if unset,
+             PRECISION value of app config
+    """
+    precision = params.get(PRECISION_PARAM)
+    if precision is None:
+        return app.config[PRECISION_KEY]
+    return precision
+
+
+def get_result_cache_key(params):
+    """
+    Gets key identifying result of task from sha256 of snp level
+    summary and normalized values of RESULT_CACHE_PARAMS
+    :param params: task parameters
+    :return: sha256 hex digest as str
+    """
+    keydict = {}
+    for key in RESULT_CACHE_PARAMS:
+        keydict[key] = params.get(key)
+    keydict[SNP_LEVEL_SUMMARY_COL_LABEL_PARAM] = \
+        get_snp_level_summary_column_labels(
+            params.get(SNP_LEVEL_SUMMARY_COL_LABEL_PARAM))
+    for key in [ALPHA_PARAM, TOLERANCE_PARAM]:
+        if keydict[key] is not None:
+            keydict[key] = float(keydict[key])
+    for key in [WINDOW_PARAM, MAX_ITERATIONS_PARAM, RANK_PARAM]:
+        if keydict[key] is not None:
+            keydict[key] = int(keydict[key])
+    keydict[PRECISION_PARAM] = get_precision(params)
+    keydict[SNP_LEVEL_SUMMARY_SHA256_PARAM] = \
+        params[SNP_LEVEL_SUMMARY_SHA256_PARAM]
+    keystr = json.dumps(keydict, sort_keys=True)
+    return hashlib.sha256(keystr.encode('utf-8')).hexdigest()
+
+
+def get_result_cache_dir():
+    """
+    Gets directory where result cache entries are stored
+    :return:
+    """
+    return os.path.join(app.config[JOB_PATH_KEY], RESULT_CACHE_DIR)
+
+
+def get_cached_result_task(cachekey, precision=None):
+    """
+    Gets task in done directory that completed without error,
+    no more than RESULT_CACHE_MAX_AGE seconds ago, and whose
+    result is cached under cachekey
+    :param cachekey: key from :py:func:`get_result_cache_key`
+    :param precision: if set, precision the task runner must have
+                      recorded for the task
+    :return: tuple (path to task, task parameters) or None
+    """
+    entryfile = os.path.join(get_result_cache_dir(), cachekey)
+    if not os.path.isfile(entryfile):
+        return None
+    try:
+        with open(entryfile, 'r') as f:
+            entry = json.load(f)
+        taskpath = os.path.join(get_done_dir(), str(entry[REMOTEIP_PARAM]),
+                                str(entry[UUID_PARAM]))
+        resultfile = os.path.join(taskpath, RESULT)
+        if not os.path.isfile(resultfile):
+            return None
+        age = time.time() - os.path.getmtime(resultfile)
+        with open(os.path.join(taskpath, TASK_JSON), 'r') as f:
+            taskparams = json.load(f)
+    except (OSError, ValueError, KeyError) as e:
+        app.logger.warning('Unable to read result cache entry ' +
+                           entryfile + ' : ' + str(e))
+        return None
+    if taskparams.get(ERROR_PARAM) is not None:
+        return None
+    if taskparams.get(RESULT_CACHE_KEY_PARAM) != cachekey:
+        return None
+    if precision is not None and \
+            taskparams.get(PRECISION_PARAM) != precision:
+        app.logger.info('Not reusing result of ' + taskpath + ' computed '
+                        'with precision ' +
+                        str(taskparams.get(PRECISION_PARAM)))
+        return None
+    maxage = app.config[RESULT_CACHE_MAX_AGE_KEY]
+    if maxage is not None and age > maxage:
+        app.logger.info('Not reusing result of ' + taskpath + ' which is ' +
+                        str(int(age)) + ' seconds old')
+        return None
+    return taskpath, taskparams
+
+
+def save_result_cache_entry(params):
+    """
+    Records task as the one whose result should be reused by
+    tasks submitted later with the same result cache key
+    :param params: task parameters
+    :return: None
+    """
+    cachedir = get_result_cache_dir()
+    if not os.path.isdir(cachedir):
+        os.makedirs(cachedir, mode=0o775, exist_ok=True)
+    entryfile = os.path.join(cachedir, params[RESULT_CACHE_KEY_PARAM])
+    tmpfile = entryfile + '.' + str(params[UUID_PARAM]) + '.tmp'
+    with open(tmpfile, 'w') as f:
+        json.dump({REMOTEIP_PARAM: params[REMOTEIP_PARAM],
+                   UUID_PARAM: params[UUID_PARAM]}, f)
+    os.replace(tmpfile, entryfile)
+
+
+def reuse_cached_result(taskpath, params):
+    """
+    If a task with the same result cache key has completed, copies
+    its result into taskpath and moves the task to done directory
+    so it is never seen by the task runner
+    :param taskpath: path to task in submit directory
+    :param params: task parameters
+    :return: True if cached result was reused otherwise False
+    """
+    cached = get_cached_result_task(params[RESULT_CACHE_KEY_PARAM],
+                                    precision=get_precision(params))
+    if cached is None:
+        return False
+    cachedpath, cachedparams = cached
+    try:
+        shutil.copyfile(os.path.join(cachedpath, RESULT),
+                        os.path.join(taskpath, RESULT))
+    except OSError as e:
+        app.logger.warning('Unable to copy result of ' + cachedpath +
+                           ' : ' + str(e))
+        return False
+    app.logger.info('Reusing result of ' + cachedpath)
+
+    # values set by task runner
+    for key in [NAGA_VERSION, PRECISION_PARAM]:
+        if key in cachedparams:
+            params[key] = cachedparams[key]
+    params[RESULT_SOURCE_PARAM] = cachedparams[UUID_PARAM]
+
+    for entry in [SNP_LEVEL_SUMMARY_PARAM, SNP_LEVEL_SUMMARY_BUNDLE]:
+        os.unlink(os.path.join(taskpath, entry))
+
+    # task.json is put in place only after task is in done directory
+    tmp_task_json = os.path.join(taskpath, TASK_JSON + '.tmp')
+    with open(tmp_task_json, 'w') as f:
+        json.dump(params, f)
+        f.flush()
+    os.chmod(tmp_task_json, mode=0o775)
+
+    donepath = os.path.join(get_done_dir(), str(params[REMOTEIP_PARAM]),
+                            str(params[UUID_PARAM]))
+    os.makedirs(os.path.dirname(donepath), mode=0o775, exist_ok=True)
+    shutil.move(taskpath, donepath)
+    shutil.move(os.path.join(donepath, TASK_JSON + '.tmp'),
+                os.path.join(donepath, TASK_JSON))
+    return True
+
+
 def create_task(params):
     """
     Creates a task by consuming data from request_obj passed in
@@ -192,24 +586,40 @@ def create_task(params):
 
     app.logger.debug('snp level summary: ' +
                      str(params[SNP_LEVEL_SUMMARY_PARAM]))
-    networkfile_path = os.path.join(taskpath, SNP_LEVEL_SUMMARY_PARAM)
-    with open(networkfile_path, 'wb') as f:
-        shutil.copyfileobj(params[SNP_LEVEL_SUMMARY_PARAM].stream, f)
-        f.flush()
-    os.chmod(networkfile_path, mode=0o775)
+    try:
+        compression, sha256 = save_snp_level_summary(taskpath, params)
+    except InvalidSnpLevelSummaryError:
+        shutil.rmtree(taskpath, ignore_errors=True)
+        raise
     params[SNP_LEVEL_SUMMARY_PARAM] = SNP_LEVEL_SUMMARY_PARAM
-    app.logger.debug(networkfile_path + ' saved and it is ' +
-                     str(os.path.getsize(networkfile_path)) + ' bytes')
+    params[SNP_LEVEL_SUMMARY_COMPRESSION_PARAM] = compression
+    params[SNP_LEVEL_SUMMARY_SHA256_PARAM] = sha256
 
     if NDEX_PARAM not in params or params[NDEX_PARAM] is None:
         raise Exception(NDEX_PARAM + ' is required')
 
+    if params.get(TOLERANCE_PARAM) is not None and \
+            params[TOLERANCE_PARAM] <= 0:
+        raise Exception(TOLERANCE_PARAM + ' must be greater than 0')
+
+    if params.get(MAX_ITERATIONS_PARAM) is not None and \
+            params[MAX_ITERATIONS_PARAM] <= 0:
+        raise Exception(MAX_ITERATIONS_PARAM + ' must be greater than 0')
+
+    if params.get(RANK_PARAM) is not None and \
+            params[RANK_PARAM] <= 0:
+        raise Exception(RANK_PARAM + ' must be greater than 0')
+
     app.logger.debug("Validating ndex id")
     params[NDEX_PARAM] = str(params[NDEX_PARAM]).strip()
     if len(params[NDEX_PARAM]) > 40:
         raise Exception(NDEX_PARAM + ' parameter value is too long to '
                                      'be an NDex UUID')
 
+    params[RESULT_CACHE_KEY_PARAM] = get_result_cache_key(params)
+    if reuse_cached_result(taskpath, params):
+        return params['uuid']
+
     tmp_task_json = TASK_JSON + '.tmp'
     taskfilename = os.path.join(taskpath, tmp_task_json)
     with open(taskfilename, 'w') as f:
@@ -217,6 +627,7 @@ def create_task(params):
         f.flush()
     os.chmod(taskfilename, mode=0o775)
     shutil.move(taskfilename, os.path.join(taskpath, TASK_JSON))
+    save_result_cache_entry(params)
     return params['uuid']
 
 
@@ -333,7 +744,8 @@ post_parser.add_argument(SNP_LEVEL_SUMMARY_PARAM, type=reqparse.FileStorage,
                               'location, and p value for each SNP. These '
                               'columns need to have same names as set with '
                               '**' + SNP_LEVEL_SUMMARY_COL_LABEL_PARAM +
-                              '** parameter',
+                              '** parameter. The file can be gzip or '
+                              'bgzip compressed',
                          location='files')
 post_parser.add_argument(ALPHA_PARAM, type=float,
                          help='Sets propagation constant alpha with allowed '
@@ -351,6 +763,56 @@ post_parser.add_argument(WINDOW_PARAM, type=int, default=10000,
                               'search',
                          location='form')
 
+post_parser.add_argument(SOLVER_PARAM, choices=SOLVERS,
+                         default=RANDOM_WALK_SOLVER,
+                         help='Sets how diffusion is solved. `' +
+                              RANDOM_WALK_SOLVER + '` iterates random walk '
+                              'with restart as done by nbgwas. `' +
+                              POWER_SOLVER + '` runs power iteration and `' +
+                              KRYLOV_SOLVER + '` runs the BiCGSTAB Krylov '
+                              'solver, both of which keep heat as dense '
+                              'vectors and the network as a sparse matrix '
+                              'making them suited to large networks. `' +
+                              LOWRANK_SOLVER + '` approximates diffusion '
+                              'from a truncated eigendecomposition of the '
+                              'network, see `' + RANK_PARAM + '`, trading '
+                              'a small error for speed on very large '
+                              'networks. For all but `' +
+                              RANDOM_WALK_SOLVER + '`, convergence or '
+                              'approximation statistics are added to '
+                              'the result',
+                         location='form')
+post_parser.add_argument(TOLERANCE_PARAM, type=float,
+                         help='Relative tolerance at which `' +
+                              POWER_SOLVER + '` and `' + KRYLOV_SOLVER +
+                              '` solvers stop. Larger values trade accuracy '
+                              'for speed. For `' + LOWRANK_SOLVER + '` '
+                              'columns with a relative residual at or below '
+                              'this value are reported as converged. '
+                              'If unset, `1e-6` is used',
+                         location='form')
+post_parser.add_argument(MAX_ITERATIONS_PARAM, type=int,
+                         help='Maximum iterations `' + POWER_SOLVER +
+                              '` and `' + KRYLOV_SOLVER + '` solvers run '
+                              'before stopping. If unset, `1000` is used',
+                         location='form')
+post_parser.add_argument(PRECISION_PARAM, choices=PRECISIONS,
+                         help='Numeric precision of heat and diffusion. `' +
+                              FLOAT32_PRECISION + '` halves memory used '
+                              'and speeds up diffusion at the cost of '
+                              'accuracy beyond about 6 significant '
+                              'digits. If unset, the default of the task '
+                              'runner, normally `' + FLOAT64_PRECISION +
+                              '`, is used and recorded in the task',
+                         location='form')
+post_parser.add_argument(RANK_PARAM, type=int,
+                         help='Number of eigenvectors of the network used '
+                              'by `' + LOWRANK_SOLVER + '` solver. Larger '
+                              'values reduce the approximation error at '
+                              'the cost of speed and memory. '
+                              'If unset, `100` is used',
+                         location='form')
+
 post_parser.add_argument(SNP_LEVEL_SUMMARY_COL_LABEL_PARAM, type=str,
                          trim=True,
                          help='Comma delimited list that specifies the column '
@@ -370,6 +832,7 @@ class TaskBasedRestApp(Resource):
                       'Visit the URL'
                       ' specified in **Location** field in HEADERS to '
                       'status and results',
+                 400: 'Invalid ' + SNP_LEVEL_SUMMARY_PARAM + ' file',
                  500: 'Internal server error'
              })
     @api.header(LOCATION, 'URL endpoint to poll for result of task for '
@@ -392,6 +855,10 @@ class TaskBasedRestApp(Resource):
             resp.headers[LOCATION] = SNP_ANALYZER_NS + '/' + res
             resp.status_code = 202
             return resp
+        except InvalidSnpLevelSummaryError as ei:
+            app.logger.info('Rejecting invalid ' + SNP_LEVEL_SUMMARY_PARAM +
+                            ' : ' + str(ei))
+            abort(400, 'Invalid ' + SNP_LEVEL_SUMMARY_PARAM + ': ' + str(ei))
         except OSError as e:
             app.logger.exception('Error creating task due to OSError' + str(e))
             abort(500, 'Unable to create task ' + str(e))
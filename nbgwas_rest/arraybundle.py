@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+"""Reads and writes array bundle files
+
+An array bundle is a single binary file holding a set of named
+numpy arrays plus a dictionary of metadata. The file is laid out
+so the whole thing can be loaded with one memory map:
+
+  * 8 byte magic value ``NAGAARR1``
+  * 8 byte little endian unsigned integer denoting header length
+  * JSON header with metadata and dtype, shape, and offset of each array
+  * raw array data, each array starting on a 64 byte boundary
+"""
+
+import os
+import json
+import struct
+
+import numpy as np
+
+
+MAGIC = b'NAGAARR1'
+ALIGNMENT = 64
+
+METADATA_KEY = 'metadata'
+ARRAYS_KEY = 'arrays'
+DTYPE_KEY = 'dtype'
+SHAPE_KEY = 'shape'
+OFFSET_KEY = 'offset'
+
+TMP_SUFFIX = '.tmp'
+
+
+def _align(offset):
+    """
+    Rounds offset up to next multiple of ALIGNMENT
+    :param offset:
+    :return:
+    """
+    return ((offset + ALIGNMENT - 1) // ALIGNMENT) * ALIGNMENT
+
+
+def _json_default(obj):
+    """
+    Converts numpy scalars, which :py:func:`json.dumps` cannot
+    serialize, in metadata to python values
+    :param obj: object json could not serialize
+    :raises TypeError: if obj is not a numpy scalar
+    :return: python int, float, bool, or str
+    """
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError('Object of type ' + type(obj).__name__ +
+                    ' is not JSON serializable')
+
+
+def write_array_bundle(path, arrays, metadata=None):
+    """
+    Writes arrays to path as an array bundle. Data is first
+    written to a temporary file which is then renamed to path
+    so readers never see a partially written file.
+    :param path: path to write to
+    :param arrays: dict of name => numpy array
+    :param metadata: dict of json serializable values, numpy scalars
+                     are stored as python values, or None
+    :return: None
+    """
+    contiguous = {}
+    arrayinfo = {}
+    for name, arr in arrays.items():
+        carr = np.ascontiguousarray(arr)
+        if carr.dtype.hasobject:
+            raise ValueError('Array ' + name + ' has object dtype which '
+                                               'cannot be stored')
+        contiguous[name] = carr
+        arrayinfo[name] = {DTYPE_KEY: carr.dtype.str,
+                           SHAPE_KEY: list(carr.shape)}
+
+    # offsets are relative to start of data so they do not
+    # depend on the size of the header
+    offset = 0
+    for name in sorted(contiguous.keys()):
+        arrayinfo[name][OFFSET_KEY] = offset
+        offset = _align(offset + contiguous[name].nbytes)
+
+    header = json.dumps({METADATA_KEY: metadata,
+                         ARRAYS_KEY: arrayinfo},
+                        default=_json_default).encode('utf-8')
+    datastart = _align(len(MAGIC) + 8 + len(header))
+
+    tmpfile = path + TMP_SUFFIX
+    with open(tmpfile, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for name in sorted(contiguous.keys()):
+            f.seek(datastart + arrayinfo[name][OFFSET_KEY])
+            f.write(contiguous[name].tobytes())
+        f.truncate(datastart + offset)
+        f.flush()
+    os.rename(tmpfile, path)
+
+
+def read_array_bundle(path, mmap=True):
+    """
+    Reads array bundle written by :py:func:`write_array_bundle`
+    :param path: path to array bundle file
+    :param mmap: If True the file is memory mapped read only and
+                 returned arrays are views into the map otherwise the
+                 file is read into memory
+    :raises ValueError: if file is not an array bundle
+    :return: tuple (dict of name => numpy array, metadata dict)
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(path + ' is not an array bundle file')
+        headerlen = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(headerlen).decode('utf-8'))
+
+    if mmap is True and os.path.getsize(path) > 0:
+        raw = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        raw = np.fromfile(path, dtype=np.uint8)
+
+    datastart = _align(len(MAGIC) + 8 + headerlen)
+    arrays = {}
+    for name, info in header[ARRAYS_KEY].items():
+        dtype = np.dtype(info[DTYPE_KEY])
+        shape = tuple(info[SHAPE_KEY])
+        start = datastart + info[OFFSET_KEY]
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        arrays[name] = raw[start:start + nbytes].view(dtype).reshape(shape)
+    return arrays, header[METADATA_KEY]
+
+
+def encode_string_pool(strings):
+    """
+    Encodes strings as a single utf-8 byte array and an offsets
+    array where string i is data[offsets[i]:offsets[i + 1]]
+    :param strings: list of str
+    :return: tuple (uint8 numpy array, int64 numpy array)
+    """
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if len(encoded) > 0:
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return data, offsets
+
+
+def decode_string_pool(data, offsets):
+    """
+    Decodes strings encoded by :py:func:`encode_string_pool`
+    :param data: uint8 numpy array
+    :param offsets: int64 numpy array
+    :return: list of str
+    """
+    blob = data.tobytes()
+    bounds = offsets.tolist()
+    return [blob[bounds[i]:bounds[i + 1]].decode('utf-8')
+            for i in range(len(bounds) - 1)]
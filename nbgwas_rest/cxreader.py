@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""Streaming reader of network structure from CX documents
+
+Parses CX with an event based JSON parser so only node ids,
+node names, and edge endpoints are kept in memory. All other
+aspects and attributes are skipped as they are read. Node ids
+and edge endpoints are accumulated in compact integer arrays
+instead of Python objects.
+"""
+
+from array import array
+
+import ijson
+import numpy as np
+
+
+NODES_PREFIX = 'item.nodes.item'
+EDGES_PREFIX = 'item.edges.item'
+
+NODE_ID = NODES_PREFIX + '.@id'
+NODE_NAME = NODES_PREFIX + '.n'
+EDGE_SOURCE = EDGES_PREFIX + '.s'
+EDGE_TARGET = EDGES_PREFIX + '.t'
+
+
+class CXNetworkStructure(object):
+    """
+    Node names and edges read from a CX document. Nodes are
+    identified by their position in names and nodes sharing a
+    name are merged into one node.
+    """
+
+    def __init__(self, names, sources, targets):
+        """
+        Constructor
+        :param names: list of unique node names
+        :param sources: int64 numpy array of indices into names
+        :param targets: int64 numpy array of indices into names
+        """
+        self.names = names
+        self.sources = sources
+        self.targets = targets
+
+
+def read_cx_network(cxfile):
+    """
+    Reads node names and edges from CX document in a single pass.
+    Nodes lacking a name are named by their CX id.
+    :param cxfile: path to CX file or file like object opened
+                   in binary mode
+    :raises ValueError: if an edge refers to a node not in the document
+    :return: :py:class:`CXNetworkStructure`
+    """
+    if isinstance(cxfile, str):
+        with open(cxfile, 'rb') as f:
+            return read_cx_network(f)
+
+    name_index = {}
+    node_ids = array('q')
+    node_names = array('q')
+    sources = array('q')
+    targets = array('q')
+
+    cur_id = None
+    cur_name = None
+    for prefix, event, value in ijson.parse(cxfile):
+        if prefix == NODE_ID:
+            cur_id = int(value)
+        elif prefix == NODE_NAME:
+            cur_name = value
+        elif prefix == EDGE_SOURCE:
+            sources.append(int(value))
+        elif prefix == EDGE_TARGET:
+            targets.append(int(value))
+        elif prefix == NODES_PREFIX and event == 'end_map':
+            if cur_name is None:
+                cur_name = cur_id
+            name = str(cur_name)
+            idx = name_index.get(name)
+            if idx is None:
+                idx = len(name_index)
+                name_index[name] = idx
+            node_ids.append(cur_id)
+            node_names.append(idx)
+            cur_id = None
+            cur_name = None
+
+    if len(sources) != len(targets):
+        raise ValueError('Found edges without a source or target')
+
+    ids = np.frombuffer(node_ids, dtype=np.int64)
+    order = np.argsort(ids, kind='mergesort')
+    sorted_ids = ids[order]
+    sorted_names = np.frombuffer(node_names, dtype=np.int64)[order]
+    return CXNetworkStructure(list(name_index.keys()),
+                              _map_node_ids(sorted_ids, sorted_names,
+                                            sources),
+                              _map_node_ids(sorted_ids, sorted_names,
+                                            targets))
+
+
+def _map_node_ids(sorted_ids, sorted_names, edge_ids):
+    """
+    Maps CX node ids referenced by edges to node name indices
+    :param sorted_ids: sorted int64 numpy array of CX node ids
+    :param sorted_names: name index of each node in sorted_ids
+    :param edge_ids: array of CX node ids
+    :raises ValueError: if an id is not in sorted_ids
+    :return: int64 numpy array of name indices
+    """
+    edge_ids = np.frombuffer(edge_ids, dtype=np.int64)
+    if len(edge_ids) == 0:
+        return np.zeros(0, dtype=np.int64)
+    pos = np.searchsorted(sorted_ids, edge_ids)
+    pos[pos >= len(sorted_ids)] = 0
+    if len(sorted_ids) == 0 or \
+            not np.array_equal(sorted_ids[pos], edge_ids):
+        raise ValueError('Found edges referring to nodes not in network')
+    return sorted_names[pos]
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+
+import os
+import sys
+import argparse
+import logging
+
+import nbgwas_rest
+from nbgwas_rest import proteincoding
+from nbgwas_rest.proteincoding import ProteinCodingTable
+
+
+logger = logging.getLogger('nagaproteincoding')
+
+LOG_FORMAT = "%(asctime)-15s %(levelname)s %(relativeCreated)dms " \
+             "%(filename)s::%(funcName)s():%(lineno)d %(message)s"
+
+# suffix of gzip compressed protein coding files
+GZIP_SUFFIX = '.gz'
+
+# metadata key holding name of file a table was compiled from
+SOURCE_KEY = 'source'
+
+
+def _parse_arguments(desc, args):
+    """Parses command line arguments"""
+    help_formatter = argparse.RawDescriptionHelpFormatter
+    parser = argparse.ArgumentParser(description=desc,
+                                     formatter_class=help_formatter)
+    parser.add_argument('protein_coding_dir',
+                        help='Directory where protein_coding data files '
+                             'reside, such as nagadata/protein_coding')
+    parser.add_argument('--protein_coding_suffix', default='.txt',
+                        help='Suffix of protein_coding files in '
+                             'protein_coding_dir directory. Files with '
+                             'this suffix followed by .gz are also '
+                             'compiled. (default .txt)')
+    parser.add_argument('--outdir', default=None,
+                        help='Directory to write compiled files to, '
+                             'if unset protein_coding_dir is used')
+    parser.add_argument('--version', action='version',
+                        version=('%(prog)s ' + nbgwas_rest.__version__))
+    parser.add_argument('--verbose', '-v', action='count',
+                        help='Increases logging verbosity, max is 4',
+                        default=1)
+    return parser.parse_args(args)
+
+
+def _setuplogging(theargs):
+    """Sets up logging"""
+    level = (50 - (10 * theargs.verbose))
+    logging.basicConfig(format=LOG_FORMAT,
+                        level=level)
+    logger.setLevel(level)
+
+
+def get_protein_coding_builds(protein_coding_dir, suffix):
+    """
+    Finds protein coding files in directory
+    :param protein_coding_dir: directory to look in
+    :param suffix: suffix of protein coding files, files ending
+                   with suffix plus GZIP_SUFFIX are also found
+    :return: dict of build name => path to file, uncompressed file
+             preferred if a build has both
+    """
+    builds = {}
+    for entry in sorted(os.listdir(protein_coding_dir)):
+        path = os.path.join(protein_coding_dir, entry)
+        if not os.path.isfile(path):
+            continue
+        if entry.endswith(suffix):
+            builds[entry[:-len(suffix)]] = path
+        elif entry.endswith(suffix + GZIP_SUFFIX):
+            build = entry[:-len(suffix + GZIP_SUFFIX)]
+            if build not in builds:
+                builds[build] = path
+    return builds
+
+
+def compile_protein_coding_file(path, outfile):
+    """
+    Parses protein coding file and saves it, without duplicate
+    rows and sorted by chromosome then start, as a compiled
+    protein coding file
+    :param path: path to protein coding file
+    :param outfile: path to write compiled file to
+    :return: tuple (number of rows read, number of rows written)
+    """
+    table = ProteinCodingTable.read(path)
+    compiled = table.compile()
+    compiled.save(outfile, metadata={SOURCE_KEY: os.path.basename(path)})
+    return table.get_number_of_genes(), compiled.get_number_of_genes()
+
+
+def run(theargs):
+    """
+    Compiles every protein coding file in protein_coding_dir
+    :param theargs: parsed command line arguments
+    :return: 0 upon success otherwise 2
+    """
+    try:
+        _setuplogging(theargs)
+        outdir = theargs.outdir
+        if outdir is None:
+            outdir = theargs.protein_coding_dir
+        if not os.path.isdir(outdir):
+            os.makedirs(outdir, mode=0o755)
+
+        builds = get_protein_coding_builds(theargs.protein_coding_dir,
+                                           theargs.protein_coding_suffix)
+        if len(builds) == 0:
+            logger.error('No protein coding files ending with ' +
+                         theargs.protein_coding_suffix + ' found in ' +
+                         theargs.protein_coding_dir)
+            return 2
+        for build in sorted(builds.keys()):
+            outfile = os.path.join(outdir,
+                                   build + proteincoding.COMPILED_SUFFIX)
+            numread, numwritten = compile_protein_coding_file(builds[build],
+                                                              outfile)
+            logger.info('Compiled ' + builds[build] + ' to ' + outfile +
+                        ' keeping ' + str(numwritten) + ' of ' +
+                        str(numread) + ' rows')
+        return 0
+    except Exception:
+        logger.exception('Error caught exception')
+        return 2
+
+
+def main(args):
+    """Main entry point"""
+    desc = """Compiles protein coding files into memory mappable
+    binary files, named <build>.nagapc, for naga_taskrunner.py
+
+    Each file in protein_coding_dir ending with --protein_coding_suffix,
+    optionally gzip compressed, is parsed, duplicate rows are dropped,
+    and rows are sorted by chromosome then start. Gene names are stored
+    once in a string pool. naga_taskrunner.py uses a compiled file in
+    its --protein_coding_dir in place of the text file for that build.
+    """
+    theargs = _parse_arguments(desc, args[1:])
+    theargs.program = args[0]
+    theargs.version = nbgwas_rest.__version__
+    return run(theargs)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main(sys.argv))
@@ -10,18 +10,55 @@ import time
 import shutil
 import json
 import glob
+import itertools
+import threading
+import fcntl
+import hashlib
+import inspect
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import daemon
 
 import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse import identity as sparse_identity
+from scipy.sparse.linalg import bicgstab
+from scipy.sparse.linalg import eigsh
+from scipy.sparse.csgraph import laplacian
 from nbgwas import Nbgwas
 from nbgwas import version
+from nbgwas.network import Network
+from nbgwas.tables import Genes
+from nbgwas.propagation import random_walk_rst
+from nbgwas.propagation import sparse_normalize
+from nbgwas.utils import calculate_alpha
 import nbgwas_rest
+from nbgwas_rest import arraybundle
+from nbgwas_rest import cxreader
+from nbgwas_rest import snpio
+from nbgwas_rest import snpassign
+from nbgwas_rest import proteincoding
+from nbgwas_rest.proteincoding import ProteinCodingTable
 import networkx as nx
 from ndex2 import create_nice_cx_from_server
+from ndex2 import create_nice_cx_from_file
+from ndex2.client import Ndex2
 
 
 logger = logging.getLogger('nagataskrunner')
 
+# directory under task directory holding lock files used to
+# serialize loading of a network across task runner processes
+NETWORK_LOCK_DIR = 'network_locks'
+
+# keyword of relative tolerance of bicgstab, scipy 1.12 renamed
+# tol to rtol and scipy 1.14 removed tol
+if 'rtol' in inspect.signature(bicgstab).parameters:
+    BICGSTAB_TOLERANCE_KEYWORD = 'rtol'
+else:
+    BICGSTAB_TOLERANCE_KEYWORD = 'tol'
+
 LOG_FORMAT = "%(asctime)-15s %(levelname)s %(relativeCreated)dms " \
              "%(filename)s::%(funcName)s():%(lineno)d %(message)s"
 
@@ -35,7 +72,10 @@ def _parse_arguments(desc, args):
                                         'are located')
     parser.add_argument('--protein_coding_dir', required=True,
                         help='Directory where protein_coding data files '
-                             'reside')
+                             'reside. A compiled file (<build>.nagapc) '
+                             'made by naga_proteincoding.py is memory '
+                             'mapped in place of the text file of '
+                             'that build')
     parser.add_argument('--protein_coding_suffix', default='.txt',
                         help='Suffix of protein_coding files in '
                              '--protein_coding_dir directory. (default .txt)')
@@ -48,6 +88,114 @@ def _parse_arguments(desc, args):
                              'delete requests')
     parser.add_argument('--ndexserver', default='public.ndexbio.org',
                         help='NDEx server default is public.ndexbio.org')
+    parser.add_argument('--networkcachedir', default=None,
+                        help='If set, CX files for networks downloaded '
+                             'from NDEx are cached in this directory '
+                             'and reused until the network is modified '
+                             'on NDEx')
+    parser.add_argument('--networkcachesize', type=int, default=10240,
+                        help='Maximum size in megabytes of '
+                             '--networkcachedir directory. Least recently '
+                             'used networks are removed when this size '
+                             'is exceeded. (default 10240)')
+    parser.add_argument('--networkmemorycachesize', type=int, default=0,
+                        help='Memory budget in megabytes for networks '
+                             'kept in memory between tasks. A value of '
+                             '0 disables this cache. (default 0)')
+    parser.add_argument('--networkdir', default=None,
+                        help='If set, networks are loaded from CX '
+                             '(<uuid>.cx) or compiled (<uuid>.nagacsr) '
+                             'files in this directory instead of from '
+                             '--ndexserver')
+    parser.add_argument('--networkdirfallback', action='store_true',
+                        help='If set along with --networkdir, networks '
+                             'not found in --networkdir are downloaded '
+                             'from --ndexserver into --networkdir')
+    parser.add_argument('--streamcx', action='store_true',
+                        help='If set, CX networks are parsed '
+                             'incrementally into a compact sparse matrix '
+                             'keeping only node names and edges, which '
+                             'uses far less memory than networkx for '
+                             'large networks')
+    parser.add_argument('--compilednetworkdir', default=None,
+                        help='If set, networks are loaded from compiled '
+                             'sparse matrix files in this directory. '
+                             'Networks not yet compiled are obtained from '
+                             'NDEx and compiled into this directory')
+    parser.add_argument('--operatorcachesize', type=int, default=0,
+                        help='Memory budget in megabytes for random walk '
+                             'propagation operators kept between tasks '
+                             'that use the same network and alpha. A '
+                             'value of 0 disables this cache. (default 0)')
+    parser.add_argument('--operatorcachedir', default=None,
+                        help='If set along with --operatorcachesize, '
+                             'propagation kernels are also saved to this '
+                             'directory and memory mapped from it')
+    parser.add_argument('--maxkernelsize', type=int, default=4096,
+                        help='Maximum size in megabytes of a dense '
+                             'propagation kernel. For networks whose '
+                             'kernel would be larger, only the normalized '
+                             'transition matrix is cached. (default 4096)')
+    parser.add_argument('--batchsize', type=int, default=1,
+                        help='Maximum number of queued tasks using the '
+                             'same network, alpha, and solver settings '
+                             'that are processed together with their '
+                             'heat diffused in a single solve. Tasks are '
+                             'grouped from the next --batchsize queued '
+                             'tasks. (default 1)')
+    parser.add_argument('--precision', default=nbgwas_rest.FLOAT64_PRECISION,
+                        choices=nbgwas_rest.PRECISIONS,
+                        help='Numeric precision of heat and diffusion for '
+                             'tasks that do not set one. ' +
+                             nbgwas_rest.FLOAT32_PRECISION + ' halves '
+                             'memory used by heat, kernels, and solvers. '
+                             '(default ' + nbgwas_rest.FLOAT64_PRECISION +
+                             ')')
+    parser.add_argument('--snpchunksize', type=int, default=0,
+                        help='If greater than 0, SNP level summary files '
+                             'are read this many rows at a time and SNPs '
+                             'assigned to genes as each chunk is read so '
+                             'memory used is bounded by this value '
+                             'instead of the size of the file. Each row '
+                             'takes roughly 100 bytes. A value of 0 '
+                             'reads the whole file at once. SNPs parsed '
+                             'when the task was created are assigned '
+                             'this many, or ' +
+                             str(snpassign.DEFAULT_CHUNK_SIZE) +
+                             ' if 0, at a time. (default 0)')
+    parser.add_argument('--proteincodingcachesize', type=int, default=64,
+                        help='Memory budget in megabytes for parsed '
+                             'protein coding tables kept between tasks. '
+                             'Tables are keyed by content so builds in '
+                             '--protein_coding_dir and protein coding '
+                             'files uploaded with tasks are each parsed '
+                             'once. A value of 0 disables this cache. '
+                             '(default 64)')
+    parser.add_argument('--genecachedir', default=None,
+                        help='If set, gene tables with top SNP pvalue '
+                             'and heat of each gene are cached in this '
+                             'directory keyed by content of SNP level '
+                             'summary and protein coding files, window, '
+                             'and column labels so tasks differing only '
+                             'in network, alpha, or solver skip reading '
+                             'and assigning SNPs')
+    parser.add_argument('--genecachesize', type=int, default=1024,
+                        help='Maximum size in megabytes of '
+                             '--genecachedir directory. Least recently '
+                             'used gene tables are removed when this '
+                             'size is exceeded. (default 1024)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of threads used to assign SNPs to '
+                             'genes, each thread handling one '
+                             'chromosome, or part of one, at a time. '
+                             'A value of 1 assigns SNPs in the thread '
+                             'running the task. (default 1)')
+    parser.add_argument('--prefetchdepth', type=int, default=0,
+                        help='Number of queued tasks whose networks and '
+                             'protein coding files are loaded in a '
+                             'background thread while the current task '
+                             'runs. A value of 0 disables prefetching. '
+                             '(default 0)')
     parser.add_argument('--version', action='version',
                         version=('%(prog)s ' + nbgwas_rest.__version__))
     parser.add_argument('--nodaemon', default=False, action='store_true',
@@ -89,6 +237,7 @@ class FileBasedTask(object):
     UUID = 'uuid'
     OPTIMAL = 'optimal'
     TASK_FILES = [nbgwas_rest.RESULT, nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM,
+                  nbgwas_rest.SNP_LEVEL_SUMMARY_BUNDLE,
                   nbgwas_rest.TASK_JSON]
 
     def __init__(self, taskdir, taskdict,
@@ -171,8 +320,10 @@ class FileBasedTask(object):
         if self._resultdata is not None:
             resultfile = os.path.join(self._taskdir, nbgwas_rest.RESULT)
             logger.debug('Writing result data to: ' + resultfile)
+            # json.dumps encodes in one pass with the C encoder
+            # whereas json.dump encodes piece by piece in python
             with open(resultfile, 'w') as f:
-                json.dump(self._resultdata, f)
+                f.write(json.dumps(self._resultdata))
                 f.flush()
         return None
 
@@ -221,18 +372,18 @@ class FileBasedTask(object):
 
     def _delete_temp_files(self):
         """
-        Deletes snp level param file from filesystem
+        Deletes snp level param file and its bundle from filesystem
         :return: None
         """
-        try:
-            snpfile = self.get_snp_level_summary_file()
+        for snpfile in [self.get_snp_level_summary_file(),
+                        self.get_snp_level_summary_bundle()]:
             if snpfile is None:
-                return
-            logger.debug('Removing ' + snpfile)
-            os.unlink(snpfile)
-
-        except OSError:
-            logger.exception('Caught exception trying to remove file')
+                continue
+            try:
+                logger.debug('Removing ' + snpfile)
+                os.unlink(snpfile)
+            except OSError:
+                logger.exception('Caught exception trying to remove file')
 
     def _get_uuid_ip_state_basedir_from_path(self):
         """
@@ -361,6 +512,66 @@ class FileBasedTask(object):
             return FileBasedTask.OPTIMAL
         return res
 
+    def _get_value_from_taskdict(self, key):
+        """
+        Gets value of key from task dictionary
+        :param key:
+        :return: value or None if not set
+        """
+        if self._taskdict is None:
+            return None
+        return self._taskdict.get(key)
+
+    def get_solver(self):
+        """
+        Gets diffusion solver
+        :return: solver, nbgwas_rest.RANDOM_WALK_SOLVER if not set
+        """
+        res = self._get_value_from_taskdict(nbgwas_rest.SOLVER_PARAM)
+        if res is None:
+            return nbgwas_rest.RANDOM_WALK_SOLVER
+        return res
+
+    def get_tolerance(self):
+        """
+        Gets diffusion solver tolerance
+        :return: tolerance or None if not set
+        """
+        return self._get_value_from_taskdict(nbgwas_rest.TOLERANCE_PARAM)
+
+    def get_max_iterations(self):
+        """
+        Gets maximum iterations of diffusion solver
+        :return: maximum iterations or None if not set
+        """
+        return self._get_value_from_taskdict(nbgwas_rest.
+                                             MAX_ITERATIONS_PARAM)
+
+    def get_rank(self):
+        """
+        Gets rank of low rank diffusion
+        :return: rank or None if not set
+        """
+        return self._get_value_from_taskdict(nbgwas_rest.RANK_PARAM)
+
+    def get_precision(self):
+        """
+        Gets numeric precision of heat and diffusion
+        :return: precision or None if not set
+        """
+        return self._get_value_from_taskdict(nbgwas_rest.PRECISION_PARAM)
+
+    def set_precision(self, precision):
+        """
+        Sets numeric precision of heat and diffusion in task
+        dictionary so it is saved with the task
+        :param precision: one of nbgwas_rest.PRECISIONS
+        :return: None
+        """
+        if self._taskdict is None:
+            self._taskdict = {}
+        self._taskdict[nbgwas_rest.PRECISION_PARAM] = precision
+
     def get_protein_coding(self):
         """
         Gets protein coding parameter
@@ -432,6 +643,14 @@ class FileBasedTask(object):
             return nbgwas_rest.SNP_LEVEL_SUMMARY_PVAL_COL
         return res
 
+    def get_snp_level_summary_sha256(self):
+        """
+        Gets sha256 of SNP level summary recorded when task was created
+        :return: sha256 hex digest as str or None if not set
+        """
+        return self._get_value_from_taskdict(nbgwas_rest.
+                                             SNP_LEVEL_SUMMARY_SHA256_PARAM)
+
     def get_ndex(self):
         """
         Gets ndex parameter
@@ -456,15 +675,31 @@ class FileBasedTask(object):
             return None
         return snp_file
 
+    def get_snp_level_summary_bundle(self):
+        """
+        Gets path to snp level summary parsed into an array bundle
+        when task was created
+        :return: path or None if bundle does not exist
+        """
+        if self._taskdir is None:
+            return None
+        bundle_file = os.path.join(self._taskdir,
+                                   nbgwas_rest.SNP_LEVEL_SUMMARY_BUNDLE)
+        if not os.path.isfile(bundle_file):
+            return None
+        return bundle_file
+
     def get_protein_coding_file(self):
         """
         Gets protein coding file path by first seeing if
         a file with name nbgwas_rest.PROTEIN_CODING_PARAM
         resides in the tasks directory otherwise the code
         looks in the protein coding directory set in the
-        constructor and looks for a file with name
-        from get_protein_coding() (adding the suffix set
-        in constructor if its not None)
+        constructor and looks for a compiled file with name
+        from get_protein_coding() plus
+        nbgwas_rest.proteincoding.COMPILED_SUFFIX and then
+        a file with name from get_protein_coding() (adding the
+        suffix set in constructor if its not None)
         :return: path to protein coding file or None
         """
         """Look in task directory for protein coding file
@@ -491,6 +726,14 @@ class FileBasedTask(object):
             logger.warning('Protein coding parameter is None')
             return None
 
+        pc_file = os.path.join(self._protein_coding_dir, p_code +
+                               proteincoding.COMPILED_SUFFIX)
+
+        logger.debug('Looking for compiled protein coding file: ' + pc_file)
+
+        if os.path.isfile(pc_file):
+            return pc_file
+
         pc_file = os.path.join(self._protein_coding_dir, p_code)
         if self._protein_coding_suffix is not None:
             pc_file = pc_file + str(self._protein_coding_suffix)
@@ -523,13 +766,31 @@ class FileBasedSubmittedTaskFactory(object):
         Looks for next task in task dir. currently finds the first
         :return:
         """
+        return next(self._get_tasks(), None)
+
+    def get_next_tasks(self, max_tasks=1):
+        """
+        Looks for tasks in task dir without altering them, returning
+        them in the order they would be returned by
+        :py:meth:`get_next_task` as long as no tasks are added or
+        removed in the meantime
+        :param max_tasks: maximum number of tasks to return
+        :return: list of tasks which can be empty
+        """
+        return list(itertools.islice(self._get_tasks(), max_tasks))
+
+    def _get_tasks(self):
+        """
+        Generator that yields tasks found in submit directory
+        :return:
+        """
         if self._submitdir is None:
             logger.error('Submit directory is None')
-            return None
+            return
         if not os.path.isdir(self._submitdir):
             logger.error(self._submitdir +
                          ' does not exist or is not a directory')
-            return None
+            return
         logger.debug('Examining ' + self._submitdir + ' for new tasks')
         for entry in os.listdir(self._submitdir):
             fp = os.path.join(self._submitdir, entry)
@@ -543,18 +804,18 @@ class FileBasedSubmittedTaskFactory(object):
                         try:
                             with open(tjson, 'r') as f:
                                 jsondata = json.load(f)
-                            return FileBasedTask(subfp, jsondata,
-                                                 protein_coding_dir=self.
-                                                 _protein_coding_dir,
-                                                 protein_coding_suffix=self.
-                                                 _protein_coding_suffix)
                         except Exception as e:
                             if subfp not in self._problemlist:
                                 logger.info('Skipping task: ' + subfp +
                                             ' due to error reading json' +
                                             ' file: ' + str(e))
                                 self._problemlist.append(subfp)
-        return None
+                            continue
+                        yield FileBasedTask(subfp, jsondata,
+                                            protein_coding_dir=self.
+                                            _protein_coding_dir,
+                                            protein_coding_suffix=self.
+                                            _protein_coding_suffix)
 
     def get_size_of_problem_list(self):
         """
@@ -652,209 +913,2702 @@ class DeletedFileBasedTaskFactory(object):
         return None
 
 
-class NetworkXFromNDExFactory(object):
-    """Factory to get networkx object from NDEx server
+class InMemoryLRUCache(object):
     """
-    def __init__(self, ndex_server=None, username=None,
-                 password=None):
-        """Constructor"""
-        self._ndex_server = ndex_server
-        self._username = username
-        self._password = password
+    Holds objects in memory keyed by a hashable key. Each object
+    is stored with its estimated size in bytes and the least
+    recently used objects are removed once the total size exceeds
+    max_size. Safe to use from multiple threads.
+    """
+    def __init__(self, max_size=None):
+        """
+        Constructor
+        :param max_size: maximum total size in bytes of objects held,
+                         if None there is no limit
+        """
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._total_size = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.RLock()
+
+    def get(self, key):
+        """
+        Gets object for key, marking it as most recently used
+        :param key:
+        :return: object or None if not in cache
+        """
+        with self._lock:
+            if key not in self._entries:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value, size):
+        """
+        Adds object to cache, replacing any object with same key,
+        and evicts least recently used objects until cache fits
+        within max size. Objects larger than max size are not stored.
+        :param key:
+        :param value: object to store
+        :param size: estimated size of object in bytes
+        :return: True if object was stored otherwise False
+        """
+        with self._lock:
+            self.remove(key)
+            if self._max_size is not None and size > self._max_size:
+                logger.info('Not caching ' + str(key) + ' since its size ' +
+                            str(size) + ' exceeds cache size ' +
+                            str(self._max_size))
+                return False
+            self._entries[key] = (value, size)
+            self._total_size += size
+            while self._max_size is not None and \
+                    self._total_size > self._max_size:
+                oldkey, oldentry = self._entries.popitem(last=False)
+                logger.info('Evicting ' + str(oldkey) + ' from memory cache')
+                self._total_size -= oldentry[1]
+            return True
 
-    def get_networkx_object(self, ndex_uuid):
+    def remove(self, key):
         """
-        Given a NDEx uuid, this method returns
-        the network as a networkx object
-        :param ndex_uuid: NDEx uuid to get
-        :return: networkx object upon success or None if unable to load
+        Removes object with key from cache if it exists
+        :param key:
+        :return: None
         """
-        if ndex_uuid is None:
-            logger.error('UUID passed in is None')
-            return None
-        logger.info('Retreiving network with uuid:  ' + ndex_uuid)
-        cxnet = create_nice_cx_from_server(server=self._ndex_server,
-                                           uuid=ndex_uuid)
-        return cxnet.to_networkx()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._total_size -= entry[1]
 
+    def get_size(self):
+        """
+        Gets total estimated size in bytes of objects in cache
+        :return:
+        """
+        return self._total_size
 
-class NagaTaskRunner(object):
+    def get_number_of_entries(self):
+        """
+        Gets number of objects in cache
+        :return:
+        """
+        return len(self._entries)
+
+    def get_hits(self):
+        """
+        Gets number of times an object was found in cache
+        :return:
+        """
+        return self._hits
+
+    def get_misses(self):
+        """
+        Gets number of times an object was NOT found in cache
+        :return:
+        """
+        return self._misses
+
+
+def get_file_sha256(path, chunk_size=1048576):
     """
-    Runs tasks created by Nbgwas REST service
+    Gets sha256 hex digest of file
+    :param path: path to file
+    :param chunk_size: number of bytes read at a time
+    :return: str
     """
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
 
-    NDEX_NAME = 'name'
-
-    NEGATIVE_LOG = 'Negative Log'
-    BINARIZED_HEAT = 'Binarized Heat'
-    BINARIZE_HEAT_METHOD = 'binarize'
-    NEG_LOG_HEAT_METHOD = 'neg_log'
-    DIFFUSED_LOG = 'Diffused (Log)'
-    DIFFUSED_BINARIZED = 'Diffused (Binarized)'
-    DIFFUSE_METHOD = 'random_walk'
 
-    def __init__(self, wait_time=30,
-                 taskfactory=None,
-                 networkfactory=None,
-                 deletetaskfactory=None):
-        self._taskfactory = taskfactory
-        self._wait_time = wait_time
-        self._networkfactory = networkfactory
-        self._deletetaskfactory = deletetaskfactory
+class FileSha256Memo(object):
+    """
+    Remembers sha256 hex digest of files keyed by path, modification
+    time, and size so a file that has not changed is only hashed
+    once. At most max_entries digests are kept, least recently used
+    are forgotten first. Safe to use from multiple threads.
+    """
 
-    def _get_networkx_object(self, task):
+    def __init__(self, max_entries=1024, chunk_size=1048576):
         """
-        Examines task and generates appropriate
-        networkx object that is returned
-        :param task:
-        :return: same task object
+        Constructor
+        :param max_entries: maximum number of digests kept
+        :param chunk_size: number of bytes read at a time
+        """
+        self._max_entries = max_entries
+        self._chunk_size = chunk_size
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get_sha256(self, path):
+        """
+        Gets sha256 hex digest of file, hashing the file only if
+        its path, modification time, or size differ from those of
+        any file hashed before
+        :param path: path to file
+        :return: str
+        """
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            digest = self._digests.get(key)
+            if digest is not None:
+                self._digests.move_to_end(key)
+                self._hits += 1
+                return digest
+            self._misses += 1
+        digest = get_file_sha256(path, chunk_size=self._chunk_size)
+        with self._lock:
+            self._digests[key] = digest
+            self._digests.move_to_end(key)
+            while len(self._digests) > self._max_entries:
+                self._digests.popitem(last=False)
+        return digest
+
+    def get_hits(self):
+        """
+        Gets number of times a digest was remembered
+        :return:
         """
-        if task is None:
-            logger.error('task is None')
-            return None
-
-        ndex_id = task.get_ndex()
-        if ndex_id is not None:
-            return self._get_networkx_object_from_ndex(ndex_id)
-
-        return None
+        return self._hits
 
-    def _get_networkx_object_from_ndex(self, ndex_id):
+    def get_misses(self):
         """
-        Extracts networkx object from ndex and relabels the nodes
-        by the name of the node set as NDEX_NAME attribute.
-        For example if original NDEx network looked like this if
-        str(network.node):
+        Gets number of times a file had to be hashed
+        :return:
+        """
+        return self._misses
 
-        {1: {'name': 'node1'}, 2: {'name': 'node2'}}
 
-        The returned network will look like this if str(network.node):
+class ProteinCodingTableCache(object):
+    """
+    Keeps parsed :py:class:`nbgwas_rest.proteincoding.ProteinCodingTable`
+    objects in memory keyed by sha256 of the protein coding file they
+    were parsed from. Builds in protein coding directory, and protein
+    coding files uploaded with tasks, are then parsed once no matter
+    how many tasks use them. Safe to use from multiple threads.
+    """
 
-        {'node1': {'name': 'node1'}, 'node2': {'name': 'node2'}}
+    READ_CHUNK_SIZE = 1048576
 
-        :param task: contains id to get
-        :return:
+    def __init__(self, max_size=None):
         """
-        if self._networkfactory is None:
-            logger.error('Network factory is None')
-            return None
+        Constructor
+        :param max_size: maximum total size in bytes of tables held,
+                         if None there is no limit
+        """
+        self._cache = InMemoryLRUCache(max_size=max_size)
+        self._lock = threading.Lock()
+        self._sha256s = FileSha256Memo(chunk_size=ProteinCodingTableCache.
+                                       READ_CHUNK_SIZE)
 
-        dG = self._networkfactory.get_networkx_object(ndex_id)
-        if dG is None:
-            logger.error("None returned trying to get network")
-            return None
+    def get_key(self, path):
+        """
+        Gets sha256 hex digest of file, only hashing the file if it
+        changed since it was last hashed
+        :param path: path to protein coding file
+        :return: str
+        """
+        return self._sha256s.get_sha256(path)
 
-        logger.info('Generating name map')
-        name_map = {i: j[NagaTaskRunner.NDEX_NAME]
-                    for i, j in dG.node.items()}
+    def get_table(self, path):
+        """
+        Gets parsed protein coding table for file, parsing the file
+        only if no file with the same content was parsed before
+        :param path: path to protein coding file
+        :return: :py:class:`nbgwas_rest.proteincoding.ProteinCodingTable`
+        """
+        key = self.get_key(path)
+        with self._lock:
+            table = self._cache.get(key)
+            if table is not None:
+                logger.debug('Using cached protein coding table for ' +
+                             path)
+                return table
+            logger.info('Parsing protein coding file: ' + path)
+            table = ProteinCodingTable.read(path)
+            self._cache.put(key, table, table.get_size())
+            return table
 
-        logger.info('Calling networkx.relabel_nodes with name map')
-        return nx.relabel_nodes(dG, name_map)
+    def get_hits(self):
+        """
+        Gets number of times a table was found in cache
+        :return:
+        """
+        return self._cache.get_hits()
 
-    def _process_task(self, task, delete_temp_files=True):
+    def get_misses(self):
         """
-        Processes a task
-        :param taskdir:
+        Gets number of times a table had to be parsed
         :return:
         """
-        logger.info('Task dir: ' + task.get_taskdir())
-        task.move_task(nbgwas_rest.PROCESSING_STATUS)
+        return self._cache.get_misses()
 
-        n_obj = self._get_networkx_object(task)
-        if n_obj is None:
-            emsg = 'Unable to get networkx object for task'
-            logger.error(emsg)
-            task.move_task(nbgwas_rest.ERROR_STATUS,
-                           error_message=emsg)
-            return
 
-        task.set_networkx_object(n_obj)
+class GeneHeatDiskCache(object):
+    """
+    Stores gene tables, gene names plus float columns such as top
+    SNP pvalue and heat, on local disk as array bundle files named
+    by a key derived from the content of the SNP level summary and
+    protein coding files along with the window and column labels
+    that produced them. When the total size of the cached files
+    exceeds max_size the least recently used files are removed.
+    Safe to use from multiple threads.
+    """
 
-        result, emsg = self._run_nbgwas(task)
+    SUFFIX = '.nagagenes'
+    FORMAT = 'nagagenes'
+    FORMAT_VERSION = 1
+    FORMAT_KEY = 'format'
+    VERSION_KEY = 'version'
+    NAME_COL_KEY = 'namecol'
+    COLUMNS_KEY = 'columns'
+    NAMES_DATA = 'names_data'
+    NAMES_OFFSETS = 'names_offsets'
+    COLUMN_PREFIX = 'column_'
 
-        logger.info('Task processing completed')
-        task.set_result_data(result)
-        task.set_naga_version()
-        task.save_task()
-        task.move_task(nbgwas_rest.DONE_STATUS,
-                       delete_temp_files=delete_temp_files)
-        return
+    def __init__(self, cachedir, max_size=None):
+        """
+        Constructor
+        :param cachedir: directory where gene tables are stored,
+                         created if it does not exist
+        :param max_size: maximum size in bytes of all files in cache,
+                         if None there is no limit
+        """
+        self._cachedir = cachedir
+        self._max_size = max_size
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.RLock()
 
-    def _run_nbgwas(self, task):
+    def get_cache_dir(self):
         """
-        Runs nbgwas processing
-        :param task: The task to process which is assumed to
-                     have a valid network when task.get_networkx_object()
-                     is called
-        :return: tuple if successful result will be ({}, None) otherwise
-                 (None, 'str containing error message') or (None, None)
+        Gets cache directory
+        :return:
+        """
+        return self._cachedir
 
+    def get_hits(self):
         """
-        logger.info('Creating Nbgwas object')
-        g = Nbgwas()
+        Gets number of times a gene table was found in the cache
+        :return:
+        """
+        return self._hits
 
-        logger.info('Creating NBgwas.Snps object')
-        g.snps.from_files(
-            task.get_snp_level_summary_file(),
-            task.get_protein_coding_file(),
-            snp_chrom_col=task.get_snp_chromosome_label(),
-            snp_bp_col=task.get_snp_basepair_label(),
-            pval_col=task.get_snp_pvalue_label(),
-            snp_kwargs={'sep': '\s+|\s*,\s*'},
-            pc_kwargs={'sep': '\s+', 'names': ['Chrom', 'Start', 'End'],
-                       'index_col': 0}
-        )
-
-        logger.info('Assigning SNPS to genes')
-        g.genes = g.snps.assign_snps_to_genes(window_size=task.get_window(),
-                                              to_Gene=True)
+    def get_misses(self):
+        """
+        Gets number of times a gene table was NOT found in the cache
+        :return:
+        """
+        return self._misses
+
+    def get_key(self, snp_sha256, protein_coding_sha256, window,
+                column_labels):
+        """
+        Gets key identifying gene table
+        :param snp_sha256: sha256 hex digest of SNP level summary
+        :param protein_coding_sha256: sha256 hex digest of protein
+                                      coding file
+        :param window: window added to both ends of genes or None
+        :param column_labels: list of chromosome, basepair, and pvalue
+                              column labels
+        :return: sha256 hex digest as str
+        """
+        if window is not None:
+            window = int(window)
+        keystr = json.dumps([GeneHeatDiskCache.FORMAT_VERSION, snp_sha256,
+                             protein_coding_sha256, window,
+                             list(column_labels)])
+        return hashlib.sha256(keystr.encode('utf-8')).hexdigest()
+
+    def _get_file_path(self, key):
+        """
+        Gets path to file for key
+        :param key:
+        :return: path to file
+        """
+        return os.path.join(self._cachedir, str(key) +
+                            GeneHeatDiskCache.SUFFIX)
+
+    def get_table(self, key):
+        """
+        Gets gene table saved with key. If found, the modification
+        time of the file is updated to denote it was recently used.
+        :param key: key from :py:meth:`get_key`
+        :return: :py:class:`pandas.DataFrame` with name column followed
+                 by float columns in the order they were saved or None
+                 if not in cache
+        """
+        genefile = self._get_file_path(key)
+        with self._lock:
+            if not os.path.isfile(genefile):
+                self._misses += 1
+                logger.debug('Cache miss for gene table ' + str(key))
+                return None
+            try:
+                arrays, metadata = arraybundle.read_array_bundle(genefile,
+                                                                 mmap=False)
+                if metadata is None or \
+                        metadata.get(GeneHeatDiskCache.FORMAT_KEY) != \
+                        GeneHeatDiskCache.FORMAT or \
+                        metadata.get(GeneHeatDiskCache.VERSION_KEY) != \
+                        GeneHeatDiskCache.FORMAT_VERSION:
+                    raise ValueError(genefile + ' is not a gene table')
+                names = arraybundle.\
+                    decode_string_pool(arrays[GeneHeatDiskCache.NAMES_DATA],
+                                       arrays[GeneHeatDiskCache.
+                                              NAMES_OFFSETS])
+                columns = metadata[GeneHeatDiskCache.COLUMNS_KEY]
+                table = pd.DataFrame(OrderedDict(
+                    [(metadata[GeneHeatDiskCache.NAME_COL_KEY], names)] +
+                    [(col, arrays[GeneHeatDiskCache.COLUMN_PREFIX + str(i)])
+                     for i, col in enumerate(columns)]))
+            except (ValueError, KeyError) as e:
+                self._misses += 1
+                logger.warning('Unable to read ' + genefile + ' : ' +
+                               str(e))
+                return None
+            self._hits += 1
+            logger.debug('Cache hit for gene table ' + str(key))
+            os.utime(genefile, None)
+            return table
+
+    def add_table(self, key, table, name_col, columns):
+        """
+        Writes gene table to cache and then removes least recently
+        used tables if the cache exceeds the maximum size.
+        :param key: key from :py:meth:`get_key`
+        :param table: :py:class:`pandas.DataFrame`
+        :param name_col: name of column in table holding gene names
+        :param columns: names of float columns in table to save
+        :return: path to file
+        """
+        if not os.path.isdir(self._cachedir):
+            os.makedirs(self._cachedir, mode=0o755)
+
+        names_data, names_offsets = arraybundle.\
+            encode_string_pool([str(n) for n in table[name_col].values])
+        arrays = {GeneHeatDiskCache.NAMES_DATA: names_data,
+                  GeneHeatDiskCache.NAMES_OFFSETS: names_offsets}
+        for i, col in enumerate(columns):
+            arrays[GeneHeatDiskCache.COLUMN_PREFIX + str(i)] = \
+                table[col].values.astype(np.float64)
+        metadata = {GeneHeatDiskCache.FORMAT_KEY: GeneHeatDiskCache.FORMAT,
+                    GeneHeatDiskCache.VERSION_KEY:
+                        GeneHeatDiskCache.FORMAT_VERSION,
+                    GeneHeatDiskCache.NAME_COL_KEY: name_col,
+                    GeneHeatDiskCache.COLUMNS_KEY: list(columns)}
+        genefile = self._get_file_path(key)
+        with self._lock:
+            arraybundle.write_array_bundle(genefile, arrays,
+                                           metadata=metadata)
+            self._evict(keep=genefile)
+        return genefile
+
+    def _evict(self, keep=None):
+        """
+        Removes least recently used gene tables until total size of
+        cache is at or below maximum size
+        :param keep: path to file that should never be removed
+        :return: None
+        """
+        if self._max_size is None:
+            return
+        genefiles = glob.glob(os.path.join(self._cachedir, '*' +
+                                           GeneHeatDiskCache.SUFFIX))
+        genefiles.sort(key=os.path.getmtime)
+        total = sum([os.path.getsize(f) for f in genefiles])
+        for genefile in genefiles:
+            if total <= self._max_size:
+                break
+            if genefile == keep:
+                continue
+            logger.info('Evicting gene table from cache: ' + genefile)
+            total -= os.path.getsize(genefile)
+            os.unlink(genefile)
 
-        logger.info('Converting to heat using method: ' +
-                    NagaTaskRunner.BINARIZE_HEAT_METHOD)
-        g.genes.convert_to_heat(method=NagaTaskRunner.BINARIZE_HEAT_METHOD,
-                                name=NagaTaskRunner.BINARIZED_HEAT)
 
-        logger.info('2nd converting to heat using method: ' +
-                    NagaTaskRunner.NEG_LOG_HEAT_METHOD)
-        g.genes.convert_to_heat(method=NagaTaskRunner.NEG_LOG_HEAT_METHOD,
-                                name=NagaTaskRunner.NEGATIVE_LOG)
+class NDExNetworkDiskCache(object):
+    """
+    Stores CX files of NDEx networks on local disk keyed by
+    NDEx UUID and modification time of the network on NDEx.
+    When the total size of the cached files exceeds max_size
+    the least recently used files are removed. Safe to use from
+    multiple threads.
+    """
 
-        g.network = task.get_networkx_object()
+    CX_SUFFIX = '.cx'
+    TMP_SUFFIX = '.tmp'
 
-        neg_log_vals = g.genes.table[NagaTaskRunner.NEGATIVE_LOG].values
+    def __init__(self, cachedir, max_size=None):
+        """
+        Constructor
+        :param cachedir: directory where CX files are stored, created
+                         if it does not exist
+        :param max_size: maximum size in bytes of all files in cache,
+                         if None there is no limit
+        """
+        self._cachedir = cachedir
+        self._max_size = max_size
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.RLock()
 
-        neg_log_isfinite_list = np.isfinite(neg_log_vals)
+    def get_cache_dir(self):
+        """
+        Gets cache directory
+        :return:
+        """
+        return self._cachedir
 
-        if (np.any(neg_log_isfinite_list)):
-            maxval = np.max(neg_log_vals[neg_log_isfinite_list])
-            logger.info("Found one or more heat values that are infinite " +
-                        " setting to value: " + str(maxval))
+    def get_hits(self):
+        """
+        Gets number of times a network was found in the cache
+        :return:
+        """
+        return self._hits
 
-            g.genes.table.loc[~neg_log_isfinite_list, NagaTaskRunner.NEGATIVE_LOG] = maxval
+    def get_misses(self):
+        """
+        Gets number of times a network was NOT found in the cache
+        :return:
+        """
+        return self._misses
+
+    def _get_cx_file_path(self, ndex_uuid, modification_time):
+        """
+        Gets path to CX file for network
+        :param ndex_uuid: NDEx UUID of network
+        :param modification_time: modification time of network
+        :return: path to CX file
+        """
+        return os.path.join(self._cachedir, str(ndex_uuid) + '_' +
+                            str(modification_time) +
+                            NDExNetworkDiskCache.CX_SUFFIX)
+
+    def _get_cx_files_for_network(self, ndex_uuid):
+        """
+        Gets all CX files in cache for network with ndex_uuid
+        :param ndex_uuid: NDEx UUID of network
+        :return: list of paths
+        """
+        return glob.glob(os.path.join(self._cachedir, str(ndex_uuid) +
+                                      '_*' + NDExNetworkDiskCache.CX_SUFFIX))
+
+    def get_cx_file(self, ndex_uuid, modification_time):
+        """
+        Gets path to cached CX file for network. If found, the
+        modification time of the file is updated to denote it
+        was recently used.
+        :param ndex_uuid: NDEx UUID of network
+        :param modification_time: modification time of network on NDEx
+        :return: path to CX file or None if not in cache
+        """
+        cxfile = self._get_cx_file_path(ndex_uuid, modification_time)
+        with self._lock:
+            if not os.path.isfile(cxfile):
+                self._misses += 1
+                logger.debug('Cache miss for network ' + str(ndex_uuid))
+                return None
+            self._hits += 1
+            logger.debug('Cache hit for network ' + str(ndex_uuid))
+            os.utime(cxfile, None)
+            return cxfile
+
+    def get_latest_cx_file(self, ndex_uuid):
+        """
+        Gets most recently modified version of network in the cache
+        regardless of modification time on NDEx. Used when NDEx
+        cannot be reached
+        :param ndex_uuid: NDEx UUID of network
+        :return: path to CX file or None if not in cache
+        """
+        with self._lock:
+            cxfiles = self._get_cx_files_for_network(ndex_uuid)
+            if len(cxfiles) == 0:
+                self._misses += 1
+                return None
+            self._hits += 1
+            cxfile = max(cxfiles, key=os.path.getmtime)
+            os.utime(cxfile, None)
+            return cxfile
+
+    def add_cx_file(self, ndex_uuid, modification_time, chunks):
+        """
+        Writes CX data to cache replacing any older versions
+        of the network and then removes least recently used
+        networks if the cache exceeds the maximum size.
+        :param ndex_uuid: NDEx UUID of network
+        :param modification_time: modification time of network on NDEx
+        :param chunks: iterable of bytes that make up the CX data
+        :return: path to CX file
+        """
+        if not os.path.isdir(self._cachedir):
+            os.makedirs(self._cachedir, mode=0o755)
+
+        cxfile = self._get_cx_file_path(ndex_uuid, modification_time)
+        tmpfile = cxfile + NDExNetworkDiskCache.TMP_SUFFIX
+        with open(tmpfile, 'wb') as f:
+            for chunk in chunks:
+                if chunk:
+                    f.write(chunk)
+            f.flush()
+        with self._lock:
+            for oldfile in self._get_cx_files_for_network(ndex_uuid):
+                logger.debug('Removing old version of network: ' + oldfile)
+                os.unlink(oldfile)
+            os.rename(tmpfile, cxfile)
+            self._evict(keep=cxfile)
+        return cxfile
+
+    def _evict(self, keep=None):
+        """
+        Removes least recently used CX files until total size of
+        cache is at or below maximum size
+        :param keep: path to file that should never be removed
+        :return: None
+        """
+        if self._max_size is None:
+            return
+        cxfiles = glob.glob(os.path.join(self._cachedir, '*' +
+                                         NDExNetworkDiskCache.CX_SUFFIX))
+        cxfiles.sort(key=os.path.getmtime)
+        total = sum([os.path.getsize(f) for f in cxfiles])
+        for cxfile in cxfiles:
+            if total <= self._max_size:
+                break
+            if cxfile == keep:
+                continue
+            logger.info('Evicting network from cache: ' + cxfile)
+            total -= os.path.getsize(cxfile)
+            os.unlink(cxfile)
 
-            g.network = task.get_networkx_object()
 
-        logger.info('map to node table')
-        g.map_to_node_table(columns=[NagaTaskRunner.BINARIZED_HEAT,
-                                     NagaTaskRunner.NEGATIVE_LOG])
+def load_cx_network(cxfile, streamcx=False):
+    """
+    Loads network from CX file
+    :param cxfile: path to CX file
+    :param streamcx: If True, CX is parsed incrementally into a
+                     :py:class:`CompiledNetwork` otherwise a networkx
+                     object is created via :py:mod:`ndex2`
+    :return: :py:class:`CompiledNetwork` or networkx object
+    """
+    logger.info('Loading network from: ' + cxfile)
+    if streamcx is True:
+        return CompiledNetwork.from_cx(cxfile)
+    return create_nice_cx_from_file(cxfile).to_networkx()
 
-        logger.info('Running diffuse ')
-        g.diffuse(method=NagaTaskRunner.DIFFUSE_METHOD,
-                  alpha=task.get_alpha(),
-                  node_attribute=NagaTaskRunner.BINARIZED_HEAT,
-                  result_name=NagaTaskRunner.DIFFUSED_BINARIZED)
 
-        logger.info('Running diffuse 2')
+class NetworkXFromNDExFactory(object):
+    """Factory to get networkx object from NDEx server
+    """
 
-        g.diffuse(method=NagaTaskRunner.DIFFUSE_METHOD,
-                  alpha=task.get_alpha(),
-                  node_attribute=NagaTaskRunner.NEGATIVE_LOG,
-                  result_name=NagaTaskRunner.DIFFUSED_LOG)
+    MODIFICATION_TIME = 'modificationTime'
 
-        result = self._get_dataframe_of_column(g.network.node_table,
-                                               [g.network.node_name,
-                                                NagaTaskRunner.BINARIZED_HEAT,
-                                                NagaTaskRunner.NEGATIVE_LOG,
+    def __init__(self, ndex_server=None, username=None,
+                 password=None, networkcache=None, streamcx=False):
+        """
+        Constructor
+        :param ndex_server: NDEx server
+        :param username: NDEx username
+        :param password: NDEx password
+        :param networkcache: If set, CX data is fetched through this
+                             :py:class:`NDExNetworkDiskCache`
+        :param streamcx: If True, CX is parsed incrementally into a
+                         :py:class:`CompiledNetwork` instead of networkx
+        """
+        self._ndex_server = ndex_server
+        self._username = username
+        self._password = password
+        self._networkcache = networkcache
+        self._streamcx = streamcx
+
+    def get_networkx_object(self, ndex_uuid):
+        """
+        Given a NDEx uuid, this method returns
+        the network as a networkx object
+        :param ndex_uuid: NDEx uuid to get
+        :return: networkx object upon success or None if unable to load
+        """
+        if ndex_uuid is None:
+            logger.error('UUID passed in is None')
+            return None
+        if self._networkcache is not None:
+            cxfile = self.get_cx_file(ndex_uuid)
+            if cxfile is None:
+                return None
+            return load_cx_network(cxfile, streamcx=self._streamcx)
+
+        logger.info('Retreiving network with uuid:  ' + ndex_uuid)
+        if self._streamcx is True:
+            resp = self._get_ndex_client().\
+                get_network_as_cx_stream(ndex_uuid)
+            try:
+                resp.raise_for_status()
+                resp.raw.decode_content = True
+                return CompiledNetwork.from_cx(resp.raw)
+            finally:
+                resp.close()
+
+        cxnet = create_nice_cx_from_server(server=self._ndex_server,
+                                           uuid=ndex_uuid)
+        return cxnet.to_networkx()
+
+    def _get_ndex_client(self):
+        """
+        Creates NDEx client
+        :return: :py:class:`ndex2.client.Ndex2`
+        """
+        return Ndex2(host=self._ndex_server, username=self._username,
+                     password=self._password)
+
+    def download_cx_file(self, ndex_uuid, path):
+        """
+        Downloads network from NDEx in CX format and writes
+        it to path. Data is written to a temporary file first
+        which is renamed to path once the download completes
+        :param ndex_uuid: NDEx uuid to get
+        :param path: path to write CX data to
+        :return: path
+        """
+        logger.info('Downloading network with uuid: ' + ndex_uuid +
+                    ' to ' + path)
+        tmpfile = path + NDExNetworkDiskCache.TMP_SUFFIX
+        resp = self._get_ndex_client().get_network_as_cx_stream(ndex_uuid)
+        try:
+            resp.raise_for_status()
+            with open(tmpfile, 'wb') as f:
+                for chunk in resp.iter_content(chunk_size=1048576):
+                    if chunk:
+                        f.write(chunk)
+                f.flush()
+        finally:
+            resp.close()
+        os.rename(tmpfile, path)
+        return path
+
+    def get_cx_file(self, ndex_uuid):
+        """
+        Gets path to CX file for network from the cache set in
+        constructor, downloading the network from NDEx if the cache
+        lacks the current version. If NDEx cannot be reached the
+        newest cached version of the network is returned.
+        :param ndex_uuid: NDEx uuid to get
+        :return: path to CX file or None if no cache was set or
+                 network could not be obtained
+        """
+        if self._networkcache is None:
+            return None
+
+        client = self._get_ndex_client()
+        try:
+            summary = client.get_network_summary(ndex_uuid)
+            modtime = summary[NetworkXFromNDExFactory.MODIFICATION_TIME]
+        except Exception as e:
+            logger.warning('Unable to get summary of network ' +
+                           ndex_uuid + ' from NDEx, using newest cached '
+                           'version if available: ' + str(e))
+            return self._networkcache.get_latest_cx_file(ndex_uuid)
+
+        cxfile = self._networkcache.get_cx_file(ndex_uuid, modtime)
+        if cxfile is None:
+            logger.info('Downloading network with uuid: ' + ndex_uuid)
+            resp = client.get_network_as_cx_stream(ndex_uuid)
+            try:
+                resp.raise_for_status()
+                cxfile = self._networkcache.\
+                    add_cx_file(ndex_uuid, modtime,
+                                resp.iter_content(chunk_size=1048576))
+            finally:
+                resp.close()
+        logger.info('Network cache hits: ' +
+                    str(self._networkcache.get_hits()) + ' misses: ' +
+                    str(self._networkcache.get_misses()))
+        return cxfile
+
+
+class FileSystemNetworkFactory(object):
+    """
+    Factory that loads networks from a directory instead of
+    NDEx. Files in the directory are named by NDEx UUID and are
+    either compiled networks (<uuid>.nagacsr) or CX files (<uuid>.cx)
+    with compiled networks preferred. If an NDEx factory is set,
+    networks missing from the directory are downloaded into it.
+    """
+
+    CX_SUFFIX = '.cx'
+
+    def __init__(self, networkdir, ndexfactory=None, streamcx=False):
+        """
+        Constructor
+        :param networkdir: directory containing network files
+        :param ndexfactory: :py:class:`NetworkXFromNDExFactory` used to
+                            download networks missing from networkdir,
+                            if None missing networks are not loaded
+        :param streamcx: If True, CX is parsed incrementally into a
+                         :py:class:`CompiledNetwork` instead of networkx
+        """
+        self._networkdir = networkdir
+        self._ndexfactory = ndexfactory
+        self._streamcx = streamcx
+
+    def get_cx_file(self, ndex_uuid):
+        """
+        Gets path to CX file for network in network directory
+        :param ndex_uuid:
+        :return: path to CX file
+        """
+        return os.path.join(self._networkdir, str(ndex_uuid) +
+                            FileSystemNetworkFactory.CX_SUFFIX)
+
+    def get_compiled_network_file(self, ndex_uuid):
+        """
+        Gets path to compiled network file for network in
+        network directory
+        :param ndex_uuid:
+        :return: path to compiled network file
+        """
+        return os.path.join(self._networkdir, str(ndex_uuid) +
+                            CompiledNetworkFactory.SUFFIX)
+
+    def get_networkx_object(self, ndex_uuid):
+        """
+        Loads network with ndex_uuid from network directory
+        :param ndex_uuid: NDEx uuid to get
+        :return: :py:class:`CompiledNetwork` if a compiled network was
+                 found otherwise networkx object or None if network
+                 could not be found
+        """
+        if ndex_uuid is None:
+            logger.error('UUID passed in is None')
+            return None
+
+        compiled_file = self.get_compiled_network_file(ndex_uuid)
+        if os.path.isfile(compiled_file):
+            logger.info('Loading compiled network: ' + compiled_file)
+            return CompiledNetwork.load(compiled_file)
+
+        cxfile = self.get_cx_file(ndex_uuid)
+        if not os.path.isfile(cxfile):
+            if self._ndexfactory is None:
+                logger.error('Network ' + ndex_uuid + ' not found in ' +
+                             str(self._networkdir))
+                return None
+            if not os.path.isdir(self._networkdir):
+                os.makedirs(self._networkdir, mode=0o755)
+            self._ndexfactory.download_cx_file(ndex_uuid, cxfile)
+
+        return load_cx_network(cxfile, streamcx=self._streamcx)
+
+
+class CompiledNetwork(Network):
+    """
+    Network for Nbgwas backed by a compressed sparse row (CSR)
+    adjacency matrix and a table of node names. Nodes are
+    identified by their row in the adjacency matrix.
+    A compiled network can be saved to and loaded from an
+    array bundle file that is memory mapped on load so no
+    intermediate networkx object is ever created.
+
+    Nbgwas modifies the node table of the network it is given so
+    a new instance should be used for each task.
+    """
+
+    FORMAT = 'nagacsr'
+    FORMAT_VERSION = 1
+    FORMAT_KEY = 'format'
+    VERSION_KEY = 'version'
+    NODES_KEY = 'nodes'
+    EDGES_KEY = 'edges'
+    INDPTR = 'indptr'
+    INDICES = 'indices'
+    DATA = 'data'
+    NAMES_DATA = 'names_data'
+    NAMES_OFFSETS = 'names_offsets'
+
+    def __init__(self, names, adjacency_matrix, node_name='name',
+                 number_of_edges=None):
+        """
+        Constructor
+        :param names: list of node names, one per row of adjacency_matrix
+        :param adjacency_matrix: symmetric scipy.sparse.csr_matrix
+        :param node_name: name of node table column holding node names
+        :param number_of_edges: number of undirected edges, if None
+                                value is calculated from adjacency_matrix
+        """
+        super().__init__(network=None, node_name=node_name)
+        self._adjacency_matrix = adjacency_matrix
+        if number_of_edges is None:
+            number_of_edges = (adjacency_matrix.nnz +
+                               np.count_nonzero(adjacency_matrix.
+                                                diagonal())) // 2
+        # numpy 2 returns numpy scalars which json cannot serialize
+        self._number_of_edges = int(number_of_edges)
+        self._names = names
+        self._names_column = node_name
+        self._node_table = pd.DataFrame({node_name: names})
+        self.node_names = names
+
+    def copy(self):
+        """
+        Creates CompiledNetwork sharing the adjacency matrix of this
+        network, which is never modified, but with a new node table
+        as it was when this network was constructed
+        :return: CompiledNetwork
+        """
+        return CompiledNetwork(self._names, self._adjacency_matrix,
+                               node_name=self._names_column,
+                               number_of_edges=self._number_of_edges)
+
+    @classmethod
+    def from_edges(cls, names, sources, targets, node_name='name'):
+        """
+        Creates CompiledNetwork from arrays of edges. Duplicate
+        edges and edges in both directions are collapsed into one
+        undirected edge, mirroring an undirected networkx graph.
+        :param names: list of unique node names
+        :param sources: array of indices into names
+        :param targets: array of indices into names
+        :param node_name: name of node table column holding node names
+        :return: CompiledNetwork
+        """
+        num_nodes = len(names)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        notloop = sources != targets
+        rows = np.concatenate((sources, targets[notloop]))
+        cols = np.concatenate((targets, sources[notloop]))
+        adj = coo_matrix((np.ones(len(rows)), (rows, cols)),
+                         shape=(num_nodes, num_nodes)).tocsr()
+        adj.sum_duplicates()
+        adj.data[:] = 1.0
+        return cls(names, adj, node_name=node_name)
+
+    @classmethod
+    def from_networkx(cls, graph, name_attribute='name',
+                      node_name='name'):
+        """
+        Creates CompiledNetwork from networkx graph labeling nodes by
+        the value of name_attribute on each node. Nodes sharing a
+        name are merged as :py:func:`networkx.relabel_nodes` does.
+        :param graph: networkx graph
+        :param name_attribute: node attribute holding node name
+        :param node_name: name of node table column holding node names
+        :return: CompiledNetwork
+        """
+        name_index = {}
+        node_index = {}
+        for node, attrs in graph.nodes(data=True):
+            name = str(attrs.get(name_attribute, node))
+            if name not in name_index:
+                name_index[name] = len(name_index)
+            node_index[node] = name_index[name]
+
+        edges = graph.edges()
+        sources = np.fromiter((node_index[e[0]] for e in edges),
+                              dtype=np.int64, count=len(edges))
+        targets = np.fromiter((node_index[e[1]] for e in edges),
+                              dtype=np.int64, count=len(edges))
+        return cls.from_edges(list(name_index.keys()), sources, targets,
+                              node_name=node_name)
+
+    @classmethod
+    def from_cx(cls, cxfile, node_name='name'):
+        """
+        Creates CompiledNetwork from CX without building networkx
+        or NiceCX objects. Only node names and edges are read, see
+        :py:func:`nbgwas_rest.cxreader.read_cx_network`
+        :param cxfile: path to CX file or file like object opened
+                       in binary mode
+        :param node_name: name of node table column holding node names
+        :return: CompiledNetwork
+        """
+        cxnet = cxreader.read_cx_network(cxfile)
+        return cls.from_edges(cxnet.names, cxnet.sources, cxnet.targets,
+                              node_name=node_name)
+
+    @classmethod
+    def load(cls, path, node_name='name', mmap=True):
+        """
+        Loads CompiledNetwork saved via :py:meth:`save`
+        :param path: path to compiled network file
+        :param node_name: name of node table column holding node names
+        :param mmap: if True memory map the file
+        :raises ValueError: if file is not a compiled network
+        :return: CompiledNetwork
+        """
+        arrays, metadata = arraybundle.read_array_bundle(path, mmap=mmap)
+        if metadata is None or \
+                metadata.get(CompiledNetwork.FORMAT_KEY) != \
+                CompiledNetwork.FORMAT:
+            raise ValueError(path + ' is not a compiled network')
+        names = arraybundle.\
+            decode_string_pool(arrays[CompiledNetwork.NAMES_DATA],
+                               arrays[CompiledNetwork.NAMES_OFFSETS])
+        num_nodes = len(names)
+        adj = csr_matrix((arrays[CompiledNetwork.DATA],
+                          arrays[CompiledNetwork.INDICES],
+                          arrays[CompiledNetwork.INDPTR]),
+                         shape=(num_nodes, num_nodes), copy=False)
+        return cls(names, adj, node_name=node_name,
+                   number_of_edges=metadata[CompiledNetwork.EDGES_KEY])
+
+    def save(self, path, metadata=None):
+        """
+        Saves network to path as an array bundle
+        :param path: path to write to
+        :param metadata: dict of additional values to store
+        :return: None
+        """
+        names_data, names_offsets = arraybundle.\
+            encode_string_pool(self.node_names)
+        adj = self._adjacency_matrix
+        index_dtype = np.int32
+        if adj.nnz >= np.iinfo(np.int32).max:
+            index_dtype = np.int64
+        meta = {}
+        if metadata is not None:
+            meta.update(metadata)
+        meta.update({CompiledNetwork.FORMAT_KEY: CompiledNetwork.FORMAT,
+                     CompiledNetwork.VERSION_KEY:
+                         CompiledNetwork.FORMAT_VERSION,
+                     CompiledNetwork.NODES_KEY: len(self.node_names),
+                     CompiledNetwork.EDGES_KEY: self._number_of_edges})
+        arraybundle.write_array_bundle(path, {
+            CompiledNetwork.INDPTR: adj.indptr.astype(index_dtype),
+            CompiledNetwork.INDICES: adj.indices.astype(index_dtype),
+            CompiledNetwork.DATA: adj.data.astype(np.float64),
+            CompiledNetwork.NAMES_DATA: names_data,
+            CompiledNetwork.NAMES_OFFSETS: names_offsets},
+            metadata=meta)
+
+    @property
+    def adjacency_matrix(self):
+        return self._adjacency_matrix
+
+    @property
+    def laplacian_matrix(self):
+        if not hasattr(self, '_laplacian_matrix'):
+            self.add_laplacian_matrix()
+        return self._laplacian_matrix
+
+    def add_adjacency_matrix(self):
+        return self
+
+    def add_laplacian_matrix(self):
+        self._laplacian_matrix = laplacian(self._adjacency_matrix)
+        return self
+
+    @property
+    def node_ids(self):
+        return np.arange(len(self.node_names))
+
+    def nodes(self):
+        return self.node_ids
+
+    def number_of_edges(self):
+        """
+        Gets number of undirected edges
+        :return:
+        """
+        return self._number_of_edges
+
+    def edges(self):
+        upper = coo_matrix(self._adjacency_matrix)
+        keep = upper.row <= upper.col
+        return np.column_stack((upper.row[keep], upper.col[keep]))
+
+    def subgraph(self, node_ids=None, node_names=None):
+        if node_names is not None and node_ids is not None:
+            raise ValueError('Expected either node_names or node_ids. '
+                             'Both given.')
+        if node_names is not None:
+            name_2_node = dict(zip(self.node_names, self.node_ids))
+            node_ids = [name_2_node[n] for n in node_names]
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        sub_adj = self._adjacency_matrix[node_ids][:, node_ids].tocsr()
+        return CompiledNetwork([self.node_names[i] for i in node_ids],
+                               sub_adj, node_name=self.node_name)
+
+    def get_node_attributes(self):
+        return self.node_table.to_dict(orient='index')
+
+    def set_node_attributes(self, attr_map, namespace='nodenames'):
+        for attr_name, d in attr_map.items():
+            if namespace == 'nodenames':
+                keys = self.node_table[self.node_name]
+            else:
+                keys = pd.Series(self.node_table.index,
+                                 index=self.node_table.index)
+            self.node_table[attr_name] = keys.map(d)
+        return self
+
+    def set_node_names(self, attr=None):
+        if attr is None:
+            attr = self.node_name
+        self.node_name = attr
+        self.node_names = [str(n) for n in self.node_table[attr].values]
+        return self
+
+
+def _share_network(network):
+    """
+    Gets network that can be used by another task. Networks that
+    are :py:class:`CompiledNetwork` objects are copied since Nbgwas
+    modifies their node table, other networks are returned as is.
+    :param network: network
+    :return: network
+    """
+    if isinstance(network, CompiledNetwork):
+        return network.copy()
+    return network
+
+
+class SingleFlight(object):
+    """
+    Deduplicates concurrent calls by key within a process. While a
+    call for a key is running, other calls for the same key wait for
+    it to finish and get its result, or exception, instead of
+    running the function again.
+    """
+
+    def __init__(self, share=None):
+        """
+        Constructor
+        :param share: If set, function applied to the result
+                      before it is given to waiting callers
+        """
+        self._share = share
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """
+        Runs func unless a call for key is in flight in which case
+        the result of that call is returned once it completes
+        :param key: hashable key identifying the call
+        :param func: function that takes no arguments
+        :raises Exception: any exception raised by func
+        :return: value returned by func
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader is True:
+                call = {'event': threading.Event(), 'waiters': 0,
+                        'value': None, 'error': None}
+                self._calls[key] = call
+            else:
+                call['waiters'] += 1
+
+        if leader is False:
+            logger.info('Waiting for in flight load of ' + str(key))
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            if self._share is not None:
+                return self._share(call['value'])
+            return call['value']
+
+        try:
+            call['value'] = func()
+            return call['value']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['event'].set()
+
+    def get_number_of_waiters(self, key):
+        """
+        Gets number of callers waiting on in flight call for key
+        :param key:
+        :return: number of waiting callers, 0 if no call is in flight
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                return 0
+            return call['waiters']
+
+
+class FileLock(object):
+    """
+    Exclusive lock on a file via :py:func:`fcntl.flock` used as a
+    context manager to serialize work across processes on a node
+    """
+
+    def __init__(self, path):
+        """
+        Constructor
+        :param path: path to lock file, created if needed
+        """
+        self._path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self._path, 'a')
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+        return False
+
+
+class SingleFlightNetworkFactory(object):
+    """
+    Wraps a network factory so concurrent requests for the same
+    NDEx UUID share one load. Within a process callers wait on the
+    in flight load via :py:class:`SingleFlight`. If a lock directory
+    is set, loads are also serialized across processes via a
+    :py:class:`FileLock` per UUID so a process waiting on the lock
+    finds the network in the on disk cache the wrapped factory uses
+    instead of downloading it again. The lock only serializes loads,
+    so a lock directory is only worth setting if the wrapped factory
+    caches networks on disk, see :py:func:`get_network_lock_dir`
+    """
+
+    LOCK_SUFFIX = '.lock'
+
+    def __init__(self, networkfactory, lockdir=None):
+        """
+        Constructor
+        :param networkfactory: factory to load networks with
+        :param lockdir: directory for lock files, created if needed,
+                        if None loads are only deduplicated within
+                        this process
+        """
+        self._networkfactory = networkfactory
+        self._lockdir = lockdir
+        self._singleflight = SingleFlight(share=_share_network)
+
+    def get_lock_file(self, ndex_uuid):
+        """
+        Gets path to lock file for network
+        :param ndex_uuid:
+        :return: path to lock file or None if no lock dir was set
+        """
+        if self._lockdir is None:
+            return None
+        return os.path.join(self._lockdir, str(ndex_uuid) +
+                            SingleFlightNetworkFactory.LOCK_SUFFIX)
+
+    def get_networkx_object(self, ndex_uuid):
+        """
+        Gets network from wrapped factory sharing any in flight
+        load of the same network
+        :param ndex_uuid: NDEx uuid to get
+        :return: network or None if unable to load
+        """
+        if ndex_uuid is None:
+            logger.error('UUID passed in is None')
+            return None
+        return self._singleflight.do(ndex_uuid,
+                                     lambda: self._load_network(ndex_uuid))
+
+    def _load_network(self, ndex_uuid):
+        """
+        Loads network from wrapped factory holding lock file for
+        network if a lock dir was set
+        :param ndex_uuid:
+        :return: network
+        """
+        lockfile = self.get_lock_file(ndex_uuid)
+        if lockfile is None:
+            return self._networkfactory.get_networkx_object(ndex_uuid)
+
+        if not os.path.isdir(self._lockdir):
+            os.makedirs(self._lockdir, mode=0o755, exist_ok=True)
+        logger.debug('Acquiring lock: ' + lockfile)
+        with FileLock(lockfile):
+            return self._networkfactory.get_networkx_object(ndex_uuid)
+
+
+class CompiledNetworkFactory(object):
+    """
+    Factory that returns :py:class:`CompiledNetwork` objects loaded
+    from a directory of compiled network files named by NDEx UUID.
+    Networks missing from the directory are obtained from
+    another network factory, compiled, and saved to the directory.
+    """
+
+    SUFFIX = '.nagacsr'
+
+    def __init__(self, compileddir, networkfactory=None):
+        """
+        Constructor
+        :param compileddir: directory containing compiled networks,
+                            created if needed
+        :param networkfactory: factory used to get networks not
+                               found in compileddir, can be None
+        """
+        self._compileddir = compileddir
+        self._networkfactory = networkfactory
+
+    def get_compiled_network_file(self, ndex_uuid):
+        """
+        Gets path where compiled network for ndex_uuid is stored
+        :param ndex_uuid:
+        :return: path to compiled network
+        """
+        return os.path.join(self._compileddir, str(ndex_uuid) +
+                            CompiledNetworkFactory.SUFFIX)
+
+    def get_networkx_object(self, ndex_uuid):
+        """
+        Gets network with ndex_uuid as a :py:class:`CompiledNetwork`
+        :param ndex_uuid: NDEx uuid to get
+        :return: CompiledNetwork or None if unable to load
+        """
+        if ndex_uuid is None:
+            logger.error('UUID passed in is None')
+            return None
+
+        compiled_file = self.get_compiled_network_file(ndex_uuid)
+        if os.path.isfile(compiled_file):
+            logger.info('Loading compiled network: ' + compiled_file)
+            return CompiledNetwork.load(compiled_file)
+
+        if self._networkfactory is None:
+            logger.error('No compiled network found for ' + ndex_uuid)
+            return None
+
+        network = self._networkfactory.get_networkx_object(ndex_uuid)
+        if network is None:
+            return None
+        if not isinstance(network, CompiledNetwork):
+            logger.info('Compiling network ' + ndex_uuid)
+            network = CompiledNetwork.\
+                from_networkx(network,
+                              name_attribute=NagaTaskRunner.NDEX_NAME)
+        if not os.path.isdir(self._compileddir):
+            os.makedirs(self._compileddir, mode=0o755)
+        network.save(compiled_file, metadata={nbgwas_rest.NDEX_PARAM:
+                                              ndex_uuid})
+        logger.info('Saved compiled network: ' + compiled_file)
+        return CompiledNetwork.load(compiled_file)
+
+
+def _random_walk(heat, adjacency_matrix, alpha, normalize=True):
+    """
+    Runs :py:func:`nbgwas.propagation.random_walk_rst` on heat
+    returning a dense array. For single precision heat the
+    convergence threshold is raised to the rounding error of heat
+    since the default of 1e-7 may never be reached.
+    :param heat: numpy array with a row of heat per node
+                 attribute and a column per node
+    :param adjacency_matrix: scipy.sparse matrix in same precision
+                             as heat
+    :param alpha: restart probability
+    :param normalize: if True row normalize adjacency_matrix first
+    :return: numpy array of propagated heat in same shape as heat
+    """
+    kwargs = {}
+    if heat.dtype != np.float64:
+        kwargs['threshold'] = max(1e-7, 10 * np.finfo(heat.dtype).eps *
+                                  float(np.linalg.norm(heat)))
+    out = random_walk_rst(heat, adjacency_matrix, alpha,
+                          normalize=normalize, **kwargs)
+    return np.asarray(out.todense())
+
+
+class PropagationOperator(object):
+    """
+    Random walk with restart propagation over a network for a
+    given alpha. Holds either the dense kernel
+    alpha * inv(I - (1 - alpha) * W), where W is the row normalized
+    adjacency matrix, so propagation is a single matrix product, or
+    just W in which case propagation is done iteratively via
+    :py:func:`nbgwas.propagation.random_walk_rst`
+    """
+
+    def __init__(self, alpha, kernel=None, transition_matrix=None):
+        """
+        Constructor, one of kernel or transition_matrix must be set
+        :param alpha: restart probability
+        :param kernel: dense numpy array propagation kernel
+        :param transition_matrix: row normalized scipy.sparse matrix
+        """
+        self._alpha = alpha
+        self._kernel = kernel
+        self._transition_matrix = transition_matrix
+
+    @classmethod
+    def build(cls, adjacency_matrix, alpha, max_kernel_size=None,
+              dtype=np.float64):
+        """
+        Creates PropagationOperator for adjacency_matrix
+        :param adjacency_matrix: scipy.sparse adjacency matrix
+        :param alpha: restart probability
+        :param max_kernel_size: maximum size in bytes of dense kernel,
+                                if kernel would be larger only the
+                                transition matrix is kept. None
+                                means no limit
+        :param dtype: numpy dtype of kernel or transition matrix, the
+                      kernel is always computed in double precision
+        :return: PropagationOperator
+        """
+        transition = sparse_normalize(adjacency_matrix,
+                                      axis=1).astype(dtype)
+        num_nodes = transition.shape[0]
+        kernel_size = num_nodes * num_nodes * np.dtype(dtype).itemsize
+        if max_kernel_size is not None and kernel_size > max_kernel_size:
+            logger.info('Kernel of ' + str(kernel_size) + ' bytes exceeds ' +
+                        str(max_kernel_size) + ' bytes, keeping only '
+                        'transition matrix')
+            return cls(alpha, transition_matrix=transition)
+
+        logger.info('Computing propagation kernel for ' + str(num_nodes) +
+                    ' nodes with alpha ' + str(alpha))
+        walk = np.identity(num_nodes) - \
+            (1 - alpha) * transition.astype(np.float64).toarray()
+        return cls(alpha, kernel=(alpha *
+                                  np.linalg.inv(walk)).astype(dtype,
+                                                              copy=False))
+
+    def get_alpha(self):
+        """
+        Gets restart probability
+        :return:
+        """
+        return self._alpha
+
+    def get_kernel(self):
+        """
+        Gets dense kernel
+        :return: numpy array or None if operator has no kernel
+        """
+        return self._kernel
+
+    def get_size(self):
+        """
+        Gets size in bytes of data held by operator
+        :return:
+        """
+        if self._kernel is not None:
+            return self._kernel.nbytes
+        return (self._transition_matrix.data.nbytes +
+                self._transition_matrix.indices.nbytes +
+                self._transition_matrix.indptr.nbytes)
+
+    def propagate(self, heat):
+        """
+        Propagates heat
+        :param heat: numpy array with a row of heat per node
+                     attribute and a column per node
+        :return: numpy array of propagated heat in same shape as heat
+        """
+        if self._kernel is not None:
+            return np.dot(np.asarray(heat, dtype=self._kernel.dtype),
+                          self._kernel)
+        return _random_walk(np.asarray(heat,
+                                       dtype=self._transition_matrix.dtype),
+                            self._transition_matrix, self._alpha,
+                            normalize=False)
+
+
+class SparseDiffusionSolver(object):
+    """
+    Solves random walk with restart, f = (1 - alpha) f W + alpha f0
+    where W is the row normalized adjacency matrix, keeping heat as
+    dense vectors and W as a sparse matrix so cost per iteration is
+    proportional to the number of edges. Uses either power iteration
+    or the BiCGSTAB Krylov solver on (I - (1 - alpha) W^T) f = alpha f0
+    """
+
+    DEFAULT_TOLERANCE = 1e-6
+    DEFAULT_MAX_ITERATIONS = 1000
+
+    SOLVER_KEY = 'solver'
+    ALPHA_KEY = 'alpha'
+    TOLERANCE_KEY = 'tolerance'
+    MAX_ITERATIONS_KEY = 'maxiterations'
+    COLUMNS_KEY = 'columns'
+    ITERATIONS_KEY = 'iterations'
+    RESIDUAL_KEY = 'residual'
+    CONVERGED_KEY = 'converged'
+
+    def __init__(self, solver=nbgwas_rest.POWER_SOLVER, tolerance=None,
+                 max_iterations=None, dtype=np.float64):
+        """
+        Constructor
+        :param solver: nbgwas_rest.POWER_SOLVER or
+                       nbgwas_rest.KRYLOV_SOLVER
+        :param tolerance: relative tolerance, if None DEFAULT_TOLERANCE
+                          is used
+        :param max_iterations: maximum iterations per solve, if None
+                               DEFAULT_MAX_ITERATIONS is used
+        :param dtype: numpy dtype heat and transition matrix are
+                      solved in
+        :raises ValueError: if solver is not a supported solver
+        """
+        if solver not in [nbgwas_rest.POWER_SOLVER,
+                          nbgwas_rest.KRYLOV_SOLVER]:
+            raise ValueError('Unsupported solver: ' + str(solver))
+        if tolerance is None:
+            tolerance = SparseDiffusionSolver.DEFAULT_TOLERANCE
+        if max_iterations is None:
+            max_iterations = SparseDiffusionSolver.DEFAULT_MAX_ITERATIONS
+        self._solver = solver
+        self._tolerance = tolerance
+        self._max_iterations = max_iterations
+        self._dtype = dtype
+
+    def solve(self, adjacency_matrix, heat, alpha, names=None):
+        """
+        Propagates heat over network
+        :param adjacency_matrix: scipy.sparse adjacency matrix
+        :param heat: numpy array with a row of heat per node
+                     attribute and a column per node
+        :param alpha: restart probability
+        :param names: list of names for rows of heat used as keys
+                      of per row statistics, if None row index is used
+        :return: tuple (numpy array of propagated heat in same shape as
+                 heat, dict of convergence statistics)
+        """
+        if names is None:
+            names = [str(i) for i in range(heat.shape[0])]
+        transition = sparse_normalize(csr_matrix(adjacency_matrix),
+                                      axis=1).transpose().tocsr().\
+            astype(self._dtype)
+        restart = alpha * np.asarray(heat, dtype=self._dtype).T
+        logger.info('Running ' + self._solver + ' solver with tolerance ' +
+                    str(self._tolerance) + ' and at most ' +
+                    str(self._max_iterations) + ' iterations')
+        if self._solver == nbgwas_rest.POWER_SOLVER:
+            out, iterations = self._power_iteration(transition, restart,
+                                                    alpha)
+        else:
+            out, iterations = self._krylov(transition, restart, alpha)
+
+        stats = {SparseDiffusionSolver.SOLVER_KEY: self._solver,
+                 SparseDiffusionSolver.ALPHA_KEY: alpha,
+                 SparseDiffusionSolver.TOLERANCE_KEY: self._tolerance,
+                 SparseDiffusionSolver.MAX_ITERATIONS_KEY:
+                     self._max_iterations,
+                 SparseDiffusionSolver.COLUMNS_KEY: {}}
+        residuals = self._get_relative_residuals(transition, restart,
+                                                 alpha, out)
+        for col, name in enumerate(names):
+            stats[SparseDiffusionSolver.COLUMNS_KEY][name] = {
+                SparseDiffusionSolver.ITERATIONS_KEY: int(iterations[col]),
+                SparseDiffusionSolver.RESIDUAL_KEY: float(residuals[col]),
+                SparseDiffusionSolver.CONVERGED_KEY:
+                    bool(residuals[col] <= self._tolerance)}
+        return out.T, stats
+
+    def _power_iteration(self, transition, restart, alpha):
+        """
+        Runs power iteration on all columns of restart at once
+        stopping once change in every column, relative to the column
+        of restart, falls to tolerance
+        :param transition: transposed transition matrix
+        :param restart: alpha times heat with a column per attribute
+        :param alpha: restart probability
+        :return: tuple (solution, array of iterations per column)
+        """
+        limits = self._tolerance * np.linalg.norm(restart, axis=0)
+        iterations = np.zeros(restart.shape[1], dtype=np.int64)
+        active = np.ones(restart.shape[1], dtype=bool)
+        cur = restart.copy()
+        counter = 0
+        while np.any(active) and counter < self._max_iterations:
+            nxt = (1 - alpha) * transition.dot(cur) + restart
+            counter += 1
+            deltas = np.linalg.norm(nxt - cur, axis=0)
+            cur = nxt
+            iterations[active] = counter
+            active &= deltas > limits
+        if np.any(active):
+            logger.warning('Power iteration did not converge in ' +
+                           str(self._max_iterations) + ' iterations')
+        return cur, iterations
+
+    def _krylov(self, transition, restart, alpha):
+        """
+        Solves each column of restart with BiCGSTAB
+        :param transition: transposed transition matrix
+        :param restart: alpha times heat with a column per attribute
+        :param alpha: restart probability
+        :return: tuple (solution, array of iterations per column)
+        """
+        walk = sparse_identity(transition.shape[0], format='csr',
+                               dtype=transition.dtype) - \
+            (1 - alpha) * transition
+        out = np.zeros(restart.shape, dtype=restart.dtype)
+        iterations = np.zeros(restart.shape[1], dtype=np.int64)
+        for col in range(restart.shape[1]):
+            b = restart[:, col]
+            if not np.any(b):
+                continue
+            counter = [0]
+
+            def count_iteration(xk):
+                counter[0] += 1
+            kwargs = {BICGSTAB_TOLERANCE_KEYWORD: self._tolerance}
+            x, info = bicgstab(walk, b, x0=b.copy(), atol=0.0,
+                               maxiter=self._max_iterations,
+                               callback=count_iteration, **kwargs)
+            if info != 0:
+                logger.warning('BiCGSTAB exited with info ' + str(info))
+            out[:, col] = x
+            iterations[col] = counter[0]
+        return out, iterations
+
+    def _get_relative_residuals(self, transition, restart, alpha, out):
+        """
+        Gets norm of residual, restart - (I - (1 - alpha) W^T) out,
+        of each column relative to norm of column of restart
+        :param transition: transposed transition matrix
+        :param restart: alpha times heat with a column per attribute
+        :param alpha: restart probability
+        :param out: solution with a column per attribute
+        :return: numpy array of relative residuals
+        """
+        residual = np.linalg.norm(restart - out +
+                                  (1 - alpha) * transition.dot(out), axis=0)
+        norms = np.linalg.norm(restart, axis=0)
+        norms[norms == 0] = 1.0
+        return residual / norms
+
+
+class SpectralDecomposition(object):
+    """
+    Truncated eigendecomposition of the symmetric normalized
+    adjacency matrix S = D^-1/2 A D^-1/2 of an undirected network
+    where D holds node degrees. Since the row normalized matrix
+    W = D^-1 A equals D^-1/2 S D^1/2, random walk with restart for
+    any alpha can be approximated from the decomposition as
+
+    f^T = alpha D^1/2 (I + U g(L) U^T) D^-1/2 f0^T
+
+    with g(l) = 1 / (1 - (1 - alpha) l) - 1, at a cost of
+    O(nodes x rank) per heat vector. Nodes without edges are given
+    a degree of 1 so their heat is just scaled by alpha.
+    """
+
+    VALUES = 'values'
+    VECTORS = 'vectors'
+    SCALE = 'scale'
+
+    def __init__(self, values, vectors, scale):
+        """
+        Constructor
+        :param values: numpy array of eigenvalues
+        :param vectors: numpy array with an eigenvector per column
+        :param scale: numpy array holding square root of degree
+                      of each node
+        """
+        self._values = values
+        self._vectors = vectors
+        self._scale = scale
+
+    @classmethod
+    def build(cls, adjacency_matrix, rank, dtype=np.float64):
+        """
+        Computes the rank largest eigenvalues and corresponding
+        eigenvectors of the symmetric normalized adjacency matrix.
+        Uses :py:func:`scipy.sparse.linalg.eigsh` unless rank is
+        close to number of nodes in which case the full dense
+        decomposition is computed and truncated.
+        :param adjacency_matrix: symmetric scipy.sparse adjacency matrix
+        :param rank: number of eigenpairs to keep, capped at number
+                     of nodes
+        :param dtype: numpy dtype decomposition is stored in, it is
+                      always computed in double precision
+        :return: SpectralDecomposition
+        """
+        adj = csr_matrix(adjacency_matrix, dtype=np.float64)
+        num_nodes = adj.shape[0]
+        degrees = np.asarray(adj.sum(axis=1)).ravel()
+        degrees[degrees == 0] = 1.0
+        scale = np.sqrt(degrees)
+        inv_scale = csr_matrix((1.0 / scale, (np.arange(num_nodes),
+                                              np.arange(num_nodes))),
+                               shape=(num_nodes, num_nodes))
+        normalized = inv_scale.dot(adj).dot(inv_scale)
+        rank = min(rank, num_nodes)
+        logger.info('Computing rank ' + str(rank) + ' decomposition for ' +
+                    str(num_nodes) + ' nodes')
+        if rank >= num_nodes - 1:
+            values, vectors = np.linalg.eigh(normalized.toarray())
+            values = values[num_nodes - rank:]
+            vectors = vectors[:, num_nodes - rank:]
+        else:
+            values, vectors = eigsh(normalized, k=rank, which='LA')
+        return cls(values.astype(dtype),
+                   np.ascontiguousarray(vectors, dtype=dtype),
+                   scale.astype(dtype))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads decomposition saved via :py:meth:`save`
+        :param path: path to array bundle file
+        :param mmap: if True memory map the file
+        :return: SpectralDecomposition
+        """
+        arrays, metadata = arraybundle.read_array_bundle(path, mmap=mmap)
+        return cls(arrays[SpectralDecomposition.VALUES],
+                   arrays[SpectralDecomposition.VECTORS],
+                   arrays[SpectralDecomposition.SCALE])
+
+    def save(self, path):
+        """
+        Saves decomposition to path as an array bundle
+        :param path: path to write to
+        :return: None
+        """
+        arraybundle.write_array_bundle(path, {
+            SpectralDecomposition.VALUES: self._values,
+            SpectralDecomposition.VECTORS: self._vectors,
+            SpectralDecomposition.SCALE: self._scale})
+
+    def get_rank(self):
+        """
+        Gets number of eigenpairs kept
+        :return:
+        """
+        return len(self._values)
+
+    def get_size(self):
+        """
+        Gets size in bytes of data held by decomposition
+        :return:
+        """
+        return (self._values.nbytes + self._vectors.nbytes +
+                self._scale.nbytes)
+
+    def propagate(self, heat, alpha):
+        """
+        Approximates random walk with restart of heat
+        :param heat: numpy array with a row of heat per node
+                     attribute and a column per node
+        :param alpha: restart probability
+        :return: numpy array of propagated heat in same shape as heat
+        """
+        scaled = np.asarray(heat, dtype=self._vectors.dtype).T / \
+            self._scale[:, np.newaxis]
+        gain = 1.0 / (1.0 - (1.0 - alpha) * self._values) - 1.0
+        projected = gain[:, np.newaxis] * self._vectors.T.dot(scaled)
+        out = scaled + self._vectors.dot(projected)
+        return (alpha * self._scale[:, np.newaxis] * out).T
+
+
+class LowRankDiffusionSolver(SparseDiffusionSolver):
+    """
+    Approximates random walk with restart from a truncated
+    :py:class:`SpectralDecomposition` of the network. Once the
+    decomposition is computed, which does not depend on alpha,
+    diffusion costs time proportional to nodes times rank. If a
+    :py:class:`PropagationOperatorCache` is given, decompositions
+    are kept there between tasks.
+
+    The relative residual of the linear system solved exactly by
+    :py:class:`SparseDiffusionSolver` is reported for each column
+    as a measure of the error of the approximation.
+    """
+
+    DEFAULT_RANK = 100
+
+    RANK_KEY = 'rank'
+
+    def __init__(self, rank=None, tolerance=None, ndex_id=None,
+                 operatorcache=None, dtype=np.float64):
+        """
+        Constructor
+        :param rank: number of eigenpairs to use, if None
+                     DEFAULT_RANK is used
+        :param tolerance: relative residual at or below which a column
+                          is reported as converged, if None
+                          :py:const:`SparseDiffusionSolver.DEFAULT_TOLERANCE`
+                          is used
+        :param ndex_id: NDEx UUID of network used in cache key
+        :param operatorcache: :py:class:`PropagationOperatorCache` or None
+        :param dtype: numpy dtype of decomposition and heat
+        """
+        super().__init__(solver=nbgwas_rest.POWER_SOLVER,
+                         tolerance=tolerance, dtype=dtype)
+        self._solver = nbgwas_rest.LOWRANK_SOLVER
+        if rank is None:
+            rank = LowRankDiffusionSolver.DEFAULT_RANK
+        self._rank = rank
+        self._ndex_id = ndex_id
+        self._operatorcache = operatorcache
+
+    def solve(self, adjacency_matrix, heat, alpha, names=None):
+        """
+        Propagates heat over network
+        :param adjacency_matrix: symmetric scipy.sparse adjacency matrix
+        :param heat: numpy array with a row of heat per node
+                     attribute and a column per node
+        :param alpha: restart probability
+        :param names: list of names for rows of heat used as keys
+                      of per row statistics, if None row index is used
+        :return: tuple (numpy array of propagated heat in same shape as
+                 heat, dict of approximation statistics)
+        """
+        if names is None:
+            names = [str(i) for i in range(heat.shape[0])]
+        if self._operatorcache is not None:
+            decomposition = self._operatorcache.\
+                get_decomposition(self._ndex_id, adjacency_matrix,
+                                  self._rank, dtype=self._dtype)
+        else:
+            decomposition = SpectralDecomposition.build(adjacency_matrix,
+                                                        self._rank,
+                                                        dtype=self._dtype)
+        out = decomposition.propagate(heat, alpha)
+
+        transition = sparse_normalize(csr_matrix(adjacency_matrix),
+                                      axis=1).transpose().tocsr().\
+            astype(self._dtype)
+        restart = alpha * np.asarray(heat, dtype=self._dtype).T
+        residuals = self._get_relative_residuals(transition, restart,
+                                                 alpha, out.T)
+        stats = {SparseDiffusionSolver.SOLVER_KEY: self._solver,
+                 SparseDiffusionSolver.ALPHA_KEY: alpha,
+                 SparseDiffusionSolver.TOLERANCE_KEY: self._tolerance,
+                 LowRankDiffusionSolver.RANK_KEY:
+                     decomposition.get_rank(),
+                 SparseDiffusionSolver.COLUMNS_KEY: {}}
+        for col, name in enumerate(names):
+            stats[SparseDiffusionSolver.COLUMNS_KEY][name] = {
+                SparseDiffusionSolver.RESIDUAL_KEY: float(residuals[col]),
+                SparseDiffusionSolver.CONVERGED_KEY:
+                    bool(residuals[col] <= self._tolerance)}
+        return out, stats
+
+
+class PropagationOperatorCache(object):
+    """
+    Keeps :py:class:`PropagationOperator` objects in memory,
+    keyed by NDEx UUID, a digest of the adjacency matrix, and alpha,
+    so tasks using the same network and alpha reuse them. If a spill
+    directory is set, kernels are also saved there as .npy files
+    and memory mapped so they survive restarts of the task runner.
+    :py:class:`SpectralDecomposition` objects used by
+    :py:class:`LowRankDiffusionSolver` are kept the same way.
+    """
+
+    KERNEL_SUFFIX = '.npy'
+    DECOMPOSITION_SUFFIX = '.decomposition'
+
+    def __init__(self, max_size=None, spilldir=None,
+                 max_kernel_size=None):
+        """
+        Constructor
+        :param max_size: memory budget in bytes for operators, if None
+                         there is no limit
+        :param spilldir: directory to save kernels to, created if
+                         needed, None disables saving
+        :param max_kernel_size: maximum size in bytes of a dense kernel
+                                see :py:meth:`PropagationOperator.build`
+        """
+        self._operators = InMemoryLRUCache(max_size=max_size)
+        self._spilldir = spilldir
+        self._max_kernel_size = max_kernel_size
+
+    def get_network_key(self, ndex_id, adjacency_matrix):
+        """
+        Gets key identifying network
+        :param ndex_id: NDEx UUID of network
+        :param adjacency_matrix: scipy.sparse adjacency matrix
+        :return: str key
+        """
+        adj = csr_matrix(adjacency_matrix)
+        digest = hashlib.sha1()
+        digest.update(str(adj.shape).encode('utf-8'))
+        for arr in [adj.indptr, adj.indices, adj.data]:
+            digest.update(np.ascontiguousarray(arr).tobytes())
+        return str(ndex_id) + '_' + digest.hexdigest()
+
+    def get_key(self, ndex_id, adjacency_matrix, alpha,
+                dtype=np.float64):
+        """
+        Gets key for operator
+        :param ndex_id: NDEx UUID of network
+        :param adjacency_matrix: scipy.sparse adjacency matrix
+        :param alpha: restart probability
+        :param dtype: numpy dtype of operator
+        :return: str key
+        """
+        return (self.get_network_key(ndex_id, adjacency_matrix) + '_' +
+                repr(float(alpha)) + self._get_dtype_suffix(dtype))
+
+    def _get_dtype_suffix(self, dtype):
+        """
+        Gets suffix added to keys of operators not in double precision
+        so keys of double precision operators stay the same
+        :param dtype: numpy dtype
+        :return: str
+        """
+        if np.dtype(dtype) == np.float64:
+            return ''
+        return '_' + np.dtype(dtype).name
+
+    def get_kernel_file(self, key):
+        """
+        Gets path to kernel file for key
+        :param key: key from :py:meth:`get_key`
+        :return: path or None if no spill directory was set
+        """
+        if self._spilldir is None:
+            return None
+        return os.path.join(self._spilldir,
+                            key + PropagationOperatorCache.KERNEL_SUFFIX)
+
+    def get_operator(self, ndex_id, adjacency_matrix, alpha,
+                     dtype=np.float64):
+        """
+        Gets operator for network and alpha, loading it from spill
+        directory or building it if not in memory
+        :param ndex_id: NDEx UUID of network
+        :param adjacency_matrix: scipy.sparse adjacency matrix
+        :param alpha: restart probability
+        :param dtype: numpy dtype of operator
+        :return: :py:class:`PropagationOperator`
+        """
+        key = self.get_key(ndex_id, adjacency_matrix, alpha, dtype=dtype)
+        operator = self._operators.get(key)
+        if operator is not None:
+            logger.info('Using cached propagation operator ' + key)
+            return operator
+
+        kernel_file = self.get_kernel_file(key)
+        if kernel_file is not None and os.path.isfile(kernel_file):
+            logger.info('Loading propagation kernel: ' + kernel_file)
+            operator = PropagationOperator(alpha,
+                                           kernel=np.load(kernel_file,
+                                                          mmap_mode='r'))
+        else:
+            operator = PropagationOperator.\
+                build(adjacency_matrix, alpha,
+                      max_kernel_size=self._max_kernel_size, dtype=dtype)
+            if kernel_file is not None and \
+                    operator.get_kernel() is not None:
+                operator = self._spill_kernel(kernel_file, operator)
+
+        self._operators.put(key, operator, operator.get_size())
+        return operator
+
+    def get_decomposition(self, ndex_id, adjacency_matrix, rank,
+                          dtype=np.float64):
+        """
+        Gets :py:class:`SpectralDecomposition` of network, loading it
+        from spill directory or building it if not in memory
+        :param ndex_id: NDEx UUID of network
+        :param adjacency_matrix: scipy.sparse adjacency matrix
+        :param rank: number of eigenpairs
+        :param dtype: numpy dtype of decomposition
+        :return: :py:class:`SpectralDecomposition`
+        """
+        key = (self.get_network_key(ndex_id, adjacency_matrix) +
+               '_rank' + str(rank) + self._get_dtype_suffix(dtype))
+        decomposition = self._operators.get(key)
+        if decomposition is not None:
+            logger.info('Using cached decomposition ' + key)
+            return decomposition
+
+        decomposition_file = None
+        if self._spilldir is not None:
+            decomposition_file = os.path.join(self._spilldir, key +
+                                              PropagationOperatorCache.
+                                              DECOMPOSITION_SUFFIX)
+        if decomposition_file is not None and \
+                os.path.isfile(decomposition_file):
+            logger.info('Loading decomposition: ' + decomposition_file)
+            decomposition = SpectralDecomposition.load(decomposition_file)
+        else:
+            decomposition = SpectralDecomposition.build(adjacency_matrix,
+                                                        rank, dtype=dtype)
+            if decomposition_file is not None:
+                if not os.path.isdir(self._spilldir):
+                    os.makedirs(self._spilldir, mode=0o755, exist_ok=True)
+                decomposition.save(decomposition_file)
+                logger.info('Saved decomposition: ' + decomposition_file)
+                decomposition = SpectralDecomposition.\
+                    load(decomposition_file)
+
+        self._operators.put(key, decomposition, decomposition.get_size())
+        return decomposition
+
+    def _spill_kernel(self, kernel_file, operator):
+        """
+        Saves kernel of operator to kernel_file and returns
+        operator with kernel memory mapped from that file
+        :param kernel_file: path to save kernel to
+        :param operator: :py:class:`PropagationOperator` with kernel
+        :return: :py:class:`PropagationOperator`
+        """
+        if not os.path.isdir(self._spilldir):
+            os.makedirs(self._spilldir, mode=0o755, exist_ok=True)
+        tmpfile = kernel_file + NDExNetworkDiskCache.TMP_SUFFIX
+        with open(tmpfile, 'wb') as f:
+            np.save(f, operator.get_kernel())
+        os.rename(tmpfile, kernel_file)
+        logger.info('Saved propagation kernel: ' + kernel_file)
+        return PropagationOperator(operator.get_alpha(),
+                                   kernel=np.load(kernel_file,
+                                                  mmap_mode='r'))
+
+
+class TaskPrefetcher(object):
+    """
+    Loads networks and protein coding files of upcoming tasks in a
+    background thread so network I/O overlaps with processing of the
+    current task. At most max_depth networks are held by the
+    prefetcher at any time.
+    """
+
+    READ_CHUNK_SIZE = 1048576
+
+    def __init__(self, networkloader, max_depth=1, proteincodingcache=None):
+        """
+        Constructor
+        :param networkloader: function that takes an NDEx uuid and
+                              returns network for that uuid
+        :param max_depth: maximum number of networks to prefetch
+        :param proteincodingcache: If set, a
+                                   :py:class:`ProteinCodingTableCache`
+                                   protein coding files are parsed into,
+                                   otherwise protein coding files are
+                                   only read into the operating system
+                                   file cache
+        """
+        self._networkloader = networkloader
+        self._max_depth = max_depth
+        self._proteincodingcache = proteincodingcache
+        self._networks = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def prefetch_tasks(self, tasks):
+        """
+        Starts prefetching data for tasks, in order, up to max depth
+        set in constructor. Any prefetched networks not needed by
+        tasks are discarded.
+        :param tasks: list of tasks in the order they will be run
+        :return: list of NDEx uuids that were newly queued for prefetch
+        """
+        wanted = []
+        for task in tasks:
+            ndex_id = task.get_ndex()
+            if ndex_id is not None and ndex_id not in wanted:
+                wanted.append(ndex_id)
+        wanted = wanted[:self._max_depth]
+
+        queued = []
+        with self._lock:
+            for ndex_id in list(self._networks.keys()):
+                if ndex_id not in wanted:
+                    logger.debug('Discarding prefetch of ' + ndex_id)
+                    del self._networks[ndex_id]
+
+            for task in tasks:
+                ndex_id = task.get_ndex()
+                if ndex_id not in wanted or ndex_id in self._networks:
+                    continue
+                logger.info('Prefetching network ' + ndex_id +
+                            ' for task ' + str(task.get_taskdir()))
+                self._networks[ndex_id] = self._executor.\
+                    submit(self._prefetch, ndex_id,
+                           task.get_protein_coding_file())
+                queued.append(ndex_id)
+        return queued
+
+    def _prefetch(self, ndex_id, protein_coding_file):
+        """
+        Parses protein coding file into protein coding cache, or
+        if no cache was set reads it so it is in the operating system
+        file cache, and loads network
+        :param ndex_id: NDEx uuid of network to load
+        :param protein_coding_file: path to protein coding file or None
+        :return: network
+        """
+        if protein_coding_file is not None:
+            try:
+                if self._proteincodingcache is not None:
+                    self._proteincodingcache.get_table(protein_coding_file)
+                else:
+                    with open(protein_coding_file, 'rb') as f:
+                        while f.read(TaskPrefetcher.READ_CHUNK_SIZE):
+                            pass
+            except Exception as e:
+                logger.warning('Unable to read ' + protein_coding_file +
+                               ' : ' + str(e))
+        return self._networkloader(ndex_id)
+
+    def get_network(self, ndex_id):
+        """
+        Gets prefetched network, waiting for prefetch to finish if
+        needed. The network is removed from the prefetcher.
+        :param ndex_id: NDEx uuid of network
+        :return: network or None if network was not prefetched or
+                 prefetch failed
+        """
+        with self._lock:
+            future = self._networks.pop(ndex_id, None)
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception:
+            logger.exception('Prefetch of network ' + ndex_id + ' failed')
+            return None
+
+    def get_number_of_networks(self):
+        """
+        Gets number of networks prefetched or being prefetched
+        :return:
+        """
+        with self._lock:
+            return len(self._networks)
+
+    def shutdown(self):
+        """
+        Discards prefetched networks and stops background thread
+        :return: None
+        """
+        with self._lock:
+            self._networks.clear()
+        self._executor.shutdown(wait=True)
+
+
+class NagaTaskRunner(object):
+    """
+    Runs tasks created by Nbgwas REST service
+    """
+
+    NDEX_NAME = 'name'
+
+    NEGATIVE_LOG = 'Negative Log'
+    BINARIZED_HEAT = 'Binarized Heat'
+    BINARIZE_HEAT_METHOD = 'binarize'
+    NEG_LOG_HEAT_METHOD = 'neg_log'
+    DIFFUSED_LOG = 'Diffused (Log)'
+    DIFFUSED_BINARIZED = 'Diffused (Binarized)'
+    DIFFUSE_METHOD = 'random_walk'
+
+    # node table columns diffused for every task and columns
+    # the diffused values are written to
+    HEAT_COLUMNS = [BINARIZED_HEAT, NEGATIVE_LOG]
+    DIFFUSED_COLUMNS = [DIFFUSED_BINARIZED, DIFFUSED_LOG]
+
+    # rough per node and per edge memory cost of relabeled
+    # networkx graphs used to account for them in networkxcache
+    NETWORKX_NODE_BYTES = 1024
+    NETWORKX_EDGE_BYTES = 512
+
+    def __init__(self, wait_time=30,
+                 taskfactory=None,
+                 networkfactory=None,
+                 deletetaskfactory=None,
+                 networkxcache=None,
+                 prefetch_depth=0,
+                 operatorcache=None,
+                 batch_size=1,
+                 precision=nbgwas_rest.FLOAT64_PRECISION,
+                 snp_chunk_size=0,
+                 proteincodingcache=None,
+                 workers=1,
+                 genecache=None):
+        """
+        Constructor
+        :param wait_time: time in seconds to wait when no tasks are found
+        :param taskfactory: factory that returns tasks to process
+        :param networkfactory: factory that returns networks
+        :param deletetaskfactory: factory that returns tasks to delete
+        :param networkxcache: If set, an :py:class:`InMemoryLRUCache`
+                              used to hold relabeled networks between tasks
+        :param prefetch_depth: number of queued tasks after the current
+                               one to prefetch data for via
+                               :py:class:`TaskPrefetcher`, 0 disables
+                               prefetching. Requires taskfactory to
+                               have a get_next_tasks() method
+        :param operatorcache: If set, a
+                              :py:class:`PropagationOperatorCache` used
+                              to reuse propagation operators between
+                              tasks
+        :param batch_size: maximum number of tasks sharing network,
+                           alpha, and solver settings to process
+                           together. Values greater than 1 require
+                           taskfactory to have a get_next_tasks() method
+        :param precision: numeric precision, one of
+                          nbgwas_rest.PRECISIONS, used for tasks that
+                          do not set one
+        :param snp_chunk_size: If greater than 0, SNP level summaries
+                               are read this many rows at a time and
+                               SNPs assigned to genes incrementally
+                               via :py:mod:`nbgwas_rest.snpassign`
+                               bounding memory used by large files
+        :param proteincodingcache: If set, a
+                                   :py:class:`ProteinCodingTableCache`
+                                   used to parse protein coding files
+                                   once and share them between tasks
+        :param workers: number of threads used to assign SNPs of
+                        different chromosomes to genes concurrently,
+                        1 assigns them in the calling thread
+        :param genecache: If set, a :py:class:`GeneHeatDiskCache`
+                          used to reuse genes with heat between tasks
+                          with the same SNP level summary, protein
+                          coding file, window, and column labels
+        """
+        self._taskfactory = taskfactory
+        self._wait_time = wait_time
+        self._networkfactory = networkfactory
+        self._deletetaskfactory = deletetaskfactory
+        self._networkxcache = networkxcache
+        self._prefetch_depth = prefetch_depth
+        self._operatorcache = operatorcache
+        self._batch_size = batch_size
+        self._precision = precision
+        self._snp_chunk_size = snp_chunk_size
+        self._proteincodingcache = proteincodingcache
+        self._genecache = genecache
+        self._pc_sha256s = FileSha256Memo()
+        self._assign_executor = None
+        if workers > 1:
+            self._assign_executor = ThreadPoolExecutor(max_workers=workers)
+        self._prefetcher = None
+        if prefetch_depth > 0:
+            self._prefetcher = TaskPrefetcher(self.
+                                              _load_networkx_object_from_ndex,
+                                              max_depth=prefetch_depth + 1,
+                                              proteincodingcache=self.
+                                              _proteincodingcache)
+
+    def _get_networkx_object(self, task):
+        """
+        Examines task and generates appropriate
+        networkx object that is returned
+        :param task:
+        :return: same task object
+        """
+        if task is None:
+            logger.error('task is None')
+            return None
+
+        ndex_id = task.get_ndex()
+        if ndex_id is not None:
+            return self._get_networkx_object_from_ndex(ndex_id)
+
+        return None
+
+    def _get_networkx_object_from_ndex(self, ndex_id):
+        """
+        Extracts networkx object from ndex and relabels the nodes
+        by the name of the node set as NDEX_NAME attribute.
+        For example if original NDEx network looked like this if
+        str(network.node):
+
+        {1: {'name': 'node1'}, 2: {'name': 'node2'}}
+
+        The returned network will look like this if str(network.node):
+
+        {'node1': {'name': 'node1'}, 'node2': {'name': 'node2'}}
+
+        Networks from the factory that are already
+        :py:class:`nbgwas.network.Network` objects, such as
+        :py:class:`CompiledNetwork`, are labeled by name and returned as is.
+
+        If a network cache was set in the constructor, the relabeled
+        network is frozen via :py:func:`networkx.freeze` so it cannot
+        be modified and kept in the cache for subsequent tasks
+        using the same ndex_id
+
+        If prefetching is enabled, the network prefetched for
+        ndex_id is used when available.
+
+        :param task: contains id to get
+        :return:
+        """
+        if self._prefetcher is not None:
+            network = self._prefetcher.get_network(ndex_id)
+            if network is not None:
+                logger.info('Using prefetched network ' + ndex_id)
+                return network
+        return self._load_networkx_object_from_ndex(ndex_id)
+
+    def _load_networkx_object_from_ndex(self, ndex_id):
+        """
+        Loads network from memory cache if set, otherwise from
+        network factory relabeling nodes as described in
+        :py:meth:`_get_networkx_object_from_ndex`. Concurrent loads
+        of the same network share one load if the network factory
+        is a :py:class:`SingleFlightNetworkFactory`
+        :param ndex_id: NDEx uuid of network
+        :return: network or None if unable to load
+        """
+        if self._networkxcache is not None:
+            network = self._networkxcache.get(ndex_id)
+            if network is not None:
+                logger.info('Using network ' + ndex_id + ' from memory')
+                return network
+
+        return self._load_and_relabel_network(ndex_id)
+
+    def _load_and_relabel_network(self, ndex_id):
+        """
+        Loads network from network factory and relabels its nodes,
+        adding the result to the memory cache if set
+        :param ndex_id: NDEx uuid of network
+        :return: network or None if unable to load
+        """
+        if self._networkfactory is None:
+            logger.error('Network factory is None')
+            return None
+
+        dG = self._networkfactory.get_networkx_object(ndex_id)
+        if dG is None:
+            logger.error("None returned trying to get network")
+            return None
+
+        if isinstance(dG, Network):
+            logger.info('Network is already labeled by node name')
+            return dG
+
+        logger.info('Generating name map')
+        name_map = {i: j[NagaTaskRunner.NDEX_NAME]
+                    for i, j in dG.node.items()}
+
+        logger.info('Calling networkx.relabel_nodes with name map')
+        network = nx.relabel_nodes(dG, name_map)
+
+        if self._networkxcache is not None:
+            nx.freeze(network)
+            self._networkxcache.put(ndex_id, network,
+                                    self._get_networkx_size(network))
+        return network
+
+    def _get_networkx_size(self, network):
+        """
+        Estimates memory used by networkx object
+        :param network: networkx object
+        :return: estimated size in bytes
+        """
+        return (network.number_of_nodes() *
+                NagaTaskRunner.NETWORKX_NODE_BYTES +
+                network.number_of_edges() *
+                NagaTaskRunner.NETWORKX_EDGE_BYTES)
+
+    def _process_task(self, task, delete_temp_files=True):
+        """
+        Processes a task
+        :param taskdir:
+        :return:
+        """
+        logger.info('Task dir: ' + task.get_taskdir())
+        task.move_task(nbgwas_rest.PROCESSING_STATUS)
+
+        n_obj = self._get_networkx_object(task)
+        if n_obj is None:
+            emsg = 'Unable to get networkx object for task'
+            logger.error(emsg)
+            task.move_task(nbgwas_rest.ERROR_STATUS,
+                           error_message=emsg)
+            return
+
+        task.set_networkx_object(n_obj)
+
+        result, emsg = self._run_nbgwas(task)
+
+        self._complete_task(task, result,
+                            delete_temp_files=delete_temp_files)
+        return
+
+    def _complete_task(self, task, result, delete_temp_files=True):
+        """
+        Saves result of task and moves it to done state
+        :param task:
+        :param result: result as dict
+        :param delete_temp_files: passed to task.move_task()
+        :return: None
+        """
+        logger.info('Task processing completed')
+        task.set_result_data(result)
+        task.set_naga_version()
+        task.save_task()
+        task.move_task(nbgwas_rest.DONE_STATUS,
+                       delete_temp_files=delete_temp_files)
+
+    def _process_tasks(self, tasks, delete_temp_files=True):
+        """
+        Processes tasks that share network, alpha, and solver settings
+        diffusing heat of all tasks in a single solve. A task that fails
+        before diffusion is moved to error state without affecting the
+        other tasks
+        :param tasks: list of tasks
+        :param delete_temp_files: passed to task.move_task()
+        :return: None
+        """
+        for task in tasks:
+            logger.info('Task dir: ' + task.get_taskdir())
+            task.move_task(nbgwas_rest.PROCESSING_STATUS)
+
+        network = self._get_networkx_object(tasks[0])
+        if network is None:
+            emsg = 'Unable to get networkx object for task'
+            logger.error(emsg)
+            for task in tasks:
+                task.move_task(nbgwas_rest.ERROR_STATUS,
+                               error_message=emsg)
+            return
+
+        prepared = []
+        for task in tasks:
+            if len(prepared) == 0:
+                task.set_networkx_object(network)
+            else:
+                task.set_networkx_object(_share_network(network))
+            try:
+                prepared.append((task, self._prepare_nbgwas(task)))
+            except Exception as e:
+                self._move_task_to_error(task, e)
+
+        if len(prepared) == 0:
+            return
+
+        logger.info('Running diffuse on ' + str(len(prepared)) + ' tasks')
+        try:
+            stats_list = self.\
+                _diffuse_networks([g.network for task, g in prepared],
+                                  tasks[0].get_alpha(),
+                                  NagaTaskRunner.HEAT_COLUMNS,
+                                  NagaTaskRunner.DIFFUSED_COLUMNS,
+                                  ndex_id=tasks[0].get_ndex(),
+                                  solver=self._get_solver(tasks[0]),
+                                  dtype=self._get_dtype(tasks[0]))
+        except Exception as e:
+            for task, g in prepared:
+                self._move_task_to_error(task, e)
+            return
+
+        for (task, g), stats in zip(prepared, stats_list):
+            try:
+                self._complete_task(task, self._get_result(g, stats),
+                                    delete_temp_files=delete_temp_files)
+            except Exception as e:
+                self._move_task_to_error(task, e)
+
+    def _move_task_to_error(self, task, exception):
+        """
+        Moves task to error state with message describing exception
+        :param task:
+        :param exception: exception raised processing task
+        :return: None
+        """
+        emsg = ('Caught exception processing task: ' +
+                task.get_taskdir() + ' : ' + str(exception))
+        logger.exception('Skipping task cause - ' + emsg)
+        task.move_task(nbgwas_rest.ERROR_STATUS,
+                       error_message=emsg)
+
+    def _get_batch_key(self, task):
+        """
+        Gets key identifying tasks that can be diffused together
+        :param task:
+        :return: tuple of ndex id, alpha, and solver settings
+        """
+        return (task.get_ndex(), task.get_alpha(), task.get_solver(),
+                task.get_tolerance(), task.get_max_iterations(),
+                task.get_rank(), self._get_precision(task))
+
+    def _get_precision(self, task):
+        """
+        Gets numeric precision for task
+        :param task:
+        :return: precision set in task or default precision of runner
+        """
+        precision = task.get_precision()
+        if precision is None:
+            return self._precision
+        return precision
+
+    def _get_dtype(self, task):
+        """
+        Gets numpy dtype for numeric precision of task
+        :param task:
+        :return: numpy dtype
+        """
+        return np.dtype(self._get_precision(task))
+
+    def _run_nbgwas(self, task):
+        """
+        Runs nbgwas processing
+        :param task: The task to process which is assumed to
+                     have a valid network when task.get_networkx_object()
+                     is called
+        :return: tuple if successful result will be ({}, None) otherwise
+                 (None, 'str containing error message') or (None, None)
+
+        """
+        g = self._prepare_nbgwas(task)
+
+        logger.info('Running diffuse ')
+        stats = self._diffuse(g.network, task.get_alpha(),
+                              NagaTaskRunner.HEAT_COLUMNS,
+                              NagaTaskRunner.DIFFUSED_COLUMNS,
+                              ndex_id=task.get_ndex(),
+                              solver=self._get_solver(task),
+                              dtype=self._get_dtype(task))
+        return self._get_result(g, stats), None
+
+    def _prepare_nbgwas(self, task):
+        """
+        Creates Nbgwas object for task with SNPs assigned to genes,
+        heat calculated, and heat mapped to the node table of the
+        network, ready for diffusion
+        :param task: The task to process which is assumed to
+                     have a valid network when task.get_networkx_object()
+                     is called
+        :return: :py:class:`nbgwas.Nbgwas`
+        """
+        # record precision used so results stay auditable
+        task.set_precision(self._get_precision(task))
+        dtype = self._get_dtype(task)
+
+        logger.info('Creating Nbgwas object')
+        g = Nbgwas()
+        g.genes = self._get_genes_with_heat(task)
+        g.network = task.get_networkx_object()
+
+        for col in NagaTaskRunner.HEAT_COLUMNS:
+            g.genes.table[col] = g.genes.table[col].astype(dtype)
+
+        logger.info('map to node table')
+        g.map_to_node_table(columns=NagaTaskRunner.HEAT_COLUMNS)
+        return g
+
+    def _get_genes_with_heat(self, task):
+        """
+        Gets genes of task with top SNP pvalue and heat columns, from
+        gene cache if one was set in the constructor and it holds
+        genes for the same SNP level summary, protein coding file,
+        window, and column labels, otherwise SNPs are assigned to
+        genes and heat calculated
+        :param task:
+        :raises ValueError: if task has no SNP level summary or
+                            protein coding file
+        :return: :py:class:`nbgwas.tables.Genes`
+        """
+        snp_file = task.get_snp_level_summary_file()
+        if snp_file is None:
+            raise ValueError('SNP level summary file not found')
+
+        key = self._get_gene_cache_key(task, snp_file)
+        if key is not None:
+            table = self._genecache.get_table(key)
+            if table is not None:
+                logger.info('Using cached genes ' + key)
+                return Genes(table, pval_col=snpassign.PVALUE_COL,
+                             name_col=snpassign.GENE_COL)
+
+        genes = self._assign_snps_to_genes(task, snp_file)
+
+        logger.info('Converting to heat using method: ' +
+                    NagaTaskRunner.BINARIZE_HEAT_METHOD)
+        genes.convert_to_heat(method=NagaTaskRunner.BINARIZE_HEAT_METHOD,
+                              name=NagaTaskRunner.BINARIZED_HEAT)
+
+        logger.info('2nd converting to heat using method: ' +
+                    NagaTaskRunner.NEG_LOG_HEAT_METHOD)
+        genes.convert_to_heat(method=NagaTaskRunner.NEG_LOG_HEAT_METHOD,
+                              name=NagaTaskRunner.NEGATIVE_LOG)
+
+        neg_log_vals = genes.table[NagaTaskRunner.NEGATIVE_LOG].values
+
+        neg_log_isfinite_list = np.isfinite(neg_log_vals)
+
+        if (np.any(neg_log_isfinite_list)):
+            maxval = np.max(neg_log_vals[neg_log_isfinite_list])
+            logger.info("Found one or more heat values that are infinite " +
+                        " setting to value: " + str(maxval))
+
+            genes.table.loc[~neg_log_isfinite_list,
+                            NagaTaskRunner.NEGATIVE_LOG] = maxval
+
+        if key is not None:
+            self._genecache.add_table(key, genes.table, snpassign.GENE_COL,
+                                      [snpassign.PVALUE_COL] +
+                                      NagaTaskRunner.HEAT_COLUMNS)
+        return genes
+
+    def _get_gene_cache_key(self, task, snp_file):
+        """
+        Gets key of genes of task in gene cache
+        :param task:
+        :param snp_file: path to SNP level summary of task
+        :return: key as str or None if no gene cache was set in the
+                 constructor or task has no protein coding file
+        """
+        if self._genecache is None:
+            return None
+        pc_file = task.get_protein_coding_file()
+        if pc_file is None:
+            return None
+        snp_sha256 = task.get_snp_level_summary_sha256()
+        if snp_sha256 is None:
+            snp_sha256 = get_file_sha256(snp_file)
+        if self._proteincodingcache is not None:
+            pc_sha256 = self._proteincodingcache.get_key(pc_file)
+        else:
+            pc_sha256 = self._pc_sha256s.get_sha256(pc_file)
+        return self._genecache.get_key(snp_sha256, pc_sha256,
+                                       task.get_window(),
+                                       [task.get_snp_chromosome_label(),
+                                        task.get_snp_basepair_label(),
+                                        task.get_snp_pvalue_label()])
+
+    def _assign_snps_to_genes(self, task, snp_file):
+        """
+        Assigns SNPs of task to genes, from SNP level summary bundle
+        if task has a usable one
+        :param task:
+        :param snp_file: path to SNP level summary of task
+        :raises ValueError: if task has no protein coding file
+        :return: :py:class:`nbgwas.tables.Genes`
+        """
+        pc_table = self._get_protein_coding_table(task)
+
+        bundle = self._read_snp_level_summary_bundle(task)
+        if bundle is not None:
+            chunk_size = self._snp_chunk_size
+            if chunk_size <= 0:
+                chunk_size = snpassign.DEFAULT_CHUNK_SIZE
+            logger.info('Assigning SNPS to genes from bundle ' +
+                        str(chunk_size) + ' SNPs at a time')
+            genes = snpassign.\
+                assign_snps_to_genes_from_bundle(bundle[0], bundle[1],
+                                                 pc_table,
+                                                 window_size=task.get_window(),
+                                                 chunksize=chunk_size,
+                                                 executor=self.
+                                                 _assign_executor)
+        elif self._snp_chunk_size > 0:
+            logger.info('Assigning SNPS to genes reading ' +
+                        str(self._snp_chunk_size) + ' rows at a time '
+                        'from: ' + snp_file)
+            genes = snpassign.\
+                assign_snps_to_genes_in_chunks(snp_file, pc_table,
+                                               task.get_snp_chromosome_label(),
+                                               task.get_snp_basepair_label(),
+                                               task.get_snp_pvalue_label(),
+                                               window_size=task.get_window(),
+                                               chunksize=self._snp_chunk_size,
+                                               executor=self._assign_executor)
+        else:
+            logger.info('Reading SNP level summary: ' + snp_file)
+            snp_table = snpio.\
+                read_snp_level_summary(snp_file,
+                                       task.get_snp_chromosome_label(),
+                                       task.get_snp_basepair_label(),
+                                       task.get_snp_pvalue_label())
+
+            logger.info('Assigning SNPS to genes')
+            genes = snpassign.\
+                assign_snps_to_genes(snp_table, pc_table,
+                                     task.get_snp_chromosome_label(),
+                                     task.get_snp_basepair_label(),
+                                     task.get_snp_pvalue_label(),
+                                     window_size=task.get_window(),
+                                     executor=self._assign_executor)
+        return genes
+
+    def _get_protein_coding_table(self, task):
+        """
+        Gets protein coding table for task, from protein coding
+        cache if one was set in the constructor
+        :param task:
+        :raises ValueError: if task has no protein coding file
+        :return: :py:class:`pandas.DataFrame` indexed by gene name with
+                 Chrom, Start, and End columns that the caller can modify
+        """
+        pc_file = task.get_protein_coding_file()
+        if pc_file is None:
+            raise ValueError('Protein coding file not found')
+        if self._proteincodingcache is not None:
+            return self._proteincodingcache.get_table(pc_file).to_dataframe()
+        if proteincoding.is_compiled(pc_file):
+            return ProteinCodingTable.load(pc_file).to_dataframe()
+        return pd.read_csv(pc_file, sep=r'\s+',
+                           names=['Chrom', 'Start', 'End'],
+                           index_col=0)
+
+    def _read_snp_level_summary_bundle(self, task):
+        """
+        Memory maps snp level summary bundle of task if it exists
+        and was parsed with the column labels of the task
+        :param task:
+        :return: tuple (dict of arrays, metadata) or None if task has
+                 no usable bundle
+        """
+        bundle_file = task.get_snp_level_summary_bundle()
+        if bundle_file is None:
+            return None
+        try:
+            arrays, metadata = snpio.read_snp_level_summary_bundle(bundle_file)
+        except (ValueError, KeyError) as e:
+            logger.warning('Unable to read ' + bundle_file +
+                           ' falling back to text : ' + str(e))
+            return None
+        labels = [task.get_snp_chromosome_label(),
+                  task.get_snp_basepair_label(),
+                  task.get_snp_pvalue_label()]
+        if metadata is None or metadata.get(snpio.COLUMNS_KEY) != labels:
+            logger.warning('Column labels of ' + bundle_file + ' do not '
+                           'match task, falling back to text')
+            return None
+        logger.info('Read snp level summary bundle: ' + bundle_file)
+        return arrays, metadata
+
+    def _get_solver(self, task):
+        """
+        Gets solver for diffusion requested by task
+        :param task:
+        :return: :py:class:`SparseDiffusionSolver` or None if task
+                 uses default random walk
+        """
+        if task.get_solver() == nbgwas_rest.RANDOM_WALK_SOLVER:
+            return None
+        if task.get_solver() == nbgwas_rest.LOWRANK_SOLVER:
+            return LowRankDiffusionSolver(rank=task.get_rank(),
+                                          tolerance=task.get_tolerance(),
+                                          ndex_id=task.get_ndex(),
+                                          operatorcache=self._operatorcache,
+                                          dtype=self._get_dtype(task))
+        return SparseDiffusionSolver(task.get_solver(),
+                                     tolerance=task.get_tolerance(),
+                                     max_iterations=task.get_max_iterations(),
+                                     dtype=self._get_dtype(task))
+
+    def _get_result(self, g, stats):
+        """
+        Gets result of task from node table of diffused network
+        :param g: :py:class:`nbgwas.Nbgwas` after diffusion
+        :param stats: convergence statistics from
+                      :py:meth:`_diffuse` or None
+        :return: result as dict
+        """
+        result = self._get_dataframe_of_column(g.network.node_table,
+                                               [g.network.node_name,
+                                                NagaTaskRunner.BINARIZED_HEAT,
+                                                NagaTaskRunner.NEGATIVE_LOG,
                                                 NagaTaskRunner.DIFFUSED_BINARIZED,
                                                 NagaTaskRunner.DIFFUSED_LOG],
                                                [nbgwas_rest.BINARIZEDHEAT,
@@ -862,15 +3616,149 @@ class NagaTaskRunner(object):
                                                 nbgwas_rest.DIFF_BIN_RESULT,
                                                 nbgwas_rest.FINALHEAT_RESULT],
                                                NagaTaskRunner.DIFFUSED_LOG)
-        return result, None
+        if stats is not None:
+            columns = stats[SparseDiffusionSolver.COLUMNS_KEY]
+            stats[SparseDiffusionSolver.COLUMNS_KEY] = {
+                nbgwas_rest.DIFF_BIN_RESULT:
+                    columns[NagaTaskRunner.DIFFUSED_BINARIZED],
+                nbgwas_rest.FINALHEAT_RESULT:
+                    columns[NagaTaskRunner.DIFFUSED_LOG]}
+            result[nbgwas_rest.DIFFUSION_STATS_KEY] = stats
+        return result
+
+    def _diffuse(self, network, alpha, node_attributes, result_names,
+                 ndex_id=None, solver=None, dtype=np.float64):
+        """
+        Runs random walk with restart on all node_attributes of
+        network at once, propagating them as rows of one matrix so
+        the adjacency matrix is normalized and walked a single time.
+        Results match calling :py:meth:`nbgwas.Nbgwas.diffuse` with
+        method random_walk once per attribute, except iteration stops
+        once all attributes have converged.
+
+        If an operator cache was set in constructor, the
+        :py:class:`PropagationOperator` for the network and alpha
+        is taken from the cache instead.
+
+        If solver is set, diffusion is done by that
+        :py:class:`SparseDiffusionSolver` instead.
+
+        :param network: :py:class:`nbgwas.network.Network` with
+                        node_attributes in its node table
+        :param alpha: restart probability or
+                      :py:const:`FileBasedTask.OPTIMAL` to calculate
+                      it from number of edges in network
+        :param node_attributes: list of node table columns to diffuse
+        :param result_names: list of node table columns to write
+                             diffused values of node_attributes to
+        :param ndex_id: NDEx UUID of network used in operator cache key
+        :param solver: :py:class:`SparseDiffusionSolver` or None
+        :param dtype: numpy dtype heat is diffused in
+        :return: convergence statistics from solver as dict, keyed by
+                 result name, or None if no solver was set
+        """
+        return self._diffuse_networks([network], alpha, node_attributes,
+                                      result_names, ndex_id=ndex_id,
+                                      solver=solver, dtype=dtype)[0]
+
+    def _diffuse_networks(self, networks, alpha, node_attributes,
+                          result_names, ndex_id=None, solver=None,
+                          dtype=np.float64):
+        """
+        Same as :py:meth:`_diffuse` except node_attributes of all
+        networks, which must share the same adjacency matrix, are
+        stacked and diffused together in one solve.
+
+        :param networks: list of :py:class:`nbgwas.network.Network`
+                         objects with same nodes, in same order, and
+                         edges
+        :param alpha: restart probability or
+                      :py:const:`FileBasedTask.OPTIMAL`
+        :param node_attributes: list of node table columns to diffuse
+        :param result_names: list of node table columns to write
+                             diffused values of node_attributes to
+        :param ndex_id: NDEx UUID of network used in operator cache key
+        :param solver: :py:class:`SparseDiffusionSolver` or None
+        :param dtype: numpy dtype heat is diffused in
+        :raises ValueError: if networks do not have same nodes
+        :return: list with convergence statistics, or None, for each
+                 network
+        """
+        network = networks[0]
+        if isinstance(alpha, str):
+            alpha = calculate_alpha(len(network.edges()))
+        logger.info('Diffusing ' + str(node_attributes) + ' of ' +
+                    str(len(networks)) + ' network(s) with alpha ' +
+                    str(alpha))
+
+        sorted_idxs = []
+        heats = []
+        names = []
+        for net_index, net in enumerate(networks):
+            sorted_idx = net.node_table.index.sort_values()
+            if net_index > 0 and not \
+                    np.array_equal(net.node_table.loc[sorted_idx,
+                                                      net.node_name].values,
+                                   network.node_table.loc[sorted_idxs[0],
+                                                          network.
+                                                          node_name].values):
+                raise ValueError('Networks to diffuse together must have '
+                                 'the same nodes')
+            sorted_idxs.append(sorted_idx)
+            heats.append(net.node_table.loc[sorted_idx,
+                                            node_attributes].values.T)
+            names.extend([str(net_index) + ' ' + r for r in result_names])
+        heat = np.vstack(heats).astype(dtype, copy=False)
+
+        stats = None
+        if solver is not None:
+            out, stats = solver.solve(network.adjacency_matrix, heat, alpha,
+                                      names=names)
+        elif self._operatorcache is not None:
+            operator = self._operatorcache.\
+                get_operator(ndex_id, network.adjacency_matrix, alpha,
+                             dtype=dtype)
+            out = operator.propagate(heat)
+        else:
+            adj = network.adjacency_matrix.astype(dtype, copy=False)
+            out = _random_walk(heat, adj, alpha)
+
+        net_stats = []
+        row = 0
+        for net_index, net in enumerate(networks):
+            for result_name in result_names:
+                net.node_table.loc[sorted_idxs[net_index],
+                                   result_name] = out[row]
+                row += 1
+
+            # same ordering Nbgwas.diffuse leaves node table in
+            for result_name in result_names:
+                net.node_table.sort_values(by=result_name, ascending=False,
+                                           inplace=True)
+            if stats is None:
+                net_stats.append(None)
+                continue
+            cur_stats = dict(stats)
+            columns = stats[SparseDiffusionSolver.COLUMNS_KEY]
+            cur_stats[SparseDiffusionSolver.COLUMNS_KEY] = \
+                {r: columns[str(net_index) + ' ' + r] for r in result_names}
+            net_stats.append(cur_stats)
+        return net_stats
 
     def _get_dataframe_of_column(self, node_table, column_list,
                                  column_label_list, sort_column):
         """
-
-        :param node_table:
-        :param column:
-        :return:
+        Gets result from columns of node table, rows sorted by
+        sort_column in descending order. Names and values are
+        converted to python objects a column at a time instead of
+        row by row
+        :param node_table: :py:class:`pandas.DataFrame`
+        :param column_list: name column followed by value columns
+        :param column_label_list: labels of value columns in result
+        :param sort_column: column to sort rows by
+        :return: dict with column_label_list under
+                 nbgwas_rest.RESULTKEY_KEY and dict of name => list
+                 of values under nbgwas_rest.RESULTVALUE_KEY
         """
         unsortdf = node_table[column_list]
 
@@ -878,12 +3766,10 @@ class NagaTaskRunner(object):
         dframe = unsortdf.sort_values(by=sort_column,
                                       ascending=False)
 
-        result = {nbgwas_rest.RESULTKEY_KEY: column_label_list,
-                  nbgwas_rest.RESULTVALUE_KEY: {}}
-
-        for val in dframe.values:
-            result[nbgwas_rest.RESULTVALUE_KEY][str(val[0])] = val[1:].tolist()
-        return result
+        names = dframe[column_list[0]].astype(str).tolist()
+        values = dframe[column_list[1:]].values.tolist()
+        return {nbgwas_rest.RESULTKEY_KEY: column_label_list,
+                nbgwas_rest.RESULTVALUE_KEY: dict(zip(names, values))}
 
     def run_tasks(self, keep_looping=lambda: True):
         """
@@ -899,20 +3785,66 @@ class NagaTaskRunner(object):
             while self._remove_deleted_task() is True:
                 pass
 
-            task = self._taskfactory.get_next_task()
-            if task is None:
+            tasks = self._get_next_tasks()
+            if len(tasks) == 0:
                 time.sleep(self._wait_time)
                 continue
 
+            if len(tasks) > 1:
+                logger.info('Found ' + str(len(tasks)) + ' tasks using '
+                            'same network to process together')
+                try:
+                    self._process_tasks(tasks)
+                except Exception as e:
+                    for task in tasks:
+                        if task.get_state() == \
+                                nbgwas_rest.PROCESSING_STATUS:
+                            self._move_task_to_error(task, e)
+                continue
+
+            task = tasks[0]
             logger.info('Found a task: ' + str(task.get_taskdir()))
             try:
                 self._process_task(task)
             except Exception as e:
-                emsg = ('Caught exception processing task: ' +
-                        task.get_taskdir() + ' : ' + str(e))
-                logger.exception('Skipping task cause - ' + emsg)
-                task.move_task(nbgwas_rest.ERROR_STATUS,
-                               error_message=emsg)
+                self._move_task_to_error(task, e)
+
+    def _get_next_tasks(self):
+        """
+        Gets next task from task factory along with, if batch size
+        is greater than 1, any queued tasks that can be processed
+        with it. If prefetching is enabled the queued tasks are
+        passed to the prefetcher
+        :return: list of tasks, empty if no task is found
+        """
+        if self._prefetcher is None and self._batch_size <= 1:
+            task = self._taskfactory.get_next_task()
+            if task is None:
+                return []
+            return [task]
+
+        max_tasks = self._batch_size
+        if self._prefetcher is not None:
+            max_tasks = max(max_tasks, self._prefetch_depth + 1)
+        tasks = self._taskfactory.get_next_tasks(max_tasks=max_tasks)
+        if len(tasks) == 0:
+            return []
+        if self._prefetcher is not None:
+            self._prefetcher.prefetch_tasks(tasks)
+
+        batch_key = self._get_batch_key(tasks[0])
+        return [t for t in tasks[:self._batch_size]
+                if self._get_batch_key(t) == batch_key]
+
+    def shutdown(self):
+        """
+        Stops background threads used by runner
+        :return: None
+        """
+        if self._prefetcher is not None:
+            self._prefetcher.shutdown()
+        if self._assign_executor is not None:
+            self._assign_executor.shutdown(wait=True)
 
     def _remove_deleted_task(self):
         """
@@ -939,6 +3871,28 @@ class NagaTaskRunner(object):
             return False
 
 
+def get_network_lock_dir(theargs, taskdir):
+    """
+    Gets directory for lock files serializing loads of a network
+    across task runner processes. Processes sharing a load find the
+    network in a disk cache once the lock is released, so without
+    --networkcachedir, --networkdir, or --compilednetworkdir loads
+    are only deduplicated within a process
+    :param theargs: parsed command line arguments
+    :param taskdir: absolute path to task directory
+    :return: path to lock directory or None if networks are not
+             cached on disk
+    """
+    if theargs.networkcachedir is None and \
+            theargs.networkdir is None and \
+            theargs.compilednetworkdir is None:
+        logger.info('Networks are not cached on disk, loads of a network '
+                    'are only shared within this process. Set '
+                    '--networkcachedir to share them across processes')
+        return None
+    return os.path.join(taskdir, NETWORK_LOCK_DIR)
+
+
 def run(theargs, keep_looping=lambda: True):
     """
 
@@ -965,13 +3919,84 @@ def run(theargs, keep_looping=lambda: True):
         else:
             dfac = DeletedFileBasedTaskFactory(ab_tdir)
 
-        netfac = NetworkXFromNDExFactory(ndex_server=theargs.ndexserver)
+        netcache = None
+        if theargs.networkcachedir is not None:
+            ab_cdir = os.path.abspath(theargs.networkcachedir)
+            logger.info('Caching networks in: ' + ab_cdir)
+            netcache = NDExNetworkDiskCache(ab_cdir,
+                                            max_size=theargs.
+                                            networkcachesize * 1048576)
+
+        if theargs.streamcx is True:
+            logger.info('Parsing CX networks incrementally')
+        netfac = NetworkXFromNDExFactory(ndex_server=theargs.ndexserver,
+                                         networkcache=netcache,
+                                         streamcx=theargs.streamcx)
+        if theargs.networkdir is not None:
+            ab_ndir = os.path.abspath(theargs.networkdir)
+            logger.info('Loading networks from: ' + ab_ndir)
+            ndexfac = None
+            if theargs.networkdirfallback is True:
+                ndexfac = netfac
+            netfac = FileSystemNetworkFactory(ab_ndir, ndexfactory=ndexfac,
+                                              streamcx=theargs.streamcx)
+
+        if theargs.compilednetworkdir is not None:
+            ab_cndir = os.path.abspath(theargs.compilednetworkdir)
+            logger.info('Using compiled networks in: ' + ab_cndir)
+            netfac = CompiledNetworkFactory(ab_cndir, networkfactory=netfac)
+
+        lockdir = get_network_lock_dir(theargs, ab_tdir)
+        netfac = SingleFlightNetworkFactory(netfac, lockdir=lockdir)
+
+        nxcache = None
+        if theargs.networkmemorycachesize > 0:
+            nxcache = InMemoryLRUCache(max_size=theargs.
+                                       networkmemorycachesize * 1048576)
+
+        pccache = None
+        if theargs.proteincodingcachesize > 0:
+            pccache = ProteinCodingTableCache(max_size=theargs.
+                                              proteincodingcachesize *
+                                              1048576)
+
+        genecache = None
+        if theargs.genecachedir is not None:
+            ab_gdir = os.path.abspath(theargs.genecachedir)
+            logger.info('Caching genes in: ' + ab_gdir)
+            genecache = GeneHeatDiskCache(ab_gdir,
+                                          max_size=theargs.
+                                          genecachesize * 1048576)
+
+        opcache = None
+        if theargs.operatorcachesize > 0:
+            opcachedir = None
+            if theargs.operatorcachedir is not None:
+                opcachedir = os.path.abspath(theargs.operatorcachedir)
+                logger.info('Saving propagation kernels in: ' + opcachedir)
+            opcache = PropagationOperatorCache(max_size=theargs.
+                                               operatorcachesize * 1048576,
+                                               spilldir=opcachedir,
+                                               max_kernel_size=theargs.
+                                               maxkernelsize * 1048576)
+
         runner = NagaTaskRunner(taskfactory=tfac,
                                 networkfactory=netfac,
                                 wait_time=theargs.wait_time,
-                                deletetaskfactory=dfac)
-
-        runner.run_tasks(keep_looping=keep_looping)
+                                deletetaskfactory=dfac,
+                                networkxcache=nxcache,
+                                prefetch_depth=theargs.prefetchdepth,
+                                operatorcache=opcache,
+                                batch_size=theargs.batchsize,
+                                precision=theargs.precision,
+                                snp_chunk_size=theargs.snpchunksize,
+                                proteincodingcache=pccache,
+                                workers=theargs.workers,
+                                genecache=genecache)
+        try:
+            runner.run_tasks(keep_looping=keep_looping)
+        finally:
+            runner.shutdown()
     except Exception:
         logger.exception("Error caught exception")
         return 2
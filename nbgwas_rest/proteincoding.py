@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+"""Compact protein coding tables
+
+Protein coding files list one gene per line with gene name,
+chromosome, start, and end separated by whitespace. A
+:py:class:`ProteinCodingTable` holds a parsed file as a few numpy
+arrays, with rows also grouped by chromosome and sorted by start,
+so a file only needs to be parsed once and can then be shared by
+every task using it.
+
+A table can also be compiled, without duplicate rows and sorted by
+chromosome then start, into an array bundle file with gene names
+stored once in a string pool. Compiled files are memory mapped on
+load so no text is parsed.
+"""
+
+import numpy as np
+import pandas as pd
+
+from nbgwas_rest import arraybundle
+
+
+CHROM_COL = 'Chrom'
+START_COL = 'Start'
+END_COL = 'End'
+
+# suffix of compiled protein coding files, a build named hg19
+# is compiled to hg19.nagapc
+COMPILED_SUFFIX = '.nagapc'
+
+# format name and version stored in metadata of compiled files
+FORMAT = 'nagapc'
+FORMAT_VERSION = 1
+FORMAT_KEY = 'format'
+VERSION_KEY = 'version'
+CHROMOSOMES_KEY = 'chromosomes'
+
+# names of arrays in compiled files
+NAMES_DATA = 'names_data'
+NAMES_OFFSETS = 'names_offsets'
+NAME_ARRAY = 'name'
+CHROMOSOME_ARRAY = 'chromosome'
+START_ARRAY = 'start'
+END_ARRAY = 'end'
+
+
+def is_compiled(path):
+    """
+    Checks if file is a compiled protein coding file, or any other
+    array bundle, by looking at its first bytes
+    :param path: path to file
+    :return: True if file starts with array bundle magic value
+    """
+    with open(path, 'rb') as f:
+        return f.read(len(arraybundle.MAGIC)) == arraybundle.MAGIC
+
+
+class ProteinCodingTable(object):
+    """
+    Genes of a protein coding file stored as arrays in the order
+    of the file, plus, for each chromosome, a range of rows of
+    the file sorted by start
+    """
+
+    def __init__(self, genes, chromosomes, codes, starts, ends):
+        """
+        Constructor
+        :param genes: numpy object array of gene names
+        :param chromosomes: sorted list of chromosome names as str
+        :param codes: numpy int array with index into chromosomes
+                      for each gene
+        :param starts: numpy int64 array of start of each gene
+        :param ends: numpy int64 array of end of each gene
+        """
+        self._genes = genes
+        self._chromosomes = chromosomes
+        self._codes = codes
+        self._starts = starts
+        self._ends = ends
+
+        # rows sorted by chromosome then start, rows of chromosome
+        # with code i are self._order[self._offsets[i]:self._offsets[i+1]]
+        self._order = np.lexsort((starts, codes))
+        self._offsets = np.searchsorted(codes[self._order],
+                                        np.arange(len(chromosomes) + 1))
+
+    @staticmethod
+    def read(path):
+        """
+        Parses protein coding file, loading it via :py:meth:`load`
+        if it was compiled
+        :param path: path to protein coding file, optionally gzip
+                     compressed, or compiled protein coding file
+        :return: :py:class:`ProteinCodingTable`
+        """
+        if is_compiled(path):
+            return ProteinCodingTable.load(path)
+        pc_table = pd.read_csv(path, sep=r'\s+',
+                               names=[CHROM_COL, START_COL, END_COL],
+                               index_col=0)
+        return ProteinCodingTable.from_dataframe(pc_table)
+
+    @staticmethod
+    def from_dataframe(pc_table):
+        """
+        Creates table from :py:class:`pandas.DataFrame`
+        :param pc_table: :py:class:`pandas.DataFrame` indexed by gene
+                         name with Chrom, Start, and End columns
+        :raises ValueError: if start or end cannot be converted to int
+        :return: :py:class:`ProteinCodingTable`
+        """
+        try:
+            starts = pc_table[START_COL].values.astype(np.int64)
+            ends = pc_table[END_COL].values.astype(np.int64)
+        except ValueError:
+            raise ValueError('Columns start and end from `pc` cannot be '
+                             'coerced into int!')
+        codes, chromosomes = pd.factorize(pc_table[CHROM_COL].astype(str),
+                                          sort=True)
+        return ProteinCodingTable(np.asarray(pc_table.index, dtype=object),
+                                  list(chromosomes),
+                                  codes.astype(np.int32), starts, ends)
+
+    @staticmethod
+    def load(path, mmap=True):
+        """
+        Loads table saved via :py:meth:`save`
+        :param path: path to compiled protein coding file
+        :param mmap: if True memory map the file
+        :raises ValueError: if file is not a compiled protein coding
+                            file
+        :return: :py:class:`ProteinCodingTable`
+        """
+        arrays, metadata = arraybundle.read_array_bundle(path, mmap=mmap)
+        if metadata is None or metadata.get(FORMAT_KEY) != FORMAT:
+            raise ValueError(path + ' is not a compiled protein coding file')
+        names = np.array(arraybundle.
+                         decode_string_pool(arrays[NAMES_DATA],
+                                            arrays[NAMES_OFFSETS]),
+                         dtype=object)
+        return ProteinCodingTable(names[arrays[NAME_ARRAY]],
+                                  list(metadata[CHROMOSOMES_KEY]),
+                                  arrays[CHROMOSOME_ARRAY],
+                                  arrays[START_ARRAY], arrays[END_ARRAY])
+
+    def save(self, path, metadata=None):
+        """
+        Saves table to path as an array bundle with gene names in a
+        string pool. Call :py:meth:`compile` first to drop duplicate
+        rows and sort them
+        :param path: path to write to
+        :param metadata: dict of additional values to store
+        :return: None
+        """
+        codes, names = pd.factorize(self._genes)
+        names_data, names_offsets = arraybundle.\
+            encode_string_pool([str(name) for name in names])
+        meta = {}
+        if metadata is not None:
+            meta.update(metadata)
+        meta.update({FORMAT_KEY: FORMAT,
+                     VERSION_KEY: FORMAT_VERSION,
+                     CHROMOSOMES_KEY: list(self._chromosomes)})
+        arraybundle.write_array_bundle(path,
+                                       {NAMES_DATA: names_data,
+                                        NAMES_OFFSETS: names_offsets,
+                                        NAME_ARRAY: codes.astype(np.int32),
+                                        CHROMOSOME_ARRAY: self._codes,
+                                        START_ARRAY: self._starts,
+                                        END_ARRAY: self._ends},
+                                       metadata=meta)
+
+    def compile(self):
+        """
+        Creates table without duplicate rows, keeping the first of
+        each, with rows sorted by chromosome then start. Dropping
+        duplicates does not change SNP assignment as nbgwas counts a
+        SNP once per gene no matter how many rows of the gene it
+        falls in
+        :return: :py:class:`ProteinCodingTable`
+        """
+        codes, names = pd.factorize(self._genes)
+        rows = pd.DataFrame({'gene': codes, 'chrom': self._codes,
+                             'start': self._starts, 'end': self._ends})
+        unique = np.flatnonzero(~rows.duplicated().values)
+        order = unique[np.lexsort((self._starts[unique],
+                                   self._codes[unique]))]
+        return ProteinCodingTable(self._genes[order],
+                                  list(self._chromosomes),
+                                  self._codes[order], self._starts[order],
+                                  self._ends[order])
+
+    def to_dataframe(self):
+        """
+        Gets table as a new :py:class:`pandas.DataFrame` in the form
+        expected by :py:class:`nbgwas.tables.Snps`. The caller is free
+        to modify it
+        :return: :py:class:`pandas.DataFrame` indexed by gene name
+                 with Chrom, Start, and End columns
+        """
+        chromosomes = np.array(self._chromosomes, dtype=object)
+        return pd.DataFrame({CHROM_COL: chromosomes[self._codes],
+                             START_COL: self._starts.copy(),
+                             END_COL: self._ends.copy()},
+                            index=pd.Index(self._genes.copy()),
+                            columns=[CHROM_COL, START_COL, END_COL])
+
+    def get_number_of_genes(self):
+        """
+        Gets number of rows in table
+        :return:
+        """
+        return len(self._genes)
+
+    def get_chromosomes(self):
+        """
+        Gets sorted list of chromosomes with at least one gene
+        :return: list of str
+        """
+        return list(self._chromosomes)
+
+    def get_chromosome(self, chrom):
+        """
+        Gets genes on chromosome sorted by start
+        :param chrom: chromosome as str
+        :return: tuple (numpy array of starts, numpy array of ends,
+                 numpy array of gene names), all empty if chromosome
+                 has no genes
+        """
+        try:
+            code = self._chromosomes.index(chrom)
+        except ValueError:
+            rows = np.empty(0, dtype=np.int64)
+        else:
+            rows = self._order[self._offsets[code]:self._offsets[code + 1]]
+        return self._starts[rows], self._ends[rows], self._genes[rows]
+
+    def get_size(self):
+        """
+        Gets estimated size of table in bytes
+        :return: int
+        """
+        names = sum([len(str(gene)) + 50 for gene in self._genes])
+        return int(names + self._codes.nbytes + self._starts.nbytes +
+                   self._ends.nbytes + self._order.nbytes +
+                   self._offsets.nbytes)
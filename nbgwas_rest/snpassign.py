@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+
+"""Assignment of SNPs to genes
+
+Gives the same result as
+:py:meth:`nbgwas.tables.Snps.assign_snps_to_genes` with agg_method
+min. Genes of each chromosome are kept in a :py:class:`GeneIntervalIndex`
+sorted by start so the genes overlapping a SNP are found by binary
+search, and SNPs can be added in chunks with only a running count,
+minimum pvalue, and position of that minimum kept per gene. Memory used
+is then bounded by the chunk size and number of genes instead of the
+number of SNPs.
+"""
+
+import numpy as np
+import pandas as pd
+from nbgwas.tables import Genes
+
+from nbgwas_rest import snpio
+from nbgwas_rest import proteincoding
+from nbgwas_rest.proteincoding import ProteinCodingTable
+
+
+GENE_COL = 'Gene'
+CHROM_COL = 'Chrom'
+START_END_COL = 'Start-End'
+NSNPS_COL = 'nSNPS'
+PVALUE_COL = 'TopSNP P-Value'
+POSITION_COL = 'TopSNP Position'
+
+# default maximum number of SNPs assigned to genes at a time
+DEFAULT_CHUNK_SIZE = 1000000
+
+# maximum number of (SNP, candidate gene) pairs
+# GeneIntervalIndex.find_overlaps builds at a time, each pair
+# takes a few dozen bytes
+MAX_CANDIDATES = 1048576
+
+
+class GeneIntervalIndex(object):
+    """
+    Finds genes overlapping SNPs. A SNP at position bp overlaps a
+    gene if start - window_size <= bp < end + window_size, matching
+    the bins nbgwas builds. Genes of each chromosome are sorted by
+    start, along with the running maximum of their ends, so only
+    genes starting at or before a SNP and at or after the first gene
+    whose running maximum end is past the SNP are candidates, found
+    with two binary searches per SNP
+    """
+
+    def __init__(self, protein_coding_table, window_size=0):
+        """
+        Constructor
+        :param protein_coding_table: :py:class:`nbgwas_rest.proteincoding.
+                                     ProteinCodingTable`
+        :param window_size: base pairs added to both ends of each gene
+        """
+        self._pc_table = protein_coding_table
+        self._window_size = int(window_size)
+        genes = protein_coding_table.to_dataframe().index
+        codes, self._gene_names = pd.factorize(genes)
+        self._gene_codes = dict(zip(genes, codes))
+        self._chromosomes = {}
+
+    def get_gene_names(self):
+        """
+        Gets distinct gene names, position in this array is the
+        gene code returned by :py:meth:`find_overlaps`
+        :return: numpy object array
+        """
+        return np.asarray(self._gene_names, dtype=object)
+
+    def _get_chromosome(self, chrom):
+        """
+        Gets window extended starts, ends, gene codes, and running
+        maximum of extended ends of genes on chromosome sorted by
+        start, computing them on first use
+        :param chrom: chromosome as str
+        :raises RuntimeError: if no genes are on chromosome
+        :return: tuple (starts, ends, gene codes, running maximum
+                 ends, bool that is True if a gene name appears more
+                 than once)
+        """
+        if chrom not in self._chromosomes:
+            starts, ends, genes = self._pc_table.get_chromosome(chrom)
+            if len(genes) == 0:
+                raise RuntimeError('No proteins found for this chromosome!')
+            starts = starts - self._window_size
+            ends = ends + self._window_size
+            codes = np.array([self._gene_codes[gene] for gene in genes],
+                             dtype=np.int64)
+            self._chromosomes[chrom] = (starts, ends, codes,
+                                        np.maximum.accumulate(ends),
+                                        len(np.unique(codes)) < len(codes))
+        return self._chromosomes[chrom]
+
+    def find_overlaps(self, chrom, bps, max_candidates=MAX_CANDIDATES):
+        """
+        Finds genes overlapping each SNP on a chromosome. A gene
+        listed more than once on the chromosome is reported once
+        per SNP
+        :param chrom: chromosome as str
+        :param bps: numpy int array of basepair position of each SNP
+        :param max_candidates: SNPs are checked in blocks with at most
+                               this many candidate genes in total, a
+                               SNP with more is checked on its own
+        :raises RuntimeError: if no genes are on chromosome
+        :return: tuple (numpy array of index into bps, numpy array
+                 of gene codes) with one entry per overlap
+        """
+        starts, ends, codes, max_ends, duplicates = \
+            self._get_chromosome(chrom)
+        bps = np.asarray(bps)
+
+        # candidates of each SNP are genes at index lo to hi - 1,
+        # genes before lo, and any gene before them, end at or
+        # before the SNP
+        hi = np.searchsorted(starts, bps, side='right')
+        lo = np.searchsorted(max_ends, bps, side='right')
+        counts = np.maximum(hi - lo, 0)
+        cumulative = np.cumsum(counts)
+
+        all_snps = [np.empty(0, dtype=np.int64)]
+        all_genes = [np.empty(0, dtype=np.int64)]
+        first = 0
+        while first < len(bps):
+            done = cumulative[first - 1] if first > 0 else 0
+            last = max(int(np.searchsorted(cumulative, done + max_candidates,
+                                           side='right')), first + 1)
+            snps, genes = self._find_block_overlaps(ends, codes,
+                                                    duplicates,
+                                                    bps[first:last],
+                                                    lo[first:last],
+                                                    counts[first:last])
+            all_snps.append(snps + first)
+            all_genes.append(genes)
+            first = last
+        return np.concatenate(all_snps), np.concatenate(all_genes)
+
+    def _find_block_overlaps(self, ends, codes, duplicates, bps, lo,
+                             counts):
+        """
+        Finds genes overlapping each SNP of a block of SNPs by
+        checking the end of every candidate gene
+        :param ends: window extended ends of genes sorted by start
+        :param codes: gene codes of genes sorted by start
+        :param duplicates: True if a gene appears more than once
+        :param bps: numpy int array of basepair position of each SNP
+        :param lo: index of first candidate gene of each SNP
+        :param counts: number of candidate genes of each SNP
+        :return: tuple (numpy array of index into bps, numpy array
+                 of gene codes) with one entry per overlap
+        """
+        snps = np.repeat(np.arange(len(bps)), counts)
+        offsets = np.cumsum(counts) - counts
+        candidates = (np.arange(len(snps)) - np.repeat(offsets, counts) +
+                      np.repeat(lo, counts))
+        overlaps = ends[candidates] > bps[snps]
+        snps = snps[overlaps]
+        genes = codes[candidates[overlaps]]
+        if duplicates:
+            pairs = np.unique(snps * len(self._gene_names) + genes)
+            snps = pairs // len(self._gene_names)
+            genes = pairs % len(self._gene_names)
+        return snps, genes
+
+
+class GeneMinimumAccumulator(object):
+    """
+    Accumulates, per gene, the number of SNPs that fall within the
+    gene, plus or minus a window, along with the minimum pvalue of
+    those SNPs and position of the SNP with that pvalue. When several
+    SNPs share the minimum pvalue the one on the chromosome that sorts
+    first, then added first, is kept, as nbgwas does.
+    """
+
+    def __init__(self, protein_coding_table, window_size=0,
+                 pc_chrom_col='Chrom', start_col='Start', end_col='End',
+                 executor=None):
+        """
+        Constructor
+        :param protein_coding_table: :py:class:`pandas.DataFrame` indexed
+                                     by gene name with chromosome, start,
+                                     and end columns
+        :param window_size: base pairs added to both ends of each gene
+        :param pc_chrom_col: name of chromosome column
+        :param start_col: name of start column
+        :param end_col: name of end column
+        :param executor: If set, a
+                         :py:class:`concurrent.futures.Executor` used
+                         to assign SNPs of each chromosome to genes
+                         concurrently
+        :raises ValueError: if start or end cannot be converted to int
+        """
+        try:
+            protein_coding_table[pc_chrom_col] = \
+                protein_coding_table[pc_chrom_col].astype(str)
+            protein_coding_table[[start_col, end_col]] = \
+                protein_coding_table[[start_col, end_col]].astype(int)
+        except ValueError:
+            raise ValueError('Columns start and end from `pc` cannot be '
+                             'coerced into int!')
+        self._pc_table = protein_coding_table
+        self._pc_chrom_col = pc_chrom_col
+        self._start_col = start_col
+        self._end_col = end_col
+
+        table = ProteinCodingTable.\
+            from_dataframe(pd.DataFrame({proteincoding.CHROM_COL:
+                                         protein_coding_table[pc_chrom_col],
+                                         proteincoding.START_COL:
+                                         protein_coding_table[start_col],
+                                         proteincoding.END_COL:
+                                         protein_coding_table[end_col]}))
+        self._index = GeneIntervalIndex(table, window_size=window_size)
+        self._chrom_ranks = {chrom: rank for rank, chrom
+                             in enumerate(table.get_chromosomes())}
+        self._executor = executor
+        self._added = 0
+
+        # running count, minimum pvalue, position of that pvalue, and
+        # chromosome rank and row of that SNP for each gene code
+        num_genes = len(self._index.get_gene_names())
+        self._counts = np.zeros(num_genes, dtype=np.int64)
+        self._pvals = np.full(num_genes, np.inf)
+        self._positions = np.zeros(num_genes, dtype=np.int64)
+        self._ranks = np.zeros(num_genes, dtype=np.int64)
+        self._rows = np.zeros(num_genes, dtype=np.int64)
+
+    def add(self, chroms, bps, pvals, rows=None):
+        """
+        Adds SNPs
+        :param chroms: array like of chromosome of each SNP as str
+        :param bps: numpy int array of basepair position of each SNP
+        :param pvals: numpy float array of pvalue of each SNP
+        :param rows: numpy int array of row of each SNP in the SNP
+                     level summary or None if SNPs are added in
+                     the order of the file
+        :raises ValueError: if a chromosome is missing or has no genes
+        :return: None
+        """
+        codes, uniques = pd.factorize(np.asarray(chroms))
+        # factorize gives missing chromosomes code -1, left alone
+        # those SNPs would not be assigned to any gene
+        if np.any(codes < 0):
+            raise ValueError('snp_chrom_col column from snp has missing '
+                             'values!')
+        if rows is None:
+            rows = np.arange(self._added, self._added + len(codes))
+            self._added += len(codes)
+        parts = []
+        for code, chrom in enumerate(uniques):
+            mask = codes == code
+            parts.append((chrom, bps[mask], pvals[mask], rows[mask]))
+        self.add_chromosome_parts(parts)
+
+    def add_chromosome_parts(self, parts):
+        """
+        Adds SNPs already split by chromosome. If an executor was set
+        in the constructor parts are assigned to genes concurrently
+        and merged as they complete, the result does not depend on
+        the order of parts
+        :param parts: list of tuples (chromosome as str, numpy int array
+                      of basepair positions, numpy float array of
+                      pvalues, numpy int array of rows in the SNP level
+                      summary) each holding SNPs of one chromosome
+        :raises ValueError: if a chromosome has no genes
+        :return: None
+        """
+        missing = set([part[0] for part in parts]) - \
+            set(self._chrom_ranks.keys())
+        if len(missing) > 0:
+            raise ValueError('pc_chrom_col column from pc is expected to '
+                             'be a superset of snp_chrom_col from snp!')
+        if self._executor is None:
+            results = [self._assign_chromosome(*part) for part in parts]
+        else:
+            results = self._executor.map(lambda part:
+                                         self._assign_chromosome(*part),
+                                         parts)
+        for result in results:
+            if result is not None:
+                self._merge(*result)
+
+    def _assign_chromosome(self, chrom, bps, pvals, rows):
+        """
+        Assigns SNPs on a single chromosome to genes without
+        changing running values so it is safe to call from
+        multiple threads. Overlapping genes of all SNPs are found at
+        once and the SNP with minimum pvalue for each gene is picked
+        :param chrom: chromosome
+        :param bps: basepair positions
+        :param pvals: pvalues
+        :param rows: order in which SNPs were added, used along with
+                     chrom to pick SNP to keep when pvalues tie
+        :return: tuple (chromosome rank, gene codes, number of SNPs,
+                 minimum pvalues, positions, and rows for each gene)
+                 or None if no SNP overlaps a gene
+        """
+        bps = np.asarray(bps)
+        pvals = np.asarray(pvals)
+        rows = np.asarray(rows)
+        snps, genes = self._index.find_overlaps(chrom, bps)
+        if len(snps) == 0:
+            return None
+
+        # sort by gene, then pvalue, then order SNPs were added so
+        # first entry of each gene is the SNP to keep for that gene
+        order = np.lexsort((rows[snps], pvals[snps], genes))
+        sorted_genes = genes[order]
+        firsts = np.flatnonzero(np.r_[True, sorted_genes[1:] !=
+                                      sorted_genes[:-1]])
+        counts = np.diff(np.r_[firsts, len(sorted_genes)])
+        snps_kept = snps[order[firsts]]
+        return (self._chrom_ranks[chrom], sorted_genes[firsts], counts,
+                pvals[snps_kept], bps[snps_kept], rows[snps_kept])
+
+    def _merge(self, rank, genes, counts, pvals, positions, rows):
+        """
+        Merges result of :py:meth:`_assign_chromosome` into running
+        values, keeping for each gene the SNP with lowest pvalue,
+        then chromosome rank, then row
+        :param rank: rank of chromosome in sorted chromosomes
+        :param genes: gene codes, each listed once
+        :param counts: number of SNPs of each gene
+        :param pvals: minimum pvalue of each gene
+        :param positions: position of SNP with minimum pvalue
+        :param rows: row of SNP with minimum pvalue
+        :return: None
+        """
+        cur_pval = self._pvals[genes]
+        cur_rank = self._ranks[genes]
+        replace = ((self._counts[genes] == 0) | (pvals < cur_pval) |
+                   ((pvals == cur_pval) &
+                    ((rank < cur_rank) |
+                     ((rank == cur_rank) & (rows < self._rows[genes])))))
+        self._pvals[genes[replace]] = pvals[replace]
+        self._positions[genes[replace]] = positions[replace]
+        self._ranks[genes[replace]] = rank
+        self._rows[genes[replace]] = rows[replace]
+        self._counts[genes] += counts
+
+    def get_number_of_genes(self):
+        """
+        Gets number of genes with at least one SNP
+        :return:
+        """
+        return int(np.count_nonzero(self._counts))
+
+    def get_genes(self):
+        """
+        Gets genes with at least one SNP as nbgwas would
+        :return: :py:class:`nbgwas.tables.Genes`
+        """
+        names = self._index.get_gene_names()
+        codes = np.flatnonzero(self._counts)
+        assigned_df = pd.DataFrame({NSNPS_COL: self._counts[codes],
+                                    PVALUE_COL: self._pvals[codes],
+                                    POSITION_COL: self._positions[codes]},
+                                   index=names[codes],
+                                   columns=[NSNPS_COL, PVALUE_COL,
+                                            POSITION_COL]).astype(float)
+
+        # chromosome of first row of each gene and start-end of
+        # every row of gene joined by commas
+        pc_table = self._pc_table
+        start_end = (pc_table[self._start_col].astype(str) + '-' +
+                     pc_table[self._end_col].astype(str))
+        gene_lengths_df = pd.DataFrame({CHROM_COL:
+                                        pc_table[self._pc_chrom_col].values,
+                                        START_END_COL: start_end.values},
+                                       index=pc_table.index).\
+            groupby(level=0).agg({CHROM_COL: 'first',
+                                  START_END_COL: ','.join})
+
+        assigned_df = pd.concat([gene_lengths_df, assigned_df], axis=1,
+                                sort=True)
+        assigned_df.index.name = GENE_COL
+        assigned_df = assigned_df.reset_index()
+        assigned_df = assigned_df.loc[pd.notnull(assigned_df.iloc[:, -1])]
+        return Genes(assigned_df, pval_col=PVALUE_COL, name_col=GENE_COL)
+
+
+def assign_snps_to_genes(snp_table, protein_coding_table, chrom_col,
+                         bp_col, pval_col, window_size=0, executor=None):
+    """
+    Assigns SNPs of an already parsed SNP level summary to genes in
+    a single pass of :py:class:`GeneMinimumAccumulator`, replacing
+    :py:meth:`nbgwas.tables.Snps.assign_snps_to_genes`
+    :param snp_table: :py:class:`pandas.DataFrame` with chromosome,
+                      basepair, and pvalue columns as returned by
+                      :py:func:`nbgwas_rest.snpio.read_snp_level_summary`
+    :param protein_coding_table: :py:class:`pandas.DataFrame` indexed
+                                 by gene name with Chrom, Start, and
+                                 End columns
+    :param chrom_col: name of chromosome column in snp_table
+    :param bp_col: name of basepair column in snp_table
+    :param pval_col: name of pvalue column in snp_table
+    :param window_size: base pairs added to both ends of each gene
+    :param executor: If set, a :py:class:`concurrent.futures.Executor`
+                     used to assign SNPs of each chromosome concurrently
+    :raises ValueError: if a chromosome has no genes
+    :return: :py:class:`nbgwas.tables.Genes`
+    """
+    accumulator = GeneMinimumAccumulator(protein_coding_table,
+                                         window_size=window_size,
+                                         executor=executor)
+    accumulator.add(snp_table[chrom_col].astype(str).values,
+                    snp_table[bp_col].values,
+                    snp_table[pval_col].values)
+    return accumulator.get_genes()
+
+
+def assign_snps_to_genes_in_chunks(snpfile, protein_coding_table,
+                                   chrom_col, bp_col, pval_col,
+                                   window_size=0,
+                                   chunksize=DEFAULT_CHUNK_SIZE,
+                                   executor=None):
+    """
+    Reads SNP level summary chunksize rows at a time assigning
+    SNPs of each chunk to genes via :py:class:`GeneMinimumAccumulator`
+    :param snpfile: path to SNP level summary file
+    :param protein_coding_table: :py:class:`pandas.DataFrame` indexed
+                                 by gene name with Chrom, Start, and
+                                 End columns
+    :param chrom_col: name of chromosome column in snpfile
+    :param bp_col: name of basepair column in snpfile
+    :param pval_col: name of pvalue column in snpfile
+    :param window_size: base pairs added to both ends of each gene
+    :param chunksize: number of rows of snpfile read at a time
+    :param executor: If set, a :py:class:`concurrent.futures.Executor`
+                     used to assign SNPs of each chromosome of a chunk
+                     concurrently
+    :raises ValueError: if snpfile cannot be parsed
+    :return: :py:class:`nbgwas.tables.Genes`
+    """
+    accumulator = GeneMinimumAccumulator(protein_coding_table,
+                                         window_size=window_size,
+                                         executor=executor)
+    for chunk in snpio.read_snp_level_summary_chunks(snpfile, chrom_col,
+                                                     bp_col, pval_col,
+                                                     chunksize):
+        accumulator.add(chunk[chrom_col].astype(str).values,
+                        chunk[bp_col].values,
+                        chunk[pval_col].values)
+    return accumulator.get_genes()
+
+
+def assign_snps_to_genes_from_bundle(arrays, metadata, protein_coding_table,
+                                     window_size=0,
+                                     chunksize=DEFAULT_CHUNK_SIZE,
+                                     executor=None):
+    """
+    Assigns SNPs of a SNP level summary bundle to genes. SNPs in a
+    bundle are sorted by chromosome so they are split by chromosome,
+    and each chromosome into parts of at most chunksize SNPs, without
+    copying and passed to :py:class:`GeneMinimumAccumulator`
+    :param arrays: dict of arrays from
+                   :py:func:`nbgwas_rest.snpio.read_snp_level_summary_bundle`
+    :param metadata: metadata from
+                     :py:func:`nbgwas_rest.snpio.read_snp_level_summary_bundle`
+    :param protein_coding_table: :py:class:`pandas.DataFrame` indexed
+                                 by gene name with Chrom, Start, and
+                                 End columns
+    :param window_size: base pairs added to both ends of each gene
+    :param chunksize: maximum number of SNPs assigned at a time
+    :param executor: If set, a :py:class:`concurrent.futures.Executor`
+                     used to assign parts concurrently
+    :raises ValueError: if a chromosome has no genes
+    :return: :py:class:`nbgwas.tables.Genes`
+    """
+    accumulator = GeneMinimumAccumulator(protein_coding_table,
+                                         window_size=window_size,
+                                         executor=executor)
+    chromosomes = metadata[snpio.CHROMOSOMES_KEY]
+    offsets = np.searchsorted(arrays[snpio.CHROMOSOME_ARRAY],
+                              np.arange(len(chromosomes) + 1))
+    parts = []
+    for code, chrom in enumerate(chromosomes):
+        for start in range(offsets[code], offsets[code + 1], chunksize):
+            end = min(start + chunksize, offsets[code + 1])
+            parts.append((chrom,
+                          arrays[snpio.BASEPAIR_ARRAY][start:end],
+                          arrays[snpio.PVALUE_ARRAY][start:end],
+                          arrays[snpio.ROW_ARRAY][start:end]))
+    accumulator.add_chromosome_parts(parts)
+    return accumulator.get_genes()
@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+
+"""Fast reader of SNP level summary files
+
+SNP level summaries are comma or whitespace delimited text files
+with a header line. Rather than parsing every line with a regular
+expression separator, which forces pandas onto its slow Python
+parsing engine, the delimiter is determined from the header line
+and only the chromosome, basepair, and pvalue columns are parsed by
+the C engine of pandas into typed columns. Very large files can
+also be read in chunks of a fixed number of rows so memory used
+does not grow with the size of the file. Gzip and bgzip compressed
+files are detected by their magic bytes and decompressed as they
+are read.
+
+Parsed SNPs can also be saved as an array bundle, see
+:py:mod:`nbgwas_rest.arraybundle`, so the text only needs to be
+parsed once. In the bundle, SNPs are sorted by chromosome and
+basepair with chromosomes stored as integer codes into a sorted
+list of chromosome names. :py:class:`TeeReader` lets an upload be
+parsed into a bundle while it is saved to disk.
+"""
+
+import io
+import re
+import gzip
+
+import numpy as np
+import pandas as pd
+
+import nbgwas_rest
+from nbgwas_rest import arraybundle
+
+
+COMMA = ','
+WHITESPACE = r'\s+'
+
+COMMA_SPLIT = re.compile(r'\s*,\s*')
+PADDED_COMMA = re.compile(r'\s,|,\s')
+
+# names of arrays in SNP level summary bundle, ROW_ARRAY holds
+# the row of each SNP in the original file
+CHROMOSOME_ARRAY = 'chromosome'
+BASEPAIR_ARRAY = 'basepair'
+PVALUE_ARRAY = 'pvalue'
+ROW_ARRAY = 'row'
+
+# metadata keys of SNP level summary bundle
+CHROMOSOMES_KEY = 'chromosomes'
+COLUMNS_KEY = 'columns'
+
+
+def is_gzip_file(path):
+    """
+    Checks if file starts with gzip magic bytes, which is also
+    the case for bgzip compressed files
+    :param path: path to file
+    :return: True if file is gzip compressed otherwise False
+    """
+    with open(path, 'rb') as f:
+        return f.read(len(nbgwas_rest.GZIP_MAGIC)) == nbgwas_rest.GZIP_MAGIC
+
+
+def open_snp_level_summary(path):
+    """
+    Opens SNP level summary file for reading as text, decompressing
+    it on the fly if it is gzip compressed
+    :param path: path to file
+    :return: text file object
+    """
+    if is_gzip_file(path):
+        return gzip.open(path, 'rt')
+    return open(path, 'r')
+
+
+def is_gzip_stream(stream):
+    """
+    Checks if buffered binary stream starts with gzip magic bytes
+    without consuming any data
+    :param stream: :py:class:`io.BufferedReader`
+    :return: True if stream is gzip compressed otherwise False
+    """
+    magic = nbgwas_rest.GZIP_MAGIC
+    return stream.peek(len(magic))[:len(magic)] == magic
+
+
+def open_snp_level_summary_stream(stream):
+    """
+    Wraps buffered binary stream of SNP level summary as a text
+    stream decompressing it on the fly if it is gzip compressed.
+    Closing the returned text stream does not close stream
+    :param stream: :py:class:`io.BufferedReader`
+    :return: text file object
+    """
+    if is_gzip_stream(stream):
+        return io.TextIOWrapper(gzip.GzipFile(fileobj=stream, mode='rb'))
+    return io.TextIOWrapper(_UnclosableReader(stream))
+
+
+class _UnclosableReader(io.RawIOBase):
+    """
+    Raw binary stream reading from another stream which is
+    left open when this stream is closed
+    """
+    def __init__(self, fileobj):
+        super().__init__()
+        self._fileobj = fileobj
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._fileobj.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+class TeeReader(_UnclosableReader):
+    """
+    Raw binary stream reading from another stream that writes
+    every byte read to an output file, and optionally a hash, so a
+    stream can be parsed, saved, and hashed in a single pass
+    """
+    def __init__(self, fileobj, outfile, hashobj=None):
+        """
+        Constructor
+        :param fileobj: binary file like object to read from
+        :param outfile: binary file like object to write to
+        :param hashobj: :py:mod:`hashlib` hash object to update with
+                        bytes read or None
+        """
+        super().__init__(fileobj)
+        self._outfile = outfile
+        self._hashobj = hashobj
+
+    def readinto(self, b):
+        numbytes = super().readinto(b)
+        self._outfile.write(b[:numbytes])
+        if self._hashobj is not None:
+            self._hashobj.update(b[:numbytes])
+        return numbytes
+
+
+def sniff_delimiter(header):
+    """
+    Determines delimiter of SNP level summary from its header line.
+    A header containing a comma is assumed to be comma delimited
+    otherwise whitespace delimited.
+    :param header: header line as str
+    :return: :py:const:`COMMA` or :py:const:`WHITESPACE`
+    """
+    if COMMA in header:
+        return COMMA
+    return WHITESPACE
+
+
+def parse_header(header, delimiter=None):
+    """
+    Splits header line of SNP level summary into column names
+    :param header: header line as str
+    :param delimiter: :py:const:`COMMA`, :py:const:`WHITESPACE`, or
+                      None to sniff delimiter from header
+    :return: list of column names
+    """
+    if delimiter is None:
+        delimiter = sniff_delimiter(header)
+    if delimiter == COMMA:
+        return COMMA_SPLIT.split(header.strip())
+    return header.split()
+
+
+def get_column_indices(columns, labels):
+    """
+    Gets position of each of labels in columns
+    :param columns: list of column names from header
+    :param labels: list of column names to find
+    :raises ValueError: if any of labels is not in columns
+    :return: list of int
+    """
+    missing = [label for label in labels if label not in columns]
+    if len(missing) > 0:
+        raise ValueError('Column(s) ' + ', '.join(missing) +
+                         ' not found in SNP level summary header: ' +
+                         ', '.join(columns))
+    return [columns.index(label) for label in labels]
+
+
+def get_read_csv_kwargs(columns, delimiter, chrom_col, bp_col, pval_col):
+    """
+    Gets keyword arguments for :py:func:`pandas.read_csv` that parse
+    only chrom_col, bp_col, and pval_col of SNP level summary data
+    lines, with the C engine, once the header line has been consumed
+    :param columns: list of column names from header
+    :param delimiter: :py:const:`COMMA` or :py:const:`WHITESPACE`
+    :param chrom_col: name of chromosome column
+    :param bp_col: name of basepair column
+    :param pval_col: name of pvalue column
+    :raises ValueError: if a column is not in columns
+    :return: dict
+    """
+    get_column_indices(columns, [chrom_col, bp_col, pval_col])
+    kwargs = {'header': None,
+              'names': columns,
+              'usecols': [chrom_col, bp_col, pval_col],
+              'dtype': {chrom_col: str, pval_col: np.float64},
+              'engine': 'c'}
+    if delimiter == COMMA:
+        kwargs['sep'] = COMMA
+        kwargs['skipinitialspace'] = True
+    else:
+        # the C engine handles this separator itself, unlike other
+        # regular expressions, and delim_whitespace is gone in pandas 3
+        kwargs['sep'] = WHITESPACE
+    return kwargs
+
+
+def convert_snp_columns(snp_table, chrom_col, bp_col, pval_col,
+                        strip=False):
+    """
+    Converts columns of snp_table, in place, to the types used
+    during SNP assignment
+    :param snp_table: :py:class:`pandas.DataFrame` holding only
+                      chrom_col, bp_col, and pval_col
+    :param chrom_col: name of chromosome column
+    :param bp_col: name of basepair column
+    :param pval_col: name of pvalue column
+    :param strip: if True remove whitespace around chromosome values
+    :raises ValueError: if bp_col cannot be converted to integers
+    :return: snp_table with chrom_col as str, bp_col as int64, and
+             pval_col as float64
+    """
+    if strip is True:
+        snp_table[chrom_col] = snp_table[chrom_col].str.strip()
+    try:
+        snp_table[bp_col] = snp_table[bp_col].astype(np.int64)
+    except (ValueError, TypeError):
+        raise ValueError('Column ' + bp_col + ' of SNP level summary '
+                         'cannot be coerced into int')
+    return snp_table
+
+
+def _read_header(snpfile, chrom_col, bp_col, pval_col):
+    """
+    Reads header line of snpfile
+    :param snpfile: text file like object positioned at start of file
+    :param chrom_col: name of chromosome column
+    :param bp_col: name of basepair column
+    :param pval_col: name of pvalue column
+    :raises ValueError: if a column is missing from the header
+    :return: tuple (kwargs for :py:func:`pandas.read_csv`, bool
+             denoting whether chromosome values need to be stripped)
+    """
+    header = snpfile.readline()
+    delimiter = sniff_delimiter(header)
+    columns = parse_header(header, delimiter=delimiter)
+    kwargs = get_read_csv_kwargs(columns, delimiter, chrom_col, bp_col,
+                                 pval_col)
+    strip = delimiter == COMMA and PADDED_COMMA.search(header) is not None
+    return kwargs, strip
+
+
+def read_snp_level_summary(snpfile, chrom_col, bp_col, pval_col):
+    """
+    Reads chromosome, basepair, and pvalue columns of a SNP level
+    summary. The delimiter is sniffed from the header line, see
+    :py:func:`sniff_delimiter`
+    :param snpfile: path to SNP level summary file, optionally gzip
+                    compressed, or text file like object
+    :param chrom_col: name of chromosome column
+    :param bp_col: name of basepair column
+    :param pval_col: name of pvalue column
+    :raises ValueError: if a column is missing from the header or
+                        values cannot be converted
+    :return: :py:class:`pandas.DataFrame` with only chrom_col as str,
+             bp_col as int64, and pval_col as float64
+    """
+    if isinstance(snpfile, str):
+        with open_snp_level_summary(snpfile) as f:
+            return read_snp_level_summary(f, chrom_col, bp_col, pval_col)
+
+    kwargs, strip = _read_header(snpfile, chrom_col, bp_col, pval_col)
+    snp_table = pd.read_csv(snpfile, **kwargs)
+    return convert_snp_columns(snp_table, chrom_col, bp_col, pval_col,
+                               strip=strip)
+
+
+def read_snp_level_summary_chunks(snpfile, chrom_col, bp_col, pval_col,
+                                  chunksize):
+    """
+    Same as :py:func:`read_snp_level_summary` except the file is
+    read, and the tables yielded, chunksize rows at a time
+    :param snpfile: path to SNP level summary file, optionally gzip
+                    compressed, or text file like object
+    :param chrom_col: name of chromosome column
+    :param bp_col: name of basepair column
+    :param pval_col: name of pvalue column
+    :param chunksize: maximum number of rows per chunk
+    :raises ValueError: if a column is missing from the header or
+                        values cannot be converted
+    :return: generator of :py:class:`pandas.DataFrame` objects
+    """
+    if isinstance(snpfile, str):
+        with open_snp_level_summary(snpfile) as f:
+            for chunk in read_snp_level_summary_chunks(f, chrom_col,
+                                                       bp_col, pval_col,
+                                                       chunksize):
+                yield chunk
+        return
+
+    kwargs, strip = _read_header(snpfile, chrom_col, bp_col, pval_col)
+    for chunk in pd.read_csv(snpfile, chunksize=chunksize, **kwargs):
+        yield convert_snp_columns(chunk, chrom_col, bp_col, pval_col,
+                                  strip=strip)
+
+
+def write_snp_level_summary_bundle(snpfile, path, chrom_col, bp_col,
+                                   pval_col, chunksize=1000000,
+                                   chromosomes=None):
+    """
+    Parses SNP level summary, chunksize rows at a time, and writes
+    the chromosome, basepair, and pvalue columns to path as an
+    array bundle with SNPs sorted by chromosome then basepair.
+    SNPs at the same position keep the order of the file.
+    :param snpfile: path to SNP level summary file, optionally gzip
+                    compressed, or text file like object
+    :param path: path to write bundle to
+    :param chrom_col: name of chromosome column
+    :param bp_col: name of basepair column
+    :param pval_col: name of pvalue column
+    :param chunksize: number of rows parsed at a time
+    :param chromosomes: set of known chromosomes or None to accept
+                        any chromosome
+    :raises ValueError: if a column is missing from the header,
+                        values are missing or cannot be converted, or
+                        a chromosome is not in chromosomes
+    :return: number of SNPs written
+    """
+    chromcodes = {}
+    codes = [np.empty(0, dtype=np.int32)]
+    bps = [np.empty(0, dtype=np.int64)]
+    pvals = [np.empty(0, dtype=np.float64)]
+    for chunk in read_snp_level_summary_chunks(snpfile, chrom_col, bp_col,
+                                               pval_col, chunksize):
+        # factorize gives missing chromosomes code -1, which would
+        # index the last chromosome of the mapping below
+        for col in [chrom_col, bp_col, pval_col]:
+            if chunk[col].isnull().any():
+                raise ValueError('Column ' + col + ' of SNP level '
+                                 'summary has missing values')
+        chunkcodes, uniques = pd.factorize(chunk[chrom_col].values)
+        if chromosomes is not None:
+            unknown = sorted(set(uniques) - set(chromosomes))
+            if len(unknown) > 0:
+                raise ValueError('Chromosome(s) ' + ', '.join(unknown) +
+                                 ' not found in protein coding table')
+        mapping = np.array([chromcodes.setdefault(u, len(chromcodes))
+                            for u in uniques], dtype=np.int32)
+        codes.append(mapping[chunkcodes])
+        bps.append(chunk[bp_col].values)
+        pvals.append(chunk[pval_col].values.astype(np.float64))
+
+    # renumber chromosomes so codes follow sorted chromosome names
+    chromosomes = sorted(chromcodes.keys())
+    remap = np.empty(len(chromosomes), dtype=np.int32)
+    for code, name in enumerate(chromosomes):
+        remap[chromcodes[name]] = code
+    codes = remap[np.concatenate(codes)]
+    bps = np.concatenate(bps)
+    pvals = np.concatenate(pvals)
+
+    rows = np.lexsort((bps, codes))
+    arraybundle.write_array_bundle(path,
+                                   {CHROMOSOME_ARRAY: codes[rows],
+                                    BASEPAIR_ARRAY: bps[rows],
+                                    PVALUE_ARRAY: pvals[rows],
+                                    ROW_ARRAY: rows.astype(np.int64)},
+                                   metadata={CHROMOSOMES_KEY: chromosomes,
+                                             COLUMNS_KEY: [chrom_col,
+                                                           bp_col,
+                                                           pval_col]})
+    return len(rows)
+
+
+def read_snp_level_summary_bundle(path, mmap=True):
+    """
+    Reads SNP level summary bundle written by
+    :py:func:`write_snp_level_summary_bundle`
+    :param path: path to bundle
+    :param mmap: if True arrays are memory mapped read only
+    :raises ValueError: if file is not an array bundle
+    :return: tuple (dict of array name => numpy array, metadata dict)
+    """
+    return arraybundle.read_array_bundle(path, mmap=mmap)
+
+
+def get_snp_table_from_bundle(arrays, metadata, chrom_col, bp_col,
+                              pval_col):
+    """
+    Converts arrays of a SNP level summary bundle back into the
+    table :py:func:`read_snp_level_summary` would return for the
+    original file, rows included in the same order
+    :param arrays: dict of arrays from
+                   :py:func:`read_snp_level_summary_bundle`
+    :param metadata: metadata from
+                     :py:func:`read_snp_level_summary_bundle`
+    :param chrom_col: name to give chromosome column
+    :param bp_col: name to give basepair column
+    :param pval_col: name to give pvalue column
+    :return: :py:class:`pandas.DataFrame`
+    """
+    rows = arrays[ROW_ARRAY]
+    chromosomes = np.array(metadata[CHROMOSOMES_KEY], dtype=object)
+    codes = np.empty(len(rows), dtype=np.int32)
+    codes[rows] = arrays[CHROMOSOME_ARRAY]
+    bps = np.empty(len(rows), dtype=np.int64)
+    bps[rows] = arrays[BASEPAIR_ARRAY]
+    pvals = np.empty(len(rows), dtype=np.float64)
+    pvals[rows] = arrays[PVALUE_ARRAY]
+    return pd.DataFrame({chrom_col: chromosomes[codes],
+                         bp_col: bps,
+                         pval_col: pvals},
+                        columns=[chrom_col, bp_col, pval_col])
@@ -24,6 +24,7 @@ requirements = [
     'ndex2==3.0.0a1',
     'naga-gwas==0.4.1',
     'numpy',
+    'ijson',
     'flask',
     'flask-restplus',
     'python-daemon'
@@ -62,7 +63,8 @@ setup(
     keywords='naga-gwas-rest',
     name='naga-gwas-rest',
     packages=find_packages(include=['nbgwas_rest']),
-    scripts=['nbgwas_rest/naga_taskrunner.py'],
+    scripts=['nbgwas_rest/naga_taskrunner.py',
+             'nbgwas_rest/naga_proteincoding.py'],
     setup_requires=setup_requirements,
     test_suite='tests',
     tests_require=test_requirements,
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `arraybundle` module."""
+
+import os
+import unittest
+import shutil
+import tempfile
+
+import numpy as np
+
+from nbgwas_rest import arraybundle
+
+
+class TestArrayBundle(unittest.TestCase):
+    """Tests for `arraybundle` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self._temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self._temp_dir)
+
+    def test_write_and_read_array_bundle(self):
+        bfile = os.path.join(self._temp_dir, 'foo.bundle')
+        arrays = {'ints': np.arange(5, dtype=np.int32),
+                  'floats': np.array([[0.5, 1.5], [2.5, 3.5]]),
+                  'empty': np.zeros(0, dtype=np.int64),
+                  'bytes': np.array([1, 2, 3], dtype=np.uint8)}
+        arraybundle.write_array_bundle(bfile, arrays,
+                                       metadata={'hi': 'there'})
+        self.assertFalse(os.path.isfile(bfile + arraybundle.TMP_SUFFIX))
+
+        for mmap in [True, False]:
+            res, meta = arraybundle.read_array_bundle(bfile, mmap=mmap)
+            self.assertEqual(meta, {'hi': 'there'})
+            self.assertEqual(sorted(res.keys()), sorted(arrays.keys()))
+            for name, arr in arrays.items():
+                self.assertEqual(res[name].dtype, arr.dtype)
+                self.assertEqual(res[name].shape, arr.shape)
+                self.assertTrue(np.array_equal(res[name], arr))
+                if mmap is True:
+                    self.assertEqual(res[name].ctypes.data %
+                                     arraybundle.ALIGNMENT, 0)
+
+    def test_write_array_bundle_no_metadata(self):
+        bfile = os.path.join(self._temp_dir, 'foo.bundle')
+        arraybundle.write_array_bundle(bfile, {})
+        res, meta = arraybundle.read_array_bundle(bfile)
+        self.assertEqual(res, {})
+        self.assertEqual(meta, None)
+
+    def test_write_array_bundle_numpy_scalar_metadata(self):
+        bfile = os.path.join(self._temp_dir, 'foo.bundle')
+        arraybundle.write_array_bundle(bfile, {},
+                                       metadata={'a': np.int64(3),
+                                                 'b': np.float32(0.5),
+                                                 'c': [np.intp(1)],
+                                                 'd': np.bool_(True)})
+        res, meta = arraybundle.read_array_bundle(bfile)
+        self.assertEqual(meta, {'a': 3, 'b': 0.5, 'c': [1], 'd': True})
+
+        try:
+            arraybundle.write_array_bundle(bfile, {},
+                                           metadata={'a': object()})
+            self.fail('Expected TypeError')
+        except TypeError as e:
+            self.assertTrue('object' in str(e))
+
+    def test_write_array_bundle_object_array(self):
+        bfile = os.path.join(self._temp_dir, 'foo.bundle')
+        try:
+            arraybundle.write_array_bundle(bfile, {'x': np.array([{}])})
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), 'Array x has object dtype which '
+                                     'cannot be stored')
+
+    def test_read_array_bundle_not_a_bundle(self):
+        bfile = os.path.join(self._temp_dir, 'foo.txt')
+        with open(bfile, 'w') as f:
+            f.write('hello there')
+        try:
+            arraybundle.read_array_bundle(bfile)
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), bfile + ' is not an array bundle file')
+
+    def test_encode_decode_string_pool(self):
+        strings = ['A1BG', '', 'ünïcode', 'A2M']
+        data, offsets = arraybundle.encode_string_pool(strings)
+        self.assertEqual(data.dtype, np.uint8)
+        self.assertEqual(offsets.tolist(), [0, 4, 4, 13, 16])
+        self.assertEqual(arraybundle.decode_string_pool(data, offsets),
+                         strings)
+
+        data, offsets = arraybundle.encode_string_pool([])
+        self.assertEqual(offsets.tolist(), [0])
+        self.assertEqual(arraybundle.decode_string_pool(data, offsets), [])
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `cxreader` module."""
+
+import io
+import os
+import json
+import unittest
+import shutil
+import tempfile
+
+from nbgwas_rest import cxreader
+
+
+class TestCXReader(unittest.TestCase):
+    """Tests for `cxreader` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self._temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self._temp_dir)
+
+    def get_cx(self, nodes, edges):
+        return json.dumps([{'numberVerification':
+                            [{'longNumber': 281474976710655}]},
+                           {'edges': edges},
+                           {'nodeAttributes': [{'po': 1, 'n': 'type',
+                                                'v': 'protein'}]},
+                           {'nodes': nodes},
+                           {'status': [{'error': '',
+                                        'success': True}]}]).encode('utf-8')
+
+    def test_read_cx_network_from_file(self):
+        cxfile = os.path.join(self._temp_dir, 'foo.cx')
+        with open(cxfile, 'wb') as f:
+            f.write(self.get_cx([{'@id': 10, 'n': 'A', 'r': 'x'},
+                                 {'@id': 2, 'n': 'B'}],
+                                [{'@id': 3, 's': 10, 't': 2,
+                                  'i': 'interacts'}]))
+        res = cxreader.read_cx_network(cxfile)
+        self.assertEqual(res.names, ['A', 'B'])
+        self.assertEqual(res.sources.tolist(), [0])
+        self.assertEqual(res.targets.tolist(), [1])
+
+    def test_read_cx_network_duplicate_and_missing_names(self):
+        cx = self.get_cx([{'@id': 5, 'n': 'A'},
+                          {'@id': 6},
+                          {'@id': 7, 'n': 'A'}],
+                         [{'@id': 1, 's': 5, 't': 6},
+                          {'@id': 2, 's': 7, 't': 6},
+                          {'@id': 3, 's': 6, 't': 6}])
+        res = cxreader.read_cx_network(io.BytesIO(cx))
+        self.assertEqual(res.names, ['A', '6'])
+        self.assertEqual(res.sources.tolist(), [0, 0, 1])
+        self.assertEqual(res.targets.tolist(), [1, 1, 1])
+
+    def test_read_cx_network_empty(self):
+        res = cxreader.read_cx_network(io.BytesIO(self.get_cx([], [])))
+        self.assertEqual(res.names, [])
+        self.assertEqual(len(res.sources), 0)
+        self.assertEqual(len(res.targets), 0)
+
+    def test_read_cx_network_edge_to_unknown_node(self):
+        cx = self.get_cx([{'@id': 1, 'n': 'A'}],
+                         [{'@id': 2, 's': 1, 't': 99}])
+        try:
+            cxreader.read_cx_network(io.BytesIO(cx))
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), 'Found edges referring to nodes '
+                                     'not in network')
+
+        cx = self.get_cx([], [{'@id': 2, 's': 1, 't': 99}])
+        try:
+            cxreader.read_cx_network(io.BytesIO(cx))
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), 'Found edges referring to nodes '
+                                     'not in network')
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `naga_proteincoding` script."""
+
+import os
+import gzip
+import unittest
+import shutil
+import tempfile
+
+import pandas as pd
+
+from nbgwas_rest import naga_proteincoding as npc
+from nbgwas_rest import proteincoding
+from nbgwas_rest.proteincoding import ProteinCodingTable
+
+
+class TestNagaProteinCoding(unittest.TestCase):
+    """Tests for `naga_proteincoding` script."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self._temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self._temp_dir)
+
+    def get_protein_coding(self):
+        return ('A 2 300 400\n'
+                'B 10 5 30\n'
+                'A 2 300 400\n'
+                'C 2 100 200\n')
+
+    def test_parse_arguments(self):
+        res = npc._parse_arguments('hi', ['pcd'])
+        self.assertEqual(res.protein_coding_dir, 'pcd')
+        self.assertEqual(res.protein_coding_suffix, '.txt')
+        self.assertEqual(res.outdir, None)
+        self.assertEqual(res.verbose, 1)
+
+        res = npc._parse_arguments('hi', ['pcd', '--outdir', 'out',
+                                          '--protein_coding_suffix', '.x',
+                                          '-vv'])
+        self.assertEqual(res.outdir, 'out')
+        self.assertEqual(res.protein_coding_suffix, '.x')
+        self.assertEqual(res.verbose, 3)
+
+    def test_get_protein_coding_builds(self):
+        for name in ['hg19.txt.gz', 'dm6.txt', 'mm10.txt', 'mm10.txt.gz',
+                     'README', 'hg19.nagapc']:
+            open(os.path.join(self._temp_dir, name), 'a').close()
+        os.makedirs(os.path.join(self._temp_dir, 'sub.txt'))
+        res = npc.get_protein_coding_builds(self._temp_dir, '.txt')
+        self.assertEqual(res, {'dm6': os.path.join(self._temp_dir,
+                                                   'dm6.txt'),
+                               'hg19': os.path.join(self._temp_dir,
+                                                    'hg19.txt.gz'),
+                               'mm10': os.path.join(self._temp_dir,
+                                                    'mm10.txt')})
+
+    def test_main(self):
+        pcdir = os.path.join(self._temp_dir, 'pc')
+        os.makedirs(pcdir)
+        with open(os.path.join(pcdir, 'dm6.txt'), 'w') as f:
+            f.write(self.get_protein_coding())
+        with gzip.open(os.path.join(pcdir, 'hg19.txt.gz'), 'wt') as f:
+            f.write(self.get_protein_coding())
+        outdir = os.path.join(self._temp_dir, 'out')
+        self.assertEqual(npc.main(['x.py', pcdir, '--outdir', outdir]), 0)
+        self.assertEqual(sorted(os.listdir(outdir)),
+                         ['dm6' + proteincoding.COMPILED_SUFFIX,
+                          'hg19' + proteincoding.COMPILED_SUFFIX])
+        for build in ['dm6', 'hg19']:
+            table = ProteinCodingTable.load(os.path.join(outdir, build +
+                                                         proteincoding.
+                                                         COMPILED_SUFFIX))
+            res = table.to_dataframe()
+            self.assertEqual(res.index.tolist(), ['B', 'C', 'A'])
+            self.assertEqual(res['Chrom'].tolist(), ['10', '2', '2'])
+
+        # output defaults to protein coding directory
+        self.assertEqual(npc.main(['x.py', pcdir]), 0)
+        pcfile = os.path.join(pcdir, 'dm6' + proteincoding.COMPILED_SUFFIX)
+        pd.testing.assert_frame_equal(ProteinCodingTable.load(pcfile).
+                                      to_dataframe(), res)
+
+    def test_main_no_files(self):
+        self.assertEqual(npc.main(['x.py', self._temp_dir]), 2)
+        self.assertEqual(npc.main(['x.py', os.path.join(self._temp_dir,
+                                                        'doesnotexist')]),
+                         2)
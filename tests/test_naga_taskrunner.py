@@ -3,20 +3,51 @@
 
 """Tests for `naga_taskrunner` script."""
 
+import io
 import os
+import gzip
 import json
+import hashlib
 import unittest
 import shutil
 import tempfile
+import threading
+import time
+import fcntl
+import inspect
 from unittest.mock import MagicMock
 
 import networkx as nx
+import numpy as np
+import pandas as pd
+from nbgwas import Nbgwas
 
 import nbgwas_rest
+from nbgwas_rest import arraybundle
 from nbgwas_rest import naga_taskrunner as nt
+from nbgwas_rest import naga_proteincoding
+from nbgwas_rest import proteincoding
+from nbgwas_rest import snpio
 from nbgwas_rest.naga_taskrunner import FileBasedTask
 from nbgwas_rest.naga_taskrunner import FileBasedSubmittedTaskFactory
 from nbgwas_rest.naga_taskrunner import NetworkXFromNDExFactory
+from nbgwas_rest.naga_taskrunner import NDExNetworkDiskCache
+from nbgwas_rest.naga_taskrunner import InMemoryLRUCache
+from nbgwas_rest.naga_taskrunner import ProteinCodingTableCache
+from nbgwas_rest.naga_taskrunner import FileSha256Memo
+from nbgwas_rest.naga_taskrunner import GeneHeatDiskCache
+from nbgwas_rest.naga_taskrunner import CompiledNetwork
+from nbgwas_rest.naga_taskrunner import CompiledNetworkFactory
+from nbgwas_rest.naga_taskrunner import FileSystemNetworkFactory
+from nbgwas_rest.naga_taskrunner import TaskPrefetcher
+from nbgwas_rest.naga_taskrunner import PropagationOperator
+from nbgwas_rest.naga_taskrunner import PropagationOperatorCache
+from nbgwas_rest.naga_taskrunner import SparseDiffusionSolver
+from nbgwas_rest.naga_taskrunner import SpectralDecomposition
+from nbgwas_rest.naga_taskrunner import LowRankDiffusionSolver
+from nbgwas_rest.naga_taskrunner import SingleFlight
+from nbgwas_rest.naga_taskrunner import FileLock
+from nbgwas_rest.naga_taskrunner import SingleFlightNetworkFactory
 from nbgwas_rest.naga_taskrunner import NagaTaskRunner
 from nbgwas_rest.naga_taskrunner import DeletedFileBasedTaskFactory
 
@@ -65,6 +96,46 @@ rs4475691       1       836671  T       C       1.0926  0.0847  0.295819
 rs1806509       1       843817  A       C       0.9152  0.0831  0.286321        0.0611  0       0.600917
 """ # noqa
 
+    def get_mini_cx(self):
+        return """[{"numberVerification": [{"longNumber": 281474976710655}]},
+ {"metaData": [{"name": "nodes", "elementCount": 2},
+               {"name": "edges", "elementCount": 1}]},
+ {"nodes": [{"@id": 1, "n": "A3GALT2"}, {"@id": 2, "n": "AADACL3"}]},
+ {"edges": [{"@id": 3, "s": 1, "t": 2, "i": "interacts"}]},
+ {"status": [{"error": "", "success": true}]}]
+"""
+
+    def get_mini_network_factory(self):
+        net_obj = nx.Graph()
+        net_obj.add_node(1, {NagaTaskRunner.NDEX_NAME: 'A3GALT2'})
+        net_obj.add_node(2, {NagaTaskRunner.NDEX_NAME: 'AADACL3'})
+        net_obj.add_edge(1, 2)
+        mock_network_fac = NetworkXFromNDExFactory()
+        mock_network_fac.get_networkx_object = MagicMock(return_value=net_obj)
+        return mock_network_fac
+
+    def create_mini_task(self, temp_dir, taskname, taskdict=None):
+        taskdir = os.path.join(temp_dir, nbgwas_rest.SUBMITTED_STATUS,
+                               '1.2.3.4', taskname)
+        os.makedirs(taskdir, mode=0o755)
+        with open(os.path.join(taskdir,
+                               nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM),
+                  'w') as f:
+            f.write(self.get_snp())
+        with open(os.path.join(taskdir,
+                               nbgwas_rest.PROTEIN_CODING_PARAM), 'w') as f:
+            f.write(self.get_protein_coding())
+        if taskdict is None:
+            taskdict = {nbgwas_rest.NDEX_PARAM: 'someid',
+                        nbgwas_rest.WINDOW_PARAM: 100,
+                        nbgwas_rest.ALPHA_PARAM: 0.2}
+        return FileBasedTask(taskdir, taskdict)
+
+    def get_task_result(self, task):
+        result = os.path.join(task.get_taskdir(), nbgwas_rest.RESULT)
+        with open(result, 'r') as f:
+            return json.load(f)
+
     def test_parse_arguments(self):
         """Test something."""
         res = nt._parse_arguments('hi', ['--protein_coding_dir',
@@ -77,6 +148,24 @@ rs1806509       1       843817  A       C       0.9152  0.0831  0.286321
         self.assertEqual(res.disabledelete, False)
         self.assertEqual(res.protein_coding_suffix, '.txt')
         self.assertEqual(res.ndexserver, 'public.ndexbio.org')
+        self.assertEqual(res.networkcachedir, None)
+        self.assertEqual(res.networkcachesize, 10240)
+        self.assertEqual(res.networkmemorycachesize, 0)
+        self.assertEqual(res.compilednetworkdir, None)
+        self.assertEqual(res.networkdir, None)
+        self.assertEqual(res.networkdirfallback, False)
+        self.assertEqual(res.streamcx, False)
+        self.assertEqual(res.prefetchdepth, 0)
+        self.assertEqual(res.operatorcachesize, 0)
+        self.assertEqual(res.operatorcachedir, None)
+        self.assertEqual(res.maxkernelsize, 4096)
+        self.assertEqual(res.batchsize, 1)
+        self.assertEqual(res.precision, nbgwas_rest.FLOAT64_PRECISION)
+        self.assertEqual(res.snpchunksize, 0)
+        self.assertEqual(res.workers, 1)
+        self.assertEqual(res.genecachedir, None)
+        self.assertEqual(res.genecachesize, 1024)
+        self.assertEqual(res.proteincodingcachesize, 64)
 
     def test_setuplogging(self):
         res = nt._parse_arguments('hi', ['--protein_coding_dir',
@@ -93,6 +182,9 @@ rs1806509       1       843817  A       C       0.9152  0.0831  0.286321
         self.assertEqual(task.get_protein_coding(), None)
         self.assertEqual(task.get_window(), None)
         self.assertEqual(task.get_ndex(), None)
+        self.assertEqual(task.get_solver(), nbgwas_rest.RANDOM_WALK_SOLVER)
+        self.assertEqual(task.get_tolerance(), None)
+        self.assertEqual(task.get_max_iterations(), None)
         self.assertEqual(task.get_state(), None)
         self.assertEqual(task.get_taskdict(), None)
         self.assertEqual(task.get_taskdir(), None)
@@ -147,9 +239,15 @@ rs1806509       1       843817  A       C       0.9152  0.0831  0.286321
                            nbgwas_rest.PROTEIN_CODING_PARAM: 'yo',
                            nbgwas_rest.WINDOW_PARAM: 10,
                            nbgwas_rest.
-                          SNP_LEVEL_SUMMARY_COL_LABEL_PARAM: 'a,b,c'
+                          SNP_LEVEL_SUMMARY_COL_LABEL_PARAM: 'a,b,c',
+                           nbgwas_rest.SOLVER_PARAM: nbgwas_rest.KRYLOV_SOLVER,
+                           nbgwas_rest.TOLERANCE_PARAM: 0.01,
+                           nbgwas_rest.MAX_ITERATIONS_PARAM: 5
                            })
         self.assertEqual(task.get_alpha(), 0.1)
+        self.assertEqual(task.get_solver(), nbgwas_rest.KRYLOV_SOLVER)
+        self.assertEqual(task.get_tolerance(), 0.01)
+        self.assertEqual(task.get_max_iterations(), 5)
         self.assertEqual(task.get_ndex(), 'ndex3')
         self.assertEqual(task.get_protein_coding(), 'yo')
         self.assertEqual(task.get_window(), 10)
@@ -214,6 +312,12 @@ rs1806509       1       843817  A       C       0.9152  0.0831  0.286321
             pc_file_txt = pc_file + '.txt'
             open(pc_file_txt, 'a').close()
             self.assertEqual(task.get_protein_coding_file(), pc_file_txt)
+
+            # compiled file is preferred
+            pc_file_compiled = pc_file + proteincoding.COMPILED_SUFFIX
+            open(pc_file_compiled, 'a').close()
+            self.assertEqual(task.get_protein_coding_file(),
+                             pc_file_compiled)
         finally:
             shutil.rmtree(temp_dir)
 
@@ -386,11 +490,16 @@ rs1806509       1       843817  A       C       0.9152  0.0831  0.286321
             snpfile = os.path.join(task.get_taskdir(),
                                    nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM)
             open(snpfile, 'a').close()
+            bundlefile = os.path.join(task.get_taskdir(),
+                                      nbgwas_rest.SNP_LEVEL_SUMMARY_BUNDLE)
+            open(bundlefile, 'a').close()
 
             self.assertEqual(task.move_task(nbgwas_rest.DONE_STATUS),
                              None)
 
             self.assertTrue(os.path.isfile(task.get_snp_level_summary_file()))
+            self.assertTrue(os.path.isfile(task.
+                                           get_snp_level_summary_bundle()))
 
             # move back and try move to done with delete set to true
             self.assertEqual(task.move_task(nbgwas_rest.PROCESSING_STATUS),
@@ -400,6 +509,7 @@ rs1806509       1       843817  A       C       0.9152  0.0831  0.286321
                                             delete_temp_files=True),
                              None)
             self.assertEqual(task.get_snp_level_summary_file(), None)
+            self.assertEqual(task.get_snp_level_summary_bundle(), None)
         finally:
             shutil.rmtree(temp_dir)
 
@@ -434,6 +544,9 @@ rs1806509       1       843817  A       C       0.9152  0.0831  0.286321
             open(os.path.join(valid_dir,
                               nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM),
                  'a').close()
+            open(os.path.join(valid_dir,
+                              nbgwas_rest.SNP_LEVEL_SUMMARY_BUNDLE),
+                 'a').close()
 
             task = FileBasedTask(valid_dir, {})
             self.assertEqual(task.delete_task_files(), None)
@@ -523,6 +636,36 @@ rs1806509       1       843817  A       C       0.9152  0.0831  0.286321
         finally:
             shutil.rmtree(temp_dir)
 
+    def test_filebasedsubmittedtaskfactory_get_next_tasks(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            fac = FileBasedSubmittedTaskFactory(temp_dir, None, None)
+            self.assertEqual(fac.get_next_tasks(max_tasks=2), [])
+
+            sdir = os.path.join(temp_dir, nbgwas_rest.SUBMITTED_STATUS)
+            for taskname in ['task1', 'task2', 'task3', 'badtask']:
+                taskdir = os.path.join(sdir, '1.2.3.4', taskname)
+                os.makedirs(taskdir, mode=0o755)
+                with open(os.path.join(taskdir, nbgwas_rest.TASK_JSON),
+                          'w') as f:
+                    if taskname != 'badtask':
+                        json.dump({'name': taskname}, f)
+
+            res = fac.get_next_tasks(max_tasks=10)
+            self.assertEqual(len(res), 3)
+            self.assertEqual(sorted([t.get_taskdict()['name']
+                                     for t in res]),
+                             ['task1', 'task2', 'task3'])
+            self.assertEqual(fac.get_size_of_problem_list(), 1)
+
+            res2 = fac.get_next_tasks(max_tasks=2)
+            self.assertEqual([t.get_taskdir() for t in res2],
+                             [t.get_taskdir() for t in res[:2]])
+            self.assertEqual(fac.get_next_task().get_taskdir(),
+                             res[0].get_taskdir())
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_networkxfromndexfactory(self):
         fac = NetworkXFromNDExFactory(ndex_server=None)
         self.assertEqual(fac.get_networkx_object(None), None)
@@ -534,6 +677,183 @@ rs1806509       1       843817  A       C       0.9152  0.0831  0.286321
         except Exception as ae:
             self.assertEqual(str(ae), 'Server and uuid not specified')
 
+    def test_ndexnetworkdiskcache_get_and_add(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            cdir = os.path.join(temp_dir, 'cache')
+            cache = NDExNetworkDiskCache(cdir)
+            self.assertEqual(cache.get_cache_dir(), cdir)
+            self.assertEqual(cache.get_cx_file('abc', 1), None)
+            self.assertEqual(cache.get_latest_cx_file('abc'), None)
+            self.assertEqual(cache.get_misses(), 2)
+            self.assertEqual(cache.get_hits(), 0)
+
+            cxfile = cache.add_cx_file('abc', 1, [b'[', b'', b']'])
+            self.assertTrue(os.path.isfile(cxfile))
+            with open(cxfile, 'rb') as f:
+                self.assertEqual(f.read(), b'[]')
+            self.assertEqual(cache.get_cx_file('abc', 1), cxfile)
+            self.assertEqual(cache.get_latest_cx_file('abc'), cxfile)
+            self.assertEqual(cache.get_hits(), 2)
+
+            # newer version replaces older version
+            cxfile2 = cache.add_cx_file('abc', 2, [b'[{}]'])
+            self.assertFalse(os.path.isfile(cxfile))
+            self.assertEqual(cache.get_cx_file('abc', 1), None)
+            self.assertEqual(cache.get_cx_file('abc', 2), cxfile2)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_ndexnetworkdiskcache_evicts_least_recently_used(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            cache = NDExNetworkDiskCache(temp_dir, max_size=20)
+            first = cache.add_cx_file('first', 1, [b'0123456789'])
+            second = cache.add_cx_file('second', 1, [b'0123456789'])
+            os.utime(first, (1, 1))
+            os.utime(second, (2, 2))
+
+            # touch first so second is least recently used
+            self.assertEqual(cache.get_cx_file('first', 1), first)
+            third = cache.add_cx_file('third', 1, [b'0123456789'])
+            self.assertTrue(os.path.isfile(first))
+            self.assertFalse(os.path.isfile(second))
+            self.assertTrue(os.path.isfile(third))
+
+            # a file bigger then cache is kept
+            big = cache.add_cx_file('big', 1, [b'0' * 30])
+            self.assertTrue(os.path.isfile(big))
+            self.assertFalse(os.path.isfile(first))
+            self.assertFalse(os.path.isfile(third))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_networkxfromndexfactory_get_cx_file(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            fac = NetworkXFromNDExFactory()
+            self.assertEqual(fac.get_cx_file('abc'), None)
+
+            cache = NDExNetworkDiskCache(temp_dir)
+            fac = NetworkXFromNDExFactory(networkcache=cache)
+            client = MagicMock()
+            client.get_network_summary = MagicMock(return_value={
+                NetworkXFromNDExFactory.MODIFICATION_TIME: 5})
+            resp = MagicMock()
+            resp.iter_content = MagicMock(return_value=[b'[]'])
+            client.get_network_as_cx_stream = MagicMock(return_value=resp)
+            fac._get_ndex_client = MagicMock(return_value=client)
+
+            # miss causes download
+            cxfile = fac.get_cx_file('abc')
+            self.assertEqual(cxfile, cache.get_cx_file('abc', 5))
+            self.assertEqual(client.get_network_as_cx_stream.call_count, 1)
+            resp.close.assert_called()
+
+            # hit does not download
+            self.assertEqual(fac.get_cx_file('abc'), cxfile)
+            self.assertEqual(client.get_network_as_cx_stream.call_count, 1)
+
+            # NDEx unreachable falls back to newest cached version
+            client.get_network_summary.side_effect = Exception('down')
+            self.assertEqual(fac.get_cx_file('abc'), cxfile)
+            self.assertEqual(fac.get_cx_file('xyz'), None)
+            self.assertEqual(fac.get_networkx_object('xyz'), None)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_networkxfromndexfactory_download_cx_file(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            fac = NetworkXFromNDExFactory()
+            client = MagicMock()
+            resp = MagicMock()
+            resp.iter_content = MagicMock(return_value=[b'[', b'', b']'])
+            client.get_network_as_cx_stream = MagicMock(return_value=resp)
+            fac._get_ndex_client = MagicMock(return_value=client)
+            cxfile = os.path.join(temp_dir, 'foo.cx')
+            self.assertEqual(fac.download_cx_file('foo', cxfile), cxfile)
+            with open(cxfile, 'r') as f:
+                self.assertEqual(f.read(), '[]')
+            resp.close.assert_called()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_filesystemnetworkfactory(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            fac = FileSystemNetworkFactory(temp_dir)
+            self.assertEqual(fac.get_networkx_object(None), None)
+            self.assertEqual(fac.get_networkx_object('someid'), None)
+
+            # load CX file
+            with open(fac.get_cx_file('someid'), 'w') as f:
+                f.write(self.get_mini_cx())
+            res = fac.get_networkx_object('someid')
+            self.assertTrue(isinstance(res, nx.Graph))
+            self.assertEqual(sorted([d[NagaTaskRunner.NDEX_NAME] for n, d
+                                     in res.nodes(data=True)]),
+                             ['A3GALT2', 'AADACL3'])
+
+            # compiled network is preferred
+            compiled = CompiledNetwork.from_edges(['x', 'y'], [0], [1])
+            compiled.save(fac.get_compiled_network_file('someid'))
+            res = fac.get_networkx_object('someid')
+            self.assertTrue(isinstance(res, CompiledNetwork))
+            self.assertEqual(res.node_names, ['x', 'y'])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_filesystemnetworkfactory_streamcx(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            fac = FileSystemNetworkFactory(temp_dir, streamcx=True)
+            with open(fac.get_cx_file('someid'), 'w') as f:
+                f.write(self.get_mini_cx())
+            res = fac.get_networkx_object('someid')
+            self.assertTrue(isinstance(res, CompiledNetwork))
+            self.assertEqual(res.node_names, ['A3GALT2', 'AADACL3'])
+            self.assertEqual(res.number_of_edges(), 1)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_networkxfromndexfactory_streamcx_no_cache(self):
+        fac = NetworkXFromNDExFactory(streamcx=True)
+        client = MagicMock()
+        resp = MagicMock()
+        resp.raw = io.BytesIO(self.get_mini_cx().encode('utf-8'))
+        client.get_network_as_cx_stream = MagicMock(return_value=resp)
+        fac._get_ndex_client = MagicMock(return_value=client)
+        res = fac.get_networkx_object('someid')
+        self.assertTrue(isinstance(res, CompiledNetwork))
+        self.assertEqual(res.node_names, ['A3GALT2', 'AADACL3'])
+        client.get_network_as_cx_stream.assert_called_with('someid')
+        resp.close.assert_called()
+
+    def test_filesystemnetworkfactory_with_ndex_fallback(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            netdir = os.path.join(temp_dir, 'networks')
+            ndexfac = NetworkXFromNDExFactory()
+            minicx = self.get_mini_cx()
+
+            def fake_download(ndex_uuid, path):
+                with open(path, 'w') as f:
+                    f.write(minicx)
+                return path
+            ndexfac.download_cx_file = MagicMock(side_effect=fake_download)
+            fac = FileSystemNetworkFactory(netdir, ndexfactory=ndexfac)
+            res = fac.get_networkx_object('someid')
+            self.assertEqual(res.number_of_edges(), 1)
+            self.assertTrue(os.path.isfile(fac.get_cx_file('someid')))
+
+            # second load comes from directory
+            res = fac.get_networkx_object('someid')
+            self.assertEqual(res.number_of_edges(), 1)
+            self.assertEqual(ndexfac.download_cx_file.call_count, 1)
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_nbgwastaskrunner_get_networkx_object(self):
 
         # try with None set as task
@@ -571,6 +891,62 @@ rs1806509       1       843817  A       C       0.9152  0.0831  0.286321
         self.assertEqual(res.node['node1']['name'], 'node1')
         self.assertEqual(res.node['node2']['name'], 'node2')
 
+    def test_inmemorylrucache(self):
+        cache = InMemoryLRUCache(max_size=10)
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.get_misses(), 1)
+        self.assertTrue(cache.put('a', 'aval', 4))
+        self.assertTrue(cache.put('b', 'bval', 4))
+        self.assertEqual(cache.get('a'), 'aval')
+        self.assertEqual(cache.get_hits(), 1)
+        self.assertEqual(cache.get_size(), 8)
+
+        # b is least recently used so it is evicted
+        self.assertTrue(cache.put('c', 'cval', 4))
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 'aval')
+        self.assertEqual(cache.get('c'), 'cval')
+        self.assertEqual(cache.get_number_of_entries(), 2)
+
+        # replacing entry updates size
+        self.assertTrue(cache.put('c', 'newc', 1))
+        self.assertEqual(cache.get_size(), 5)
+        self.assertEqual(cache.get('c'), 'newc')
+
+        # too big to store
+        self.assertFalse(cache.put('d', 'dval', 11))
+        self.assertEqual(cache.get('d'), None)
+        cache.remove('a')
+        cache.remove('notthere')
+        self.assertEqual(cache.get_size(), 1)
+
+        # no limit
+        cache = InMemoryLRUCache()
+        self.assertTrue(cache.put('a', 'aval', 2**40))
+
+    def test_nbgwastaskrunner_get_networkx_object_from_ndex_cached(self):
+        mock_network_fac = NetworkXFromNDExFactory()
+        net_obj = nx.Graph()
+        net_obj.add_node(1, {NagaTaskRunner.NDEX_NAME: 'node1'})
+        net_obj.add_node(2, {NagaTaskRunner.NDEX_NAME: 'node2'})
+        net_obj.add_edge(1, 2)
+        mock_network_fac.get_networkx_object = MagicMock(return_value=net_obj)
+        cache = InMemoryLRUCache(max_size=1048576)
+        runner = NagaTaskRunner(networkfactory=mock_network_fac,
+                                networkxcache=cache)
+        res = runner._get_networkx_object_from_ndex('123')
+        self.assertTrue(nx.is_frozen(res))
+        self.assertEqual(cache.get_size(),
+                         2 * NagaTaskRunner.NETWORKX_NODE_BYTES +
+                         NagaTaskRunner.NETWORKX_EDGE_BYTES)
+        self.assertTrue(runner._get_networkx_object_from_ndex('123') is res)
+        self.assertEqual(mock_network_fac.get_networkx_object.call_count, 1)
+        try:
+            res.add_node('node3')
+            self.fail('Expected NetworkXError')
+        except nx.NetworkXError:
+            pass
+
     def test_nbgwastaskrunner_process_task_networkx_is_none(self):
         temp_dir = tempfile.mkdtemp()
         try:
@@ -645,6 +1021,1568 @@ rs1806509       1       843817  A       C       0.9152  0.0831  0.286321
         finally:
             shutil.rmtree(temp_dir)
 
+    def test_nbgwastaskrunner_process_tasks_with_cached_network(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            mock_network_fac = self.get_mini_network_factory()
+            runner = NagaTaskRunner(networkfactory=mock_network_fac,
+                                    networkxcache=InMemoryLRUCache())
+            firsttask = self.create_mini_task(temp_dir, 'first')
+            secondtask = self.create_mini_task(temp_dir, 'second')
+            runner._process_task(firsttask)
+            runner._process_task(secondtask)
+            self.assertEqual(mock_network_fac.get_networkx_object.call_count,
+                             1)
+            self.assertTrue(nbgwas_rest.ERROR_STATUS not in
+                            secondtask.get_taskdict())
+            self.assertEqual(self.get_task_result(firsttask),
+                             self.get_task_result(secondtask))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_compilednetwork_from_networkx(self):
+        net_obj = nx.Graph()
+        net_obj.add_node(1, {NagaTaskRunner.NDEX_NAME: 'a'})
+        net_obj.add_node(2, {NagaTaskRunner.NDEX_NAME: 'b'})
+        net_obj.add_node(3, {NagaTaskRunner.NDEX_NAME: 'c'})
+        net_obj.add_node(4, {NagaTaskRunner.NDEX_NAME: 'a'})
+        net_obj.add_edge(1, 2)
+        net_obj.add_edge(4, 2)
+        net_obj.add_edge(3, 3)
+        net_obj.add_edge(2, 3)
+        compiled = CompiledNetwork.from_networkx(net_obj)
+        self.assertEqual(compiled.node_names, ['a', 'b', 'c'])
+
+        # should match what relabel_nodes then adjacency_matrix produce
+        relabeled = nx.relabel_nodes(net_obj, {1: 'a', 2: 'b',
+                                               3: 'c', 4: 'a'})
+        expected = nx.adjacency_matrix(relabeled, nodelist=['a', 'b', 'c'])
+        self.assertTrue(np.array_equal(compiled.adjacency_matrix.toarray(),
+                                       expected.toarray()))
+        self.assertEqual(compiled.number_of_edges(),
+                         relabeled.number_of_edges())
+        self.assertEqual(len(compiled.edges()), 3)
+        self.assertEqual(list(compiled.node_table['name']), ['a', 'b', 'c'])
+        self.assertEqual(compiled.laplacian_matrix.shape, (3, 3))
+
+        sub = compiled.subgraph(node_names=['b', 'c'])
+        self.assertEqual(sub.node_names, ['b', 'c'])
+        self.assertEqual(sub.number_of_edges(), 2)
+
+        compiled.set_node_attributes({'heat': {'a': 1.0}})
+        self.assertEqual(compiled.node_table['heat'].tolist()[0], 1.0)
+        compiled.set_node_attributes({'heat': {2: 3.0}},
+                                     namespace='nodeids')
+        self.assertEqual(compiled.node_table['heat'].tolist()[2], 3.0)
+        self.assertEqual(compiled.get_node_attributes()[2]['name'], 'c')
+        compiled.set_node_names()
+        self.assertEqual(compiled.node_names, ['a', 'b', 'c'])
+
+    def test_compilednetwork_save_and_load(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            compiled = CompiledNetwork.from_edges(['x', 'y', 'z'],
+                                                  [0, 1, 1], [1, 0, 2])
+            cfile = os.path.join(temp_dir, 'foo.nagacsr')
+            self.assertTrue(type(compiled.number_of_edges()) is int)
+            compiled.save(cfile, metadata={'ndex': '123'})
+            loaded = CompiledNetwork.load(cfile)
+            self.assertEqual(loaded.node_names, ['x', 'y', 'z'])
+            self.assertEqual(loaded.number_of_edges(), 2)
+
+            # numpy scalar edge count is stored as int
+            numpyedges = CompiledNetwork(['x', 'y', 'z'],
+                                         compiled.adjacency_matrix,
+                                         number_of_edges=np.int64(2))
+            self.assertTrue(type(numpyedges.number_of_edges()) is int)
+            numpyedges.save(cfile)
+            self.assertEqual(CompiledNetwork.load(cfile).number_of_edges(),
+                             2)
+            self.assertTrue(np.array_equal(loaded.adjacency_matrix.toarray(),
+                                           compiled.adjacency_matrix.
+                                           toarray()))
+
+            # not a compiled network
+            notnet = os.path.join(temp_dir, 'notnet')
+            nbgwas_rest.arraybundle.write_array_bundle(notnet, {})
+            try:
+                CompiledNetwork.load(notnet)
+                self.fail('Expected ValueError')
+            except ValueError as e:
+                self.assertEqual(str(e), notnet +
+                                 ' is not a compiled network')
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_compilednetworkfactory(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            cdir = os.path.join(temp_dir, 'compiled')
+            fac = CompiledNetworkFactory(cdir)
+            self.assertEqual(fac.get_networkx_object(None), None)
+            self.assertEqual(fac.get_networkx_object('someid'), None)
+
+            mock_network_fac = self.get_mini_network_factory()
+            fac = CompiledNetworkFactory(cdir,
+                                         networkfactory=mock_network_fac)
+            res = fac.get_networkx_object('someid')
+            self.assertTrue(isinstance(res, CompiledNetwork))
+            self.assertEqual(res.node_names, ['A3GALT2', 'AADACL3'])
+            cfile = fac.get_compiled_network_file('someid')
+            self.assertTrue(os.path.isfile(cfile))
+
+            # second call loads compiled file
+            res = fac.get_networkx_object('someid')
+            self.assertEqual(res.node_names, ['A3GALT2', 'AADACL3'])
+            self.assertEqual(mock_network_fac.get_networkx_object.call_count,
+                             1)
+
+            # underlying factory returns None
+            mock_network_fac.get_networkx_object = MagicMock(
+                return_value=None)
+            self.assertEqual(fac.get_networkx_object('otherid'), None)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_task_with_compiled_network(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory())
+            nxtask = self.create_mini_task(temp_dir, 'nxtask')
+            runner._process_task(nxtask)
+
+            cdir = os.path.join(temp_dir, 'compiled')
+            fac = CompiledNetworkFactory(cdir, networkfactory=self.
+                                         get_mini_network_factory())
+            runner = NagaTaskRunner(networkfactory=fac,
+                                    networkxcache=InMemoryLRUCache())
+            for taskname in ['compiled1', 'compiled2']:
+                task = self.create_mini_task(temp_dir, taskname)
+                runner._process_task(task)
+                self.assertTrue(nbgwas_rest.ERROR_STATUS not in
+                                task.get_taskdict())
+                self.assertEqual(self.get_task_result(task),
+                                 self.get_task_result(nxtask))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_task_with_filesystem_network(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory())
+            nxtask = self.create_mini_task(temp_dir, 'nxtask')
+            runner._process_task(nxtask)
+
+            netdir = os.path.join(temp_dir, 'networks')
+            os.makedirs(netdir, mode=0o755)
+            with open(os.path.join(netdir, 'someid.cx'), 'w') as f:
+                f.write(self.get_mini_cx())
+            runner = NagaTaskRunner(networkfactory=FileSystemNetworkFactory(
+                netdir))
+            task = self.create_mini_task(temp_dir, 'fstask')
+            runner._process_task(task)
+            self.assertTrue(nbgwas_rest.ERROR_STATUS not in
+                            task.get_taskdict())
+            self.assertEqual(self.get_task_result(task),
+                             self.get_task_result(nxtask))
+
+            runner = NagaTaskRunner(networkfactory=FileSystemNetworkFactory(
+                netdir, streamcx=True))
+            task = self.create_mini_task(temp_dir, 'streamtask')
+            runner._process_task(task)
+            self.assertTrue(nbgwas_rest.ERROR_STATUS not in
+                            task.get_taskdict())
+            self.assertEqual(self.get_task_result(task),
+                             self.get_task_result(nxtask))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_taskprefetcher(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            loader = MagicMock(side_effect=lambda x: 'net' + x)
+            prefetcher = TaskPrefetcher(loader, max_depth=2)
+            tasks = []
+            for ndex_id in ['a', None, 'a', 'b', 'c']:
+                tasks.append(FileBasedTask(temp_dir,
+                                           {nbgwas_rest.NDEX_PARAM:
+                                            ndex_id}))
+            self.assertEqual(prefetcher.prefetch_tasks(tasks), ['a', 'b'])
+            self.assertEqual(prefetcher.get_number_of_networks(), 2)
+            self.assertEqual(prefetcher.get_network('a'), 'neta')
+            self.assertEqual(prefetcher.get_network('a'), None)
+
+            # b is already prefetched and networks not wanted are dropped
+            self.assertEqual(prefetcher.prefetch_tasks(tasks[3:]), ['c'])
+            self.assertEqual(prefetcher.prefetch_tasks(tasks[4:]), [])
+            self.assertEqual(prefetcher.get_network('b'), None)
+            self.assertEqual(prefetcher.get_network('c'), 'netc')
+            self.assertEqual(loader.call_count, 3)
+            prefetcher.shutdown()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_taskprefetcher_reads_protein_coding_and_handles_error(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            loader = MagicMock(side_effect=Exception('some error'))
+            prefetcher = TaskPrefetcher(loader)
+            task = self.create_mini_task(temp_dir, 'task1')
+            self.assertEqual(prefetcher.prefetch_tasks([task]), ['someid'])
+            self.assertEqual(prefetcher.get_network('someid'), None)
+            loader.assert_called_with('someid')
+            prefetcher.shutdown()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_taskprefetcher_parses_protein_coding(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            loader = MagicMock(return_value='net')
+            pccache = ProteinCodingTableCache()
+            prefetcher = TaskPrefetcher(loader, proteincodingcache=pccache)
+            task = self.create_mini_task(temp_dir, 'task1')
+            self.assertEqual(prefetcher.prefetch_tasks([task]), ['someid'])
+            self.assertEqual(prefetcher.get_network('someid'), 'net')
+            self.assertEqual(pccache.get_misses(), 1)
+
+            # task gets table parsed by prefetcher
+            runner = NagaTaskRunner(wait_time=0, proteincodingcache=pccache)
+            runner._get_protein_coding_table(task)
+            self.assertEqual(pccache.get_misses(), 1)
+            self.assertEqual(pccache.get_hits(), 1)
+
+            # unparseable protein coding file does not stop prefetch
+            with open(task.get_protein_coding_file(), 'w') as f:
+                f.write('A 1 x y\n')
+            pccache = ProteinCodingTableCache()
+            prefetcher = TaskPrefetcher(loader, proteincodingcache=pccache)
+            self.assertEqual(prefetcher.prefetch_tasks([task]), ['someid'])
+            self.assertEqual(prefetcher.get_network('someid'), 'net')
+            prefetcher.shutdown()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_run_tasks_with_prefetch(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            netfac = self.get_mini_network_factory()
+            netfac.get_networkx_object = MagicMock(side_effect=netfac.
+                                                   get_networkx_object)
+            tasks = []
+            for taskname in ['task1', 'task2']:
+                task = self.create_mini_task(temp_dir, taskname)
+                task.save_task()
+                tasks.append(task)
+            tfac = FileBasedSubmittedTaskFactory(temp_dir, None, None)
+            runner = NagaTaskRunner(wait_time=0, taskfactory=tfac,
+                                    networkfactory=netfac,
+                                    networkxcache=InMemoryLRUCache(),
+                                    prefetch_depth=1)
+            loop = MagicMock()
+            loop.side_effect = [True, True, True, False]
+            runner.run_tasks(keep_looping=loop)
+            runner.shutdown()
+            self.assertEqual(netfac.get_networkx_object.call_count, 1)
+            results = []
+            for task in tasks:
+                donedir = os.path.join(temp_dir, nbgwas_rest.DONE_STATUS,
+                                       '1.2.3.4',
+                                       os.path.basename(task.get_taskdir()))
+                with open(os.path.join(donedir, nbgwas_rest.RESULT),
+                          'r') as f:
+                    results.append(json.load(f))
+            self.assertEqual(results[0], results[1])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def wait_for_waiters(self, singleflight, key, count):
+        for i in range(1000):
+            if singleflight.get_number_of_waiters(key) >= count:
+                return
+            time.sleep(0.01)
+        self.fail('Timed out waiting for ' + str(count) + ' waiters')
+
+    def run_concurrently(self, singleflight, key, func):
+        """
+        Runs func through singleflight.do() from a background thread
+        and, once that call is in flight, from the calling thread
+        """
+        release = threading.Event()
+        results = {}
+
+        def blocking_func():
+            release.wait()
+            return func()
+
+        def leader():
+            try:
+                results['leader'] = singleflight.do(key, blocking_func)
+            except Exception as e:
+                results['leader'] = e
+
+        thread = threading.Thread(target=leader)
+        thread.start()
+        for i in range(1000):
+            if singleflight.get_number_of_waiters(key) == 0 and \
+                    key in singleflight._calls:
+                break
+            time.sleep(0.01)
+
+        waiter = threading.Thread(target=lambda: results.
+                                  update(waiter=self.
+                                         _do_catch(singleflight, key,
+                                                   func)))
+        waiter.start()
+        self.wait_for_waiters(singleflight, key, 1)
+        release.set()
+        thread.join()
+        waiter.join()
+        return results
+
+    def _do_catch(self, singleflight, key, func):
+        try:
+            return singleflight.do(key, func)
+        except Exception as e:
+            return e
+
+    def test_singleflight(self):
+        sf = SingleFlight()
+        self.assertEqual(sf.get_number_of_waiters('a'), 0)
+        func = MagicMock(return_value=['x'])
+        self.assertEqual(sf.do('a', func), ['x'])
+        self.assertEqual(sf.do('a', func), ['x'])
+        self.assertEqual(func.call_count, 2)
+
+        func = MagicMock(return_value=['x'])
+        res = self.run_concurrently(sf, 'a', func)
+        self.assertEqual(func.call_count, 1)
+        self.assertTrue(res['leader'] is res['waiter'])
+        self.assertEqual(sf.get_number_of_waiters('a'), 0)
+
+    def test_singleflight_share_and_error(self):
+        sf = SingleFlight(share=lambda x: list(x))
+        func = MagicMock(return_value=['x'])
+        res = self.run_concurrently(sf, 'a', func)
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual(res['leader'], res['waiter'])
+        self.assertFalse(res['leader'] is res['waiter'])
+
+        func = MagicMock(side_effect=ValueError('bad'))
+        res = self.run_concurrently(sf, 'a', func)
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual(str(res['leader']), 'bad')
+        self.assertTrue(res['leader'] is res['waiter'])
+
+    def test_filelock(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            lockfile = os.path.join(temp_dir, 'foo.lock')
+            with FileLock(lockfile):
+                self.assertTrue(os.path.isfile(lockfile))
+                with open(lockfile, 'a') as f:
+                    try:
+                        fcntl.flock(f.fileno(),
+                                    fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        self.fail('Expected lock to be held')
+                    except OSError:
+                        pass
+            with open(lockfile, 'a') as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_singleflightnetworkfactory(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            lockdir = os.path.join(temp_dir, 'locks')
+            netfac = MagicMock()
+            compiled = CompiledNetwork.from_edges(['x', 'y'], [0], [1])
+
+            def get_network(ndex_uuid):
+                lockfile = os.path.join(lockdir, ndex_uuid + '.lock')
+                with open(lockfile, 'a') as f:
+                    try:
+                        fcntl.flock(f.fileno(),
+                                    fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        self.fail('Expected lock to be held')
+                    except OSError:
+                        pass
+                return compiled
+            netfac.get_networkx_object = MagicMock(side_effect=get_network)
+            fac = SingleFlightNetworkFactory(netfac, lockdir=lockdir)
+            self.assertEqual(fac.get_networkx_object(None), None)
+            self.assertEqual(fac.get_lock_file('someid'),
+                             os.path.join(lockdir, 'someid.lock'))
+            self.assertTrue(fac.get_networkx_object('someid') is compiled)
+
+            # waiters get copy of compiled network
+            res = self.run_concurrently(fac._singleflight, 'someid',
+                                        lambda: fac.
+                                        _load_network('someid'))
+            self.assertTrue(res['leader'] is compiled)
+            self.assertTrue(isinstance(res['waiter'], CompiledNetwork))
+            self.assertFalse(res['waiter'] is compiled)
+            self.assertEqual(res['waiter'].node_names, ['x', 'y'])
+            self.assertEqual(netfac.get_networkx_object.call_count, 2)
+
+            fac = SingleFlightNetworkFactory(netfac)
+            self.assertEqual(fac.get_lock_file('someid'), None)
+            netfac.get_networkx_object = MagicMock(return_value=compiled)
+            self.assertTrue(fac.get_networkx_object('someid') is compiled)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_get_network_lock_dir(self):
+        args = ['taskdir', '--protein_coding_dir', 'pcdir']
+        theargs = nt._parse_arguments('hi', args)
+        self.assertEqual(nt.get_network_lock_dir(theargs, '/tasks'), None)
+        for flag in ['--networkcachedir', '--networkdir',
+                     '--compilednetworkdir']:
+            theargs = nt._parse_arguments('hi', args + [flag, 'foo'])
+            self.assertEqual(nt.get_network_lock_dir(theargs, '/tasks'),
+                             os.path.join('/tasks', nt.NETWORK_LOCK_DIR))
+
+    def test_nbgwastaskrunner_loads_through_factory_single_flight(self):
+        netfac = MagicMock()
+        compiled = CompiledNetwork.from_edges(['x', 'y'], [0], [1])
+        netfac.get_networkx_object = MagicMock(return_value=compiled)
+        fac = SingleFlightNetworkFactory(netfac)
+        runner = NagaTaskRunner(wait_time=0, networkfactory=fac)
+
+        # loads are only deduplicated by the factory
+        self.assertFalse(hasattr(runner, '_singleflight'))
+        self.assertTrue(runner._load_networkx_object_from_ndex('someid')
+                        is compiled)
+        netfac.get_networkx_object.assert_called_once_with('someid')
+
+    def test_compilednetwork_copy(self):
+        net = CompiledNetwork.from_edges(['x', 'y'], [0], [1])
+        net.node_table['foo'] = [1, 2]
+        cnet = net.copy()
+        self.assertEqual(list(cnet.node_table.columns), ['name'])
+        self.assertEqual(cnet.node_names, ['x', 'y'])
+        self.assertTrue(cnet.adjacency_matrix is net.adjacency_matrix)
+        self.assertEqual(cnet.number_of_edges(), 1)
+
+    def test_nbgwastaskrunner_diffuse_matches_nbgwas(self):
+        graph = nx.gnm_random_graph(60, 150, seed=3)
+        graph = nx.relabel_nodes(graph, {n: 'G' + str(n)
+                                         for n in graph.nodes()})
+        rand = np.random.RandomState(5)
+        heat_a = rand.rand(60)
+        heat_b = (rand.rand(60) > 0.8).astype(float)
+
+        def get_network():
+            g = Nbgwas()
+            g.network = graph
+            g.network.node_table['a'] = heat_a
+            g.network.node_table['b'] = heat_b
+            return g
+
+        for alpha in [0.2, FileBasedTask.OPTIMAL]:
+            expected = get_network()
+            for attr in ['a', 'b']:
+                expected.diffuse(method=NagaTaskRunner.DIFFUSE_METHOD,
+                                 alpha=alpha, node_attribute=attr,
+                                 result_name='d' + attr)
+            g = get_network()
+            runner = NagaTaskRunner()
+            runner._diffuse(g.network, alpha, ['a', 'b'], ['da', 'db'])
+            self.assertEqual(list(g.network.node_table.index),
+                             list(expected.network.node_table.index))
+            for col in ['da', 'db']:
+                self.assertTrue(np.allclose(g.network.node_table[col],
+                                            expected.network.
+                                            node_table[col],
+                                            atol=1e-6))
+
+    def get_random_adjacency_matrix(self):
+        graph = nx.gnm_random_graph(40, 90, seed=7)
+        return nx.adjacency_matrix(graph, nodelist=sorted(graph.nodes()))
+
+    def test_propagationoperator(self):
+        adj = self.get_random_adjacency_matrix()
+        heat = np.random.RandomState(1).rand(2, 40)
+        expected = np.asarray(nt.random_walk_rst(heat, adj, 0.3).todense())
+
+        op = PropagationOperator.build(adj, 0.3)
+        self.assertEqual(op.get_alpha(), 0.3)
+        self.assertEqual(op.get_kernel().shape, (40, 40))
+        self.assertEqual(op.get_size(), 40 * 40 * 8)
+        self.assertTrue(np.allclose(op.propagate(heat), expected,
+                                    atol=1e-6))
+
+        op = PropagationOperator.build(adj, 0.3, max_kernel_size=100)
+        self.assertEqual(op.get_kernel(), None)
+        self.assertTrue(op.get_size() > 0)
+        self.assertTrue(np.allclose(op.propagate(heat), expected,
+                                    atol=1e-12))
+
+    def test_sparsediffusionsolver_invalid_solver(self):
+        for solver in [None, nbgwas_rest.RANDOM_WALK_SOLVER, 'foo']:
+            try:
+                SparseDiffusionSolver(solver)
+                self.fail('Expected ValueError')
+            except ValueError as e:
+                self.assertEqual(str(e), 'Unsupported solver: ' +
+                                 str(solver))
+
+    def test_sparsediffusionsolver(self):
+        adj = self.get_random_adjacency_matrix()
+        heat = np.random.RandomState(1).rand(3, 40)
+        heat[2] = 0.0
+        expected = np.asarray(nt.random_walk_rst(heat, adj, 0.3,
+                                                 threshold=1e-12,
+                                                 max_iter=1000).todense())
+        for solver in [nbgwas_rest.POWER_SOLVER, nbgwas_rest.KRYLOV_SOLVER]:
+            sds = SparseDiffusionSolver(solver, tolerance=1e-8)
+            out, stats = sds.solve(adj, heat, 0.3, names=['a', 'b', 'c'])
+            self.assertEqual(out.shape, (3, 40))
+            self.assertTrue(np.allclose(out, expected, atol=1e-6))
+            self.assertEqual(stats[SparseDiffusionSolver.SOLVER_KEY], solver)
+            self.assertEqual(stats[SparseDiffusionSolver.ALPHA_KEY], 0.3)
+            self.assertEqual(stats[SparseDiffusionSolver.TOLERANCE_KEY],
+                             1e-8)
+            self.assertEqual(stats[SparseDiffusionSolver.MAX_ITERATIONS_KEY],
+                             SparseDiffusionSolver.DEFAULT_MAX_ITERATIONS)
+            cols = stats[SparseDiffusionSolver.COLUMNS_KEY]
+            self.assertEqual(sorted(cols.keys()), ['a', 'b', 'c'])
+            for name in ['a', 'b']:
+                self.assertTrue(cols[name][SparseDiffusionSolver.
+                                           CONVERGED_KEY])
+                self.assertTrue(cols[name][SparseDiffusionSolver.
+                                           ITERATIONS_KEY] > 0)
+                self.assertTrue(cols[name][SparseDiffusionSolver.
+                                           RESIDUAL_KEY] <= 1e-8)
+            self.assertTrue(cols['c'][SparseDiffusionSolver.CONVERGED_KEY])
+            self.assertEqual(cols['c'][SparseDiffusionSolver.RESIDUAL_KEY],
+                             0.0)
+            json.dumps(stats)
+
+    def test_bicgstab_tolerance_keyword(self):
+        # checked against installed scipy which removed tol in 1.14
+        params = inspect.signature(nt.bicgstab).parameters
+        self.assertTrue(nt.BICGSTAB_TOLERANCE_KEYWORD in params)
+        if 'rtol' in params:
+            self.assertEqual(nt.BICGSTAB_TOLERANCE_KEYWORD, 'rtol')
+        else:
+            self.assertEqual(nt.BICGSTAB_TOLERANCE_KEYWORD, 'tol')
+
+        adj = self.get_random_adjacency_matrix()
+        heat = np.random.RandomState(2).rand(1, 40)
+        sds = SparseDiffusionSolver(nbgwas_rest.KRYLOV_SOLVER,
+                                    tolerance=1e-4)
+        out, stats = sds.solve(adj, heat, 0.3)
+        col = stats[SparseDiffusionSolver.COLUMNS_KEY]['0']
+        self.assertTrue(col[SparseDiffusionSolver.CONVERGED_KEY])
+        self.assertTrue(col[SparseDiffusionSolver.RESIDUAL_KEY] <= 1e-4)
+
+    def test_sparsediffusionsolver_max_iterations(self):
+        adj = self.get_random_adjacency_matrix()
+        heat = np.random.RandomState(1).rand(1, 40)
+        for solver in [nbgwas_rest.POWER_SOLVER, nbgwas_rest.KRYLOV_SOLVER]:
+            sds = SparseDiffusionSolver(solver, tolerance=1e-12,
+                                        max_iterations=1)
+            out, stats = sds.solve(adj, heat, 0.1)
+            col = stats[SparseDiffusionSolver.COLUMNS_KEY]['0']
+            self.assertEqual(col[SparseDiffusionSolver.ITERATIONS_KEY], 1)
+            self.assertFalse(col[SparseDiffusionSolver.CONVERGED_KEY])
+            self.assertTrue(col[SparseDiffusionSolver.RESIDUAL_KEY] > 1e-12)
+
+    def test_propagationoperatorcache(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            adj = self.get_random_adjacency_matrix()
+            cache = PropagationOperatorCache()
+            key = cache.get_key('someid', adj, 0.3)
+            self.assertEqual(key, cache.get_key('someid', adj.copy(), 0.3))
+            self.assertNotEqual(key, cache.get_key('someid', adj, 0.4))
+            self.assertNotEqual(key, cache.get_key('otherid', adj, 0.3))
+            self.assertNotEqual(key, cache.get_key('someid', adj[:39, :39],
+                                                   0.3))
+            self.assertEqual(cache.get_kernel_file(key), None)
+
+            op = cache.get_operator('someid', adj, 0.3)
+            self.assertTrue(cache.get_operator('someid', adj, 0.3) is op)
+            self.assertFalse(cache.get_operator('someid', adj, 0.4) is op)
+
+            spilldir = os.path.join(temp_dir, 'kernels')
+            cache = PropagationOperatorCache(spilldir=spilldir)
+            op = cache.get_operator('someid', adj, 0.3)
+            kfile = cache.get_kernel_file(key)
+            self.assertEqual(kfile, os.path.join(spilldir, key + '.npy'))
+            self.assertTrue(os.path.isfile(kfile))
+            self.assertTrue(isinstance(op.get_kernel(), np.memmap))
+
+            # new cache loads kernel from spill directory
+            cache = PropagationOperatorCache(spilldir=spilldir,
+                                             max_kernel_size=100)
+            op2 = cache.get_operator('someid', adj, 0.3)
+            self.assertTrue(np.array_equal(op.get_kernel(),
+                                           op2.get_kernel()))
+
+            # too big for kernel so nothing is spilled
+            op = cache.get_operator('someid', adj, 0.5)
+            self.assertEqual(op.get_kernel(), None)
+            self.assertFalse(os.path.isfile(cache.
+                                            get_kernel_file(cache.
+                                                            get_key('someid',
+                                                                    adj,
+                                                                    0.5))))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_spectraldecomposition_full_rank(self):
+        graph = nx.gnm_random_graph(40, 90, seed=7)
+        graph.add_node(40)
+        adj = nx.adjacency_matrix(graph, nodelist=sorted(graph.nodes()))
+        heat = np.random.RandomState(1).rand(2, 41)
+        for alpha in [0.2, 0.5]:
+            expected = PropagationOperator.build(adj, alpha).propagate(heat)
+            self.assertTrue(np.allclose(expected[:, 40], alpha * heat[:, 40]))
+            for rank in [41, 100]:
+                decomp = SpectralDecomposition.build(adj, rank)
+                self.assertEqual(decomp.get_rank(), 41)
+                self.assertTrue(np.allclose(decomp.propagate(heat, alpha),
+                                            expected))
+
+    def test_spectraldecomposition_truncated(self):
+        adj = self.get_random_adjacency_matrix()
+        heat = np.random.RandomState(1).rand(2, 40)
+        decomp = SpectralDecomposition.build(adj, 10)
+        self.assertEqual(decomp.get_rank(), 10)
+
+        # eigsh result should match top of dense decomposition
+        full = SpectralDecomposition.build(adj, 40)
+        values, vectors = np.linalg.eigh(full._scale[:, np.newaxis] ** -1 *
+                                         adj.toarray() /
+                                         full._scale[np.newaxis, :])
+        expected = SpectralDecomposition(values[30:], vectors[:, 30:],
+                                         full._scale)
+        self.assertTrue(np.allclose(decomp.propagate(heat, 0.3),
+                                    expected.propagate(heat, 0.3)))
+
+        temp_dir = tempfile.mkdtemp()
+        try:
+            dfile = os.path.join(temp_dir, 'foo')
+            decomp.save(dfile)
+            loaded = SpectralDecomposition.load(dfile)
+            self.assertEqual(loaded.get_rank(), 10)
+            self.assertEqual(loaded.get_size(), decomp.get_size())
+            self.assertTrue(np.allclose(loaded.propagate(heat, 0.3),
+                                        decomp.propagate(heat, 0.3)))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_lowrankdiffusionsolver(self):
+        adj = self.get_random_adjacency_matrix()
+        heat = np.random.RandomState(1).rand(2, 40)
+        expected = PropagationOperator.build(adj, 0.3).propagate(heat)
+
+        solver = LowRankDiffusionSolver(rank=40)
+        out, stats = solver.solve(adj, heat, 0.3, names=['a', 'b'])
+        self.assertTrue(np.allclose(out, expected))
+        self.assertEqual(stats[SparseDiffusionSolver.SOLVER_KEY],
+                         nbgwas_rest.LOWRANK_SOLVER)
+        self.assertEqual(stats[SparseDiffusionSolver.ALPHA_KEY], 0.3)
+        self.assertEqual(stats[LowRankDiffusionSolver.RANK_KEY], 40)
+        self.assertEqual(stats[SparseDiffusionSolver.TOLERANCE_KEY],
+                         SparseDiffusionSolver.DEFAULT_TOLERANCE)
+        for name in ['a', 'b']:
+            col = stats[SparseDiffusionSolver.COLUMNS_KEY][name]
+            self.assertTrue(col[SparseDiffusionSolver.RESIDUAL_KEY] < 1e-9)
+            self.assertTrue(col[SparseDiffusionSolver.CONVERGED_KEY])
+
+        # lower rank has larger reported error
+        out, stats = LowRankDiffusionSolver(rank=5,
+                                            tolerance=0.01).solve(adj, heat,
+                                                                  0.3)
+        self.assertEqual(stats[LowRankDiffusionSolver.RANK_KEY], 5)
+        self.assertEqual(out.shape, heat.shape)
+        for col in stats[SparseDiffusionSolver.COLUMNS_KEY].values():
+            self.assertTrue(col[SparseDiffusionSolver.RESIDUAL_KEY] > 0.01)
+            self.assertFalse(col[SparseDiffusionSolver.CONVERGED_KEY])
+
+    def test_lowrankdiffusionsolver_with_operator_cache(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            adj = self.get_random_adjacency_matrix()
+            heat = np.random.RandomState(1).rand(1, 40)
+            spilldir = os.path.join(temp_dir, 'kernels')
+            cache = PropagationOperatorCache(spilldir=spilldir)
+            decomp = cache.get_decomposition('someid', adj, 10)
+            self.assertTrue(cache.get_decomposition('someid', adj,
+                                                    10) is decomp)
+            self.assertFalse(cache.get_decomposition('someid', adj,
+                                                     5) is decomp)
+            dfile = os.path.join(spilldir,
+                                 cache.get_network_key('someid', adj) +
+                                 '_rank10.decomposition')
+            self.assertTrue(os.path.isfile(dfile))
+
+            # new cache loads decomposition from spill directory
+            cache = PropagationOperatorCache(spilldir=spilldir)
+            solver = LowRankDiffusionSolver(rank=10, ndex_id='someid',
+                                            operatorcache=cache)
+            out, stats = solver.solve(adj, heat, 0.2)
+            self.assertTrue(np.allclose(out, decomp.propagate(heat, 0.2)))
+            self.assertTrue(isinstance(cache.
+                                       get_decomposition('someid', adj,
+                                                         10)._vectors,
+                                       np.memmap))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_task_with_lowrank_solver(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory(),
+                                    operatorcache=PropagationOperatorCache())
+            nxtask = self.create_mini_task(temp_dir, 'nxtask')
+            runner._process_task(nxtask)
+            expected = self.get_task_result(nxtask)
+
+            taskdict = {nbgwas_rest.NDEX_PARAM: 'someid',
+                        nbgwas_rest.WINDOW_PARAM: 100,
+                        nbgwas_rest.ALPHA_PARAM: 0.2,
+                        nbgwas_rest.SOLVER_PARAM: nbgwas_rest.LOWRANK_SOLVER,
+                        nbgwas_rest.RANK_PARAM: 1000}
+            task = self.create_mini_task(temp_dir, 'lowrank',
+                                         taskdict=taskdict)
+            solver = runner._get_solver(task)
+            self.assertTrue(isinstance(solver, LowRankDiffusionSolver))
+            runner._process_task(task)
+            res = self.get_task_result(task)
+            for gene, vals in res[nbgwas_rest.RESULTVALUE_KEY].items():
+                self.assertTrue(np.allclose(vals,
+                                            expected[nbgwas_rest.
+                                                     RESULTVALUE_KEY][gene],
+                                            atol=1e-6))
+            stats = res[nbgwas_rest.DIFFUSION_STATS_KEY]
+            self.assertEqual(stats[SparseDiffusionSolver.SOLVER_KEY],
+                             nbgwas_rest.LOWRANK_SOLVER)
+            self.assertEqual(sorted(stats[SparseDiffusionSolver.
+                                          COLUMNS_KEY].keys()),
+                             [nbgwas_rest.DIFF_BIN_RESULT,
+                              nbgwas_rest.FINALHEAT_RESULT])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_filebasedtask_get_set_precision(self):
+        task = FileBasedTask(None, None)
+        self.assertEqual(task.get_precision(), None)
+        task.set_precision(nbgwas_rest.FLOAT32_PRECISION)
+        self.assertEqual(task.get_precision(),
+                         nbgwas_rest.FLOAT32_PRECISION)
+        self.assertEqual(task.get_taskdict(),
+                         {nbgwas_rest.PRECISION_PARAM:
+                          nbgwas_rest.FLOAT32_PRECISION})
+
+    def test_diffusion_in_single_precision(self):
+        adj = self.get_random_adjacency_matrix()
+        heat = np.random.RandomState(1).rand(2, 40)
+        expected = PropagationOperator.build(adj, 0.3).propagate(heat)
+
+        op = PropagationOperator.build(adj, 0.3, dtype=np.float32)
+        self.assertEqual(op.get_kernel().dtype, np.float32)
+        self.assertEqual(op.get_size(), 40 * 40 * 4)
+        out = op.propagate(heat)
+        self.assertEqual(out.dtype, np.float32)
+        self.assertTrue(np.allclose(out, expected, rtol=1e-4, atol=1e-6))
+
+        op = PropagationOperator.build(adj, 0.3, max_kernel_size=100,
+                                       dtype=np.float32)
+        self.assertEqual(op.get_kernel(), None)
+        out = op.propagate(heat)
+        self.assertEqual(out.dtype, np.float32)
+        self.assertTrue(np.allclose(out, expected, rtol=1e-4, atol=1e-5))
+
+        for solver in [SparseDiffusionSolver(nbgwas_rest.POWER_SOLVER,
+                                             dtype=np.float32),
+                       SparseDiffusionSolver(nbgwas_rest.KRYLOV_SOLVER,
+                                             dtype=np.float32),
+                       LowRankDiffusionSolver(rank=40, dtype=np.float32)]:
+            out, stats = solver.solve(adj, heat, 0.3)
+            self.assertEqual(out.dtype, np.float32)
+            self.assertTrue(np.allclose(out, expected, rtol=1e-4,
+                                        atol=1e-5))
+            for col in stats[SparseDiffusionSolver.COLUMNS_KEY].values():
+                self.assertTrue(col[SparseDiffusionSolver.CONVERGED_KEY])
+
+        cache = PropagationOperatorCache()
+        self.assertNotEqual(cache.get_key('someid', adj, 0.3),
+                            cache.get_key('someid', adj, 0.3,
+                                          dtype=np.float32))
+        self.assertTrue(cache.get_key('someid', adj, 0.3,
+                                      dtype=np.float32).endswith('_float32'))
+        op = cache.get_operator('someid', adj, 0.3, dtype=np.float32)
+        self.assertEqual(op.get_kernel().dtype, np.float32)
+        decomp = cache.get_decomposition('someid', adj, 5, dtype=np.float32)
+        self.assertEqual(decomp.get_size(), (5 + 40 * 5 + 40) * 4)
+        self.assertFalse(cache.get_decomposition('someid', adj, 5) is decomp)
+
+    def test_nbgwastaskrunner_process_task_comma_delimited_snps(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory())
+            nxtask = self.create_mini_task(temp_dir, 'nxtask')
+            runner._process_task(nxtask)
+            expected = self.get_task_result(nxtask)
+
+            task = self.create_mini_task(temp_dir, 'comma')
+            snpfile = task.get_snp_level_summary_file()
+            with open(snpfile, 'w') as f:
+                for line in self.get_snp().splitlines():
+                    f.write(' , '.join(line.split()) + '\n')
+            runner._process_task(task)
+            self.assertEqual(self.get_task_result(task), expected)
+
+            taskdict = self.get_batch_taskdict(100)
+            taskdict[nbgwas_rest.SNP_LEVEL_SUMMARY_COL_LABEL_PARAM] = \
+                'chromosome,bp,pvalue'
+            task = self.create_mini_task(temp_dir, 'badlabel',
+                                         taskdict=taskdict)
+            try:
+                runner._process_task(task)
+                self.fail('Expected ValueError')
+            except ValueError as e:
+                self.assertTrue(str(e).startswith('Column(s) bp not found '
+                                                  'in SNP level summary '
+                                                  'header'))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_task_gzip_snps(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory())
+            nxtask = self.create_mini_task(temp_dir, 'nxtask')
+            runner._process_task(nxtask)
+            expected = self.get_task_result(nxtask)
+
+            for chunksize in [0, 3]:
+                runner = NagaTaskRunner(networkfactory=self.
+                                        get_mini_network_factory(),
+                                        snp_chunk_size=chunksize)
+                task = self.create_mini_task(temp_dir, 'gz' + str(chunksize))
+                snpfile = task.get_snp_level_summary_file()
+                with gzip.open(snpfile, 'wt') as f:
+                    f.write(self.get_snp())
+                runner._process_task(task)
+                self.assertEqual(self.get_task_result(task), expected)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_task_with_snp_bundle(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory())
+            nxtask = self.create_mini_task(temp_dir, 'nxtask')
+            self.assertEqual(nxtask.get_snp_level_summary_bundle(), None)
+            runner._process_task(nxtask)
+            expected = self.get_task_result(nxtask)
+
+            for chunksize in [0, 3]:
+                runner = NagaTaskRunner(networkfactory=self.
+                                        get_mini_network_factory(),
+                                        snp_chunk_size=chunksize)
+                task = self.create_mini_task(temp_dir,
+                                             'bundle' + str(chunksize))
+                bundlefile = os.path.join(task.get_taskdir(),
+                                          nbgwas_rest.
+                                          SNP_LEVEL_SUMMARY_BUNDLE)
+                snpfile = task.get_snp_level_summary_file()
+                snpio.write_snp_level_summary_bundle(snpfile, bundlefile,
+                                                     'chromosome',
+                                                     'basepair', 'pvalue')
+                self.assertEqual(task.get_snp_level_summary_bundle(),
+                                 bundlefile)
+                self.assertTrue(runner.
+                                _read_snp_level_summary_bundle(task)
+                                is not None)
+
+                # bundle is used instead of text
+                with open(snpfile, 'w') as f:
+                    f.write('garbage')
+                runner._process_task(task)
+                self.assertEqual(self.get_task_result(task), expected)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_read_snp_bundle_unusable(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner()
+            task = self.create_mini_task(temp_dir, 'bad')
+            bundlefile = os.path.join(task.get_taskdir(),
+                                      nbgwas_rest.SNP_LEVEL_SUMMARY_BUNDLE)
+            with open(bundlefile, 'w') as f:
+                f.write('not a bundle')
+            self.assertEqual(runner._read_snp_level_summary_bundle(task),
+                             None)
+
+            # bundle parsed with other column labels
+            snpfile = task.get_snp_level_summary_file()
+            snpio.write_snp_level_summary_bundle(snpfile, bundlefile,
+                                                 'chromosome', 'basepair',
+                                                 'pvalue')
+            self.assertTrue(runner._read_snp_level_summary_bundle(task)
+                            is not None)
+            taskdict = self.get_batch_taskdict(100)
+            taskdict[nbgwas_rest.SNP_LEVEL_SUMMARY_COL_LABEL_PARAM] = \
+                'pvalue,basepair,chromosome'
+            task = FileBasedTask(task.get_taskdir(), taskdict)
+            self.assertEqual(runner._read_snp_level_summary_bundle(task),
+                             None)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_proteincodingtablecache(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            cache = ProteinCodingTableCache()
+            pcfile = os.path.join(temp_dir, 'hg19.txt')
+            with open(pcfile, 'w') as f:
+                f.write(self.get_protein_coding())
+            table = cache.get_table(pcfile)
+            self.assertEqual(cache.get_misses(), 1)
+            self.assertTrue(cache.get_table(pcfile) is table)
+            self.assertEqual(cache.get_hits(), 1)
+
+            # file with same content elsewhere, such as one
+            # uploaded with a task, shares the table
+            otherfile = os.path.join(temp_dir, 'protein_coding')
+            shutil.copyfile(pcfile, otherfile)
+            self.assertTrue(cache.get_table(otherfile) is table)
+            self.assertEqual(cache.get_key(otherfile),
+                             cache.get_key(pcfile))
+
+            # changed file is parsed again
+            with open(otherfile, 'a') as f:
+                f.write('NEWGENE 1 5 10\n')
+            newtable = cache.get_table(otherfile)
+            self.assertEqual(newtable.get_number_of_genes(),
+                             table.get_number_of_genes() + 1)
+            self.assertEqual(cache.get_misses(), 2)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_filesha256memo(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            memo = FileSha256Memo(max_entries=1)
+            afile = os.path.join(temp_dir, 'a')
+            with open(afile, 'w') as f:
+                f.write('hello')
+            expected = hashlib.sha256(b'hello').hexdigest()
+            self.assertEqual(memo.get_sha256(afile), expected)
+            self.assertEqual(memo.get_sha256(afile), expected)
+            self.assertEqual(memo.get_misses(), 1)
+            self.assertEqual(memo.get_hits(), 1)
+
+            # changed file is hashed again
+            with open(afile, 'a') as f:
+                f.write(' there')
+            self.assertEqual(memo.get_sha256(afile),
+                             hashlib.sha256(b'hello there').hexdigest())
+            self.assertEqual(memo.get_misses(), 2)
+
+            # least recently used digest is forgotten
+            bfile = os.path.join(temp_dir, 'b')
+            shutil.copyfile(afile, bfile)
+            memo.get_sha256(bfile)
+            memo.get_sha256(afile)
+            self.assertEqual(memo.get_misses(), 4)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_get_gene_cache_key_hashes_once(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            pcfile = os.path.join(temp_dir, 'hg19.txt')
+            with open(pcfile, 'w') as f:
+                f.write(self.get_protein_coding())
+            task = MagicMock()
+            task.get_protein_coding_file = MagicMock(return_value=pcfile)
+            task.get_snp_level_summary_sha256 = MagicMock(return_value='a')
+            task.get_window = MagicMock(return_value=10)
+            task.get_snp_chromosome_label = MagicMock(return_value='chr')
+            task.get_snp_basepair_label = MagicMock(return_value='bp')
+            task.get_snp_pvalue_label = MagicMock(return_value='p')
+            genecache = GeneHeatDiskCache(os.path.join(temp_dir, 'genes'))
+
+            runner = NagaTaskRunner(genecache=genecache)
+            key = runner._get_gene_cache_key(task, None)
+            self.assertEqual(runner._get_gene_cache_key(task, None), key)
+            self.assertEqual(runner._pc_sha256s.get_misses(), 1)
+
+            # digest computed by protein coding cache is reused
+            pccache = ProteinCodingTableCache()
+            runner = NagaTaskRunner(genecache=genecache,
+                                    proteincodingcache=pccache)
+            pccache.get_table(pcfile)
+            self.assertEqual(runner._get_gene_cache_key(task, None), key)
+            self.assertEqual(runner._pc_sha256s.get_misses(), 0)
+            self.assertEqual(pccache._sha256s.get_misses(), 1)
+            self.assertEqual(pccache._sha256s.get_hits(), 1)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_task_with_protein_coding_cache(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory())
+            nxtask = self.create_mini_task(temp_dir, 'nxtask')
+            runner._process_task(nxtask)
+            expected = self.get_task_result(nxtask)
+
+            pccache = ProteinCodingTableCache()
+            for chunksize in [0, 3]:
+                runner = NagaTaskRunner(networkfactory=self.
+                                        get_mini_network_factory(),
+                                        snp_chunk_size=chunksize,
+                                        proteincodingcache=pccache)
+                for i in range(2):
+                    task = self.create_mini_task(temp_dir,
+                                                 str(chunksize) + str(i))
+                    runner._process_task(task)
+                    self.assertEqual(self.get_task_result(task), expected)
+            self.assertEqual(pccache.get_misses(), 1)
+            self.assertEqual(pccache.get_hits(), 3)
+
+            # task without protein coding file
+            task = FileBasedTask(temp_dir, {})
+            try:
+                runner._get_protein_coding_table(task)
+                self.fail('Expected ValueError')
+            except ValueError as e:
+                self.assertEqual(str(e), 'Protein coding file not found')
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_task_with_compiled_protein_coding(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory())
+            nxtask = self.create_mini_task(temp_dir, 'nxtask')
+            runner._process_task(nxtask)
+            expected = self.get_task_result(nxtask)
+
+            pcdir = os.path.join(temp_dir, 'pcdir')
+            os.makedirs(pcdir, mode=0o755)
+            with open(os.path.join(pcdir, 'mini.txt'), 'w') as f:
+                f.write(self.get_protein_coding())
+            self.assertEqual(naga_proteincoding.main(['x.py', pcdir]), 0)
+            os.unlink(os.path.join(pcdir, 'mini.txt'))
+
+            for pccache in [None, ProteinCodingTableCache()]:
+                runner = NagaTaskRunner(networkfactory=self.
+                                        get_mini_network_factory(),
+                                        proteincodingcache=pccache)
+                task = self.create_mini_task(temp_dir, str(pccache))
+                os.unlink(os.path.join(task.get_taskdir(),
+                                       nbgwas_rest.PROTEIN_CODING_PARAM))
+                tdict = task.get_taskdict()
+                tdict[nbgwas_rest.PROTEIN_CODING_PARAM] = 'mini'
+                task = FileBasedTask(task.get_taskdir(), tdict,
+                                     protein_coding_dir=pcdir)
+                self.assertTrue(proteincoding.
+                                is_compiled(task.get_protein_coding_file()))
+                runner._process_task(task)
+                self.assertEqual(self.get_task_result(task), expected)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_task_with_snp_chunks(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory())
+            nxtask = self.create_mini_task(temp_dir, 'nxtask')
+            runner._process_task(nxtask)
+            expected = self.get_task_result(nxtask)
+
+            for chunksize in [1, 3, 1000]:
+                runner = NagaTaskRunner(networkfactory=self.
+                                        get_mini_network_factory(),
+                                        snp_chunk_size=chunksize)
+                task = self.create_mini_task(temp_dir, str(chunksize))
+                runner._process_task(task)
+                self.assertEqual(self.get_task_result(task), expected)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_task_with_workers(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory())
+            nxtask = self.create_mini_task(temp_dir, 'nxtask')
+            runner._process_task(nxtask)
+            expected = self.get_task_result(nxtask)
+
+            for chunksize in [0, 2]:
+                runner = NagaTaskRunner(networkfactory=self.
+                                        get_mini_network_factory(),
+                                        snp_chunk_size=chunksize,
+                                        workers=3)
+                try:
+                    task = self.create_mini_task(temp_dir,
+                                                 'text' + str(chunksize))
+                    runner._process_task(task)
+                    self.assertEqual(self.get_task_result(task), expected)
+
+                    task = self.create_mini_task(temp_dir,
+                                                 'bundle' + str(chunksize))
+                    snpio.write_snp_level_summary_bundle(
+                        task.get_snp_level_summary_file(),
+                        os.path.join(task.get_taskdir(),
+                                     nbgwas_rest.SNP_LEVEL_SUMMARY_BUNDLE),
+                        'chromosome', 'basepair', 'pvalue')
+                    runner._process_task(task)
+                    self.assertEqual(self.get_task_result(task), expected)
+                finally:
+                    runner.shutdown()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_geneheatdiskcache(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            cachedir = os.path.join(temp_dir, 'genes')
+            cache = GeneHeatDiskCache(cachedir)
+            self.assertEqual(cache.get_cache_dir(), cachedir)
+            key = cache.get_key('snp', 'pc', '100', ['a', 'b', 'c'])
+            self.assertEqual(key, cache.get_key('snp', 'pc', 100,
+                                                ('a', 'b', 'c')))
+            for other in [cache.get_key('snp2', 'pc', 100, ['a', 'b', 'c']),
+                          cache.get_key('snp', 'pc2', 100, ['a', 'b', 'c']),
+                          cache.get_key('snp', 'pc', 10, ['a', 'b', 'c']),
+                          cache.get_key('snp', 'pc', None, ['a', 'b', 'c']),
+                          cache.get_key('snp', 'pc', 100, ['c', 'b', 'a'])]:
+                self.assertNotEqual(key, other)
+
+            self.assertEqual(cache.get_table(key), None)
+            self.assertEqual(cache.get_misses(), 1)
+            table = pd.DataFrame({'Gene': ['B', 'A'],
+                                  'Other': ['x', 'y'],
+                                  'P': [0.5, 1e-9],
+                                  'Heat': [0.0, 1.0]})
+            genefile = cache.add_table(key, table, 'Gene', ['P', 'Heat'])
+            self.assertEqual(os.path.dirname(genefile), cachedir)
+            res = cache.get_table(key)
+            self.assertEqual(cache.get_hits(), 1)
+            pd.testing.assert_frame_equal(res, table[['Gene', 'P', 'Heat']])
+
+            # file that is not a gene table is a miss
+            arraybundle.write_array_bundle(genefile, {'x': np.arange(2)})
+            self.assertEqual(cache.get_table(key), None)
+            self.assertEqual(cache.get_misses(), 2)
+
+            # least recently used tables are evicted
+            cache = GeneHeatDiskCache(cachedir, max_size=1)
+            cache.add_table('1', table, 'Gene', ['P'])
+            cache.add_table('2', table, 'Gene', ['P'])
+            self.assertEqual(sorted(os.listdir(cachedir)),
+                             ['2' + GeneHeatDiskCache.SUFFIX])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_task_with_gene_cache(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            genecache = GeneHeatDiskCache(os.path.join(temp_dir, 'genes'))
+            expected = {}
+            for alpha in [0.2, 0.5]:
+                taskdict = self.get_batch_taskdict(100, alpha=alpha)
+                runner = NagaTaskRunner(networkfactory=self.
+                                        get_mini_network_factory())
+                nxtask = self.create_mini_task(temp_dir, 'nx' + str(alpha),
+                                               taskdict=dict(taskdict))
+                runner._process_task(nxtask)
+                expected[alpha] = self.get_task_result(nxtask)
+
+                runner = NagaTaskRunner(networkfactory=self.
+                                        get_mini_network_factory(),
+                                        genecache=genecache)
+                task = self.create_mini_task(temp_dir, str(alpha),
+                                             taskdict=dict(taskdict))
+                runner._process_task(task)
+                self.assertEqual(self.get_task_result(task), expected[alpha])
+            self.assertEqual(genecache.get_misses(), 1)
+            self.assertEqual(genecache.get_hits(), 1)
+
+            # recorded sha256 of snp level summary is used as is
+            taskdict = self.get_batch_taskdict(100)
+            taskdict[nbgwas_rest.SNP_LEVEL_SUMMARY_SHA256_PARAM] = 'abc'
+            task = self.create_mini_task(temp_dir, 'sha',
+                                         taskdict=taskdict)
+            self.assertEqual(task.get_snp_level_summary_sha256(), 'abc')
+            runner._process_task(task)
+            self.assertEqual(self.get_task_result(task), expected[0.2])
+            self.assertEqual(genecache.get_misses(), 2)
+
+            # different window is a miss
+            task = self.create_mini_task(temp_dir, 'window',
+                                         taskdict=self.
+                                         get_batch_taskdict(5))
+            runner._process_task(task)
+            self.assertEqual(genecache.get_misses(), 3)
+            self.assertEqual(genecache.get_hits(), 1)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_task_with_precision(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory())
+            nxtask = self.create_mini_task(temp_dir, 'nxtask')
+            runner._process_task(nxtask)
+            self.assertEqual(nxtask.get_precision(),
+                             nbgwas_rest.FLOAT64_PRECISION)
+            expected = self.get_task_result(nxtask)
+
+            for solver in [None, nbgwas_rest.POWER_SOLVER,
+                           nbgwas_rest.KRYLOV_SOLVER,
+                           nbgwas_rest.LOWRANK_SOLVER]:
+                for opcache in [None, PropagationOperatorCache()]:
+                    # runner default is overridden by task
+                    runner = NagaTaskRunner(networkfactory=self.
+                                            get_mini_network_factory(),
+                                            operatorcache=opcache,
+                                            precision=nbgwas_rest.
+                                            FLOAT64_PRECISION)
+                    taskdict = self.get_batch_taskdict(100, solver=solver)
+                    taskdict[nbgwas_rest.PRECISION_PARAM] = \
+                        nbgwas_rest.FLOAT32_PRECISION
+                    task = self.create_mini_task(temp_dir, str(solver) +
+                                                 str(opcache is None),
+                                                 taskdict=taskdict)
+                    self.assertEqual(runner._get_dtype(task), np.float32)
+                    runner._process_task(task)
+                    res = self.get_task_result(task)
+                    self.assertEqual(sorted(res[nbgwas_rest.
+                                                RESULTVALUE_KEY].keys()),
+                                     sorted(expected[nbgwas_rest.
+                                                     RESULTVALUE_KEY].keys()))
+                    for gene, vals in res[nbgwas_rest.
+                                          RESULTVALUE_KEY].items():
+                        self.assertTrue(np.allclose(vals,
+                                                    expected[nbgwas_rest.
+                                                             RESULTVALUE_KEY]
+                                                    [gene], rtol=1e-4,
+                                                    atol=1e-5))
+                    with open(os.path.join(task.get_taskdir(),
+                                           nbgwas_rest.TASK_JSON)) as f:
+                        self.assertEqual(json.load(f)[nbgwas_rest.
+                                                      PRECISION_PARAM],
+                                         nbgwas_rest.FLOAT32_PRECISION)
+
+            # runner default is recorded in task
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory(),
+                                    precision=nbgwas_rest.FLOAT32_PRECISION)
+            task = self.create_mini_task(temp_dir, 'default')
+            runner._process_task(task)
+            self.assertEqual(task.get_precision(),
+                             nbgwas_rest.FLOAT32_PRECISION)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_task_with_sparse_solver(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory())
+            nxtask = self.create_mini_task(temp_dir, 'nxtask')
+            runner._process_task(nxtask)
+            expected = self.get_task_result(nxtask)
+            self.assertTrue(nbgwas_rest.DIFFUSION_STATS_KEY not in expected)
+
+            for solver in [nbgwas_rest.POWER_SOLVER,
+                           nbgwas_rest.KRYLOV_SOLVER]:
+                taskdict = {nbgwas_rest.NDEX_PARAM: 'someid',
+                            nbgwas_rest.WINDOW_PARAM: 100,
+                            nbgwas_rest.ALPHA_PARAM: 0.2,
+                            nbgwas_rest.SOLVER_PARAM: solver,
+                            nbgwas_rest.TOLERANCE_PARAM: 1e-9,
+                            nbgwas_rest.MAX_ITERATIONS_PARAM: 50}
+                task = self.create_mini_task(temp_dir, solver,
+                                             taskdict=taskdict)
+                runner._process_task(task)
+                res = self.get_task_result(task)
+                for gene, vals in res[nbgwas_rest.RESULTVALUE_KEY].items():
+                    self.assertTrue(np.allclose(vals,
+                                                expected[nbgwas_rest.
+                                                         RESULTVALUE_KEY]
+                                                [gene], atol=1e-6))
+                stats = res[nbgwas_rest.DIFFUSION_STATS_KEY]
+                self.assertEqual(stats[SparseDiffusionSolver.SOLVER_KEY],
+                                 solver)
+                self.assertEqual(stats[SparseDiffusionSolver.
+                                       MAX_ITERATIONS_KEY], 50)
+                cols = stats[SparseDiffusionSolver.COLUMNS_KEY]
+                self.assertEqual(sorted(cols.keys()),
+                                 [nbgwas_rest.DIFF_BIN_RESULT,
+                                  nbgwas_rest.FINALHEAT_RESULT])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def get_batch_taskdict(self, window, alpha=0.2, ndex_id='someid',
+                           solver=None):
+        taskdict = {nbgwas_rest.NDEX_PARAM: ndex_id,
+                    nbgwas_rest.WINDOW_PARAM: window,
+                    nbgwas_rest.ALPHA_PARAM: alpha}
+        if solver is not None:
+            taskdict[nbgwas_rest.SOLVER_PARAM] = solver
+        return taskdict
+
+    def test_nbgwastaskrunner_get_batch_key(self):
+        runner = NagaTaskRunner()
+        key = runner._get_batch_key(FileBasedTask(None,
+                                                  self.
+                                                  get_batch_taskdict(100)))
+        self.assertEqual(key, ('someid', 0.2,
+                               nbgwas_rest.RANDOM_WALK_SOLVER, None, None,
+                               None, nbgwas_rest.FLOAT64_PRECISION))
+        self.assertEqual(key, runner.
+                         _get_batch_key(FileBasedTask(None,
+                                                      self.
+                                                      get_batch_taskdict(5))))
+        taskdict = self.get_batch_taskdict(100)
+        taskdict[nbgwas_rest.PRECISION_PARAM] = nbgwas_rest.FLOAT32_PRECISION
+        for taskdict in [taskdict,
+                         self.get_batch_taskdict(100, alpha=0.3),
+                         self.get_batch_taskdict(100, ndex_id='other'),
+                         self.get_batch_taskdict(100, solver=nbgwas_rest.
+                                                 POWER_SOLVER)]:
+            self.assertNotEqual(key, runner.
+                                _get_batch_key(FileBasedTask(None,
+                                                             taskdict)))
+
+    def test_nbgwastaskrunner_get_next_tasks(self):
+        tasks = [FileBasedTask('t1', self.get_batch_taskdict(100)),
+                 FileBasedTask('t2', self.get_batch_taskdict(100,
+                                                             alpha=0.3)),
+                 FileBasedTask('t3', self.get_batch_taskdict(1000)),
+                 FileBasedTask('t4', self.get_batch_taskdict(10))]
+        tfac = MagicMock()
+        tfac.get_next_tasks = MagicMock(return_value=tasks[:3])
+        runner = NagaTaskRunner(taskfactory=tfac, batch_size=3)
+        res = runner._get_next_tasks()
+        self.assertEqual([t.get_taskdir() for t in res], ['t1', 't3'])
+        tfac.get_next_tasks.assert_called_with(max_tasks=3)
+
+        tfac.get_next_tasks = MagicMock(return_value=[])
+        self.assertEqual(runner._get_next_tasks(), [])
+
+        tfac.get_next_task = MagicMock(return_value=None)
+        runner = NagaTaskRunner(taskfactory=tfac)
+        self.assertEqual(runner._get_next_tasks(), [])
+        tfac.get_next_task = MagicMock(return_value=tasks[0])
+        self.assertEqual(runner._get_next_tasks(), [tasks[0]])
+
+    def test_nbgwastaskrunner_process_tasks(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for solver in [None, nbgwas_rest.POWER_SOLVER]:
+                expected = []
+                runner = NagaTaskRunner(networkfactory=self.
+                                        get_mini_network_factory())
+                for window in [100, 10000]:
+                    taskdict = self.get_batch_taskdict(window,
+                                                       solver=solver)
+                    task = self.create_mini_task(temp_dir, 'single' +
+                                                 str(solver) + str(window),
+                                                 taskdict=taskdict)
+                    runner._process_task(task)
+                    expected.append(self.get_task_result(task))
+                self.assertNotEqual(expected[0], expected[1])
+
+                tasks = []
+                for window in [100, 10000, 100]:
+                    taskdict = self.get_batch_taskdict(window,
+                                                       solver=solver)
+                    tasks.append(self.
+                                 create_mini_task(temp_dir,
+                                                  'batch' + str(solver) +
+                                                  str(window) +
+                                                  str(len(tasks)),
+                                                  taskdict=taskdict))
+                # make last task fail
+                os.unlink(os.path.join(tasks[2].get_taskdir(),
+                                       nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM))
+                netfac = self.get_mini_network_factory()
+                runner = NagaTaskRunner(networkfactory=netfac)
+                runner._process_tasks(tasks)
+                self.assertEqual(netfac.get_networkx_object.call_count, 1)
+                for index in [0, 1]:
+                    self.assertEqual(tasks[index].get_state(),
+                                     nbgwas_rest.DONE_STATUS)
+                    res = self.get_task_result(tasks[index])
+                    self.assertEqual(res[nbgwas_rest.RESULTKEY_KEY],
+                                     expected[index][nbgwas_rest.
+                                                     RESULTKEY_KEY])
+                    self.assertEqual(sorted(res[nbgwas_rest.
+                                                RESULTVALUE_KEY].keys()),
+                                     sorted(expected[index][nbgwas_rest.
+                                                            RESULTVALUE_KEY].
+                                            keys()))
+                    for gene, vals in res[nbgwas_rest.
+                                          RESULTVALUE_KEY].items():
+                        self.assertTrue(np.allclose(vals,
+                                                    expected[index]
+                                                    [nbgwas_rest.
+                                                     RESULTVALUE_KEY][gene],
+                                                    atol=1e-6))
+                    if solver is None:
+                        self.assertTrue(nbgwas_rest.DIFFUSION_STATS_KEY
+                                        not in res)
+                    else:
+                        stats = res[nbgwas_rest.DIFFUSION_STATS_KEY]
+                        self.assertEqual(sorted(stats[SparseDiffusionSolver.
+                                                      COLUMNS_KEY].keys()),
+                                         [nbgwas_rest.DIFF_BIN_RESULT,
+                                          nbgwas_rest.FINALHEAT_RESULT])
+                self.assertEqual(tasks[2].get_state(),
+                                 nbgwas_rest.DONE_STATUS)
+                self.assertTrue(nbgwas_rest.ERROR_PARAM in
+                                tasks[2].get_taskdict())
+                self.assertFalse(os.path.isfile(os.path.join(tasks[2].
+                                                             get_taskdir(),
+                                                             nbgwas_rest.
+                                                             RESULT)))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_tasks_no_network(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            tasks = [self.create_mini_task(temp_dir, 'task1'),
+                     self.create_mini_task(temp_dir, 'task2')]
+            netfac = MagicMock()
+            netfac.get_networkx_object = MagicMock(return_value=None)
+            runner = NagaTaskRunner(networkfactory=netfac)
+            runner._process_tasks(tasks)
+            for task in tasks:
+                self.assertEqual(task.get_state(), nbgwas_rest.DONE_STATUS)
+                self.assertEqual(task.get_taskdict()[nbgwas_rest.
+                                                     ERROR_PARAM],
+                                 'Unable to get networkx object for task')
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_diffuse_networks_different_nodes(self):
+        net1 = CompiledNetwork.from_edges(['a', 'b', 'c'], [0, 1], [1, 2])
+        net2 = CompiledNetwork.from_edges(['a', 'b', 'd'], [0, 1], [1, 2])
+        for net in [net1, net2]:
+            net.node_table['heat'] = [1.0, 0.0, 0.0]
+        runner = NagaTaskRunner()
+        try:
+            runner._diffuse_networks([net1, net2], 0.5,
+                                     ['heat'], ['diffused'])
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), 'Networks to diffuse together must '
+                                     'have the same nodes')
+
+    def test_nbgwastaskrunner_run_tasks_with_batch(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for taskname in ['task1', 'task2', 'task3']:
+                task = self.create_mini_task(temp_dir, taskname)
+                task.save_task()
+            netfac = self.get_mini_network_factory()
+            tfac = FileBasedSubmittedTaskFactory(temp_dir, None, None)
+            runner = NagaTaskRunner(wait_time=0, taskfactory=tfac,
+                                    networkfactory=netfac, batch_size=2)
+            loop = MagicMock()
+            loop.side_effect = [True, True, True, False]
+            runner.run_tasks(keep_looping=loop)
+            self.assertEqual(netfac.get_networkx_object.call_count, 2)
+            donedir = os.path.join(temp_dir, nbgwas_rest.DONE_STATUS,
+                                   '1.2.3.4')
+            self.assertEqual(sorted(os.listdir(donedir)),
+                             ['task1', 'task2', 'task3'])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_process_task_with_operator_cache(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory())
+            nxtask = self.create_mini_task(temp_dir, 'nxtask')
+            runner._process_task(nxtask)
+            expected = self.get_task_result(nxtask)
+
+            opcache = PropagationOperatorCache()
+            runner = NagaTaskRunner(networkfactory=self.
+                                    get_mini_network_factory(),
+                                    operatorcache=opcache)
+            for taskname in ['task1', 'task2']:
+                task = self.create_mini_task(temp_dir, taskname)
+                runner._process_task(task)
+                res = self.get_task_result(task)
+                self.assertEqual(sorted(res[nbgwas_rest.RESULTVALUE_KEY]),
+                                 sorted(expected[nbgwas_rest.
+                                                 RESULTVALUE_KEY]))
+                for gene, vals in res[nbgwas_rest.RESULTVALUE_KEY].items():
+                    self.assertTrue(np.allclose(vals,
+                                                expected[nbgwas_rest.
+                                                         RESULTVALUE_KEY]
+                                                [gene], atol=1e-6))
+            self.assertEqual(opcache._operators.get_number_of_entries(), 1)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_nbgwastaskrunner_get_dataframe_of_column(self):
+        runner = NagaTaskRunner(wait_time=0)
+        node_table = pd.DataFrame({'name': ['A', 'B', 'C', 5, 'B'],
+                                   'Heat': np.array([0.5, 0.1, 0.9, 0.2,
+                                                     0.3],
+                                                    dtype=np.float32),
+                                   'Final Heat': [0.25, 0.75, 0.5,
+                                                  0.125, 0.0],
+                                   'other': [1, 2, 3, 4, 5]})
+        res = runner._get_dataframe_of_column(node_table,
+                                              ['name', 'Heat',
+                                               'Final Heat'],
+                                              ['x', 'y'], 'Final Heat')
+
+        # expected result built row by row
+        expected = {}
+        dframe = node_table[['name', 'Heat',
+                             'Final Heat']].sort_values(by='Final Heat',
+                                                        ascending=False)
+        for val in dframe.values:
+            expected[str(val[0])] = val[1:].tolist()
+
+        self.assertEqual(res[nbgwas_rest.RESULTKEY_KEY], ['x', 'y'])
+        self.assertEqual(json.dumps(res[nbgwas_rest.RESULTVALUE_KEY]),
+                         json.dumps(expected))
+        self.assertEqual(list(res[nbgwas_rest.RESULTVALUE_KEY].keys()),
+                         ['B', 'C', 'A', '5'])
+
+        # last duplicate name in sorted order wins
+        self.assertEqual(res[nbgwas_rest.RESULTVALUE_KEY]['B'],
+                         [float(np.float32(0.3)), 0.0])
+
+        for vals in res[nbgwas_rest.RESULTVALUE_KEY].values():
+            for val in vals:
+                self.assertTrue(type(val) is float)
+
     def test_nbgwastaskrunner_run_tasks_no_work(self):
         mocktaskfac = MagicMock()
         mocktaskfac.get_next_task = MagicMock(side_effect=[None, None])
@@ -899,6 +2837,54 @@ rs1806509       1       843817  A       C       0.9152  0.0831  0.286321
                      'pcdir', '--nodaemon', temp_dir],
                     keep_looping=loop)
 
+            # test with network cache
+            loop = MagicMock()
+            loop.side_effect = [True, True, False]
+            nt.main(['foo.py', '--wait_time', '0',
+                     '--protein_coding_dir',
+                     'pcdir', '--nodaemon',
+                     '--networkcachedir', temp_dir,
+                     '--networkcachesize', '5', temp_dir],
+                    keep_looping=loop)
+
+            # test with network memory cache
+            loop = MagicMock()
+            loop.side_effect = [True, True, False]
+            nt.main(['foo.py', '--wait_time', '0',
+                     '--protein_coding_dir',
+                     'pcdir', '--nodaemon',
+                     '--networkmemorycachesize', '100', temp_dir],
+                    keep_looping=loop)
+
+            # test with compiled network directory
+            loop = MagicMock()
+            loop.side_effect = [True, True, False]
+            nt.main(['foo.py', '--wait_time', '0',
+                     '--protein_coding_dir',
+                     'pcdir', '--nodaemon',
+                     '--compilednetworkdir', temp_dir, temp_dir],
+                    keep_looping=loop)
+
+            # test with network directory
+            loop = MagicMock()
+            loop.side_effect = [True, True, False]
+            nt.main(['foo.py', '--wait_time', '0',
+                     '--protein_coding_dir',
+                     'pcdir', '--nodaemon',
+                     '--networkdir', temp_dir, '--networkdirfallback',
+                     '--streamcx', '--prefetchdepth', '2',
+                     '--operatorcachesize', '10',
+                     '--operatorcachedir', temp_dir,
+                     '--batchsize', '4',
+                     '--precision', nbgwas_rest.FLOAT32_PRECISION,
+                     '--snpchunksize', '1000',
+                     '--proteincodingcachesize', '0',
+                     '--workers', '2',
+                     '--genecachedir', os.path.join(temp_dir, 'genes'),
+                     '--genecachesize', '10',
+                     temp_dir],
+                    keep_looping=loop)
+
             # test exception catch works
             loop = MagicMock()
             loop.side_effect = Exception('some error')
@@ -11,11 +11,24 @@ import shutil
 import tempfile
 import re
 import io
+import gzip
 import uuid
+import hashlib
+import time
 
+import pandas as pd
 from werkzeug.datastructures import FileStorage
 
 import nbgwas_rest
+from nbgwas_rest import proteincoding
+from nbgwas_rest import snpio
+from nbgwas_rest.proteincoding import ProteinCodingTable
+
+# minimal snp level summary with default column labels
+SNPS = b'chromosome basepair pvalue\n1 5 0.5\n'
+
+# gzip magic bytes followed by invalid compression method
+GZIP_MAGIC_BAD_METHOD = b'\x1f\x8b\x01' + b'\x00' * 20
 
 
 class TestNbgwas_rest(unittest.TestCase):
@@ -33,6 +46,11 @@ class TestNbgwas_rest(unittest.TestCase):
     def tearDown(self):
         """Tear down test fixtures, if any."""
         shutil.rmtree(self._temp_dir)
+        nbgwas_rest.app.config[nbgwas_rest.PROTEIN_CODING_DIR_KEY] = None
+        nbgwas_rest.app.config[nbgwas_rest.PRECISION_KEY] = \
+            nbgwas_rest.FLOAT64_PRECISION
+        nbgwas_rest.app.config[nbgwas_rest.RESULT_CACHE_MAX_AGE_KEY] = 86400
+        nbgwas_rest.protein_coding_chromosomes.clear()
 
     def test_baseurl(self):
         """Test something."""
@@ -71,7 +89,7 @@ class TestNbgwas_rest(unittest.TestCase):
             pdict['remoteip'] = '1.2.3.4'
             pdict[nbgwas_rest.ALPHA_PARAM] = 0.5
             pdict['protein_coding'] = 'hg19'
-            snpfile = FileStorage(stream=io.BytesIO(b'hi there'),
+            snpfile = FileStorage(stream=io.BytesIO(SNPS),
                                   filename='yo.txt')
             pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = snpfile
             nbgwas_rest.create_task(pdict)
@@ -87,7 +105,7 @@ class TestNbgwas_rest(unittest.TestCase):
         pdict[nbgwas_rest.ALPHA_PARAM] = 0.5
         pdict['protein_coding'] = 'hg19'
         pdict[nbgwas_rest.NDEX_PARAM] = 'c3946381-745a-4f15-810c-4c880079034f'
-        snpfile = FileStorage(stream=io.BytesIO(b'hi there'),
+        snpfile = FileStorage(stream=io.BytesIO(SNPS),
                               filename='yo.txt')
         pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = snpfile
         res = nbgwas_rest.create_task(pdict)
@@ -98,6 +116,28 @@ class TestNbgwas_rest(unittest.TestCase):
                                 nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM)
         self.assertTrue(os.path.isfile(snp_path))
 
+    def test_create_task_whitespace_snp_level_summary(self):
+        pdict = {'remoteip': '1.2.3.4',
+                 nbgwas_rest.NDEX_PARAM:
+                     'c3946381-745a-4f15-810c-4c880079034f'}
+        data = (b'snpid chromosome basepair pvalue\n'
+                b'rs1  1  742584  0.761033\n'
+                b'  rs2\t1\t744045\t1e-300\n'
+                b'rs3 X 10 0.5\n')
+        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = \
+            FileStorage(stream=io.BytesIO(data), filename='yo.txt')
+        res = nbgwas_rest.create_task(pdict)
+        self.assertTrue(res is not None)
+
+        taskpath = os.path.join(nbgwas_rest.get_submit_dir(),
+                                pdict['remoteip'], res)
+        bundlefile = os.path.join(taskpath,
+                                  nbgwas_rest.SNP_LEVEL_SUMMARY_BUNDLE)
+        arrays, meta = snpio.read_snp_level_summary_bundle(bundlefile)
+        self.assertEqual(meta[snpio.CHROMOSOMES_KEY], ['1', 'X'])
+        self.assertEqual(arrays[snpio.PVALUE_ARRAY].tolist(),
+                         [0.761033, 1e-300, 0.5])
+
     def test_get_task_basedir_none(self):
         self.assertEqual(nbgwas_rest.get_task('foo'), None)
 
@@ -169,7 +209,7 @@ class TestNbgwas_rest(unittest.TestCase):
     def test_post_ndex_id_too_long(self):
         pdict = {}
         pdict[nbgwas_rest.ALPHA_PARAM] = 0.4
-        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = (io.BytesIO(b'hi there'),
+        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = (io.BytesIO(SNPS),
                                                       'yo.txt')
         pdict['protein_coding'] = 'hg19'
         pdict[nbgwas_rest.NDEX_PARAM] = ('asdflkasdfkljasdfalskdfja;klsd' +
@@ -189,8 +229,8 @@ class TestNbgwas_rest(unittest.TestCase):
         pdict[nbgwas_rest.ALPHA_PARAM] = 0.5
         pdict[nbgwas_rest.NDEX_PARAM] = 'someid'
         pdict['protein_coding'] = 'hg19'
-        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = (io.BytesIO(b'hi there'),
-                                                      'yo.txt')
+        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = \
+            (io.BytesIO(b'x hi how are\nz 1 5 0.5\n'), 'yo.txt')
         pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_COL_LABEL_PARAM] = 'hi,how,are'
         rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=pdict,
                             follow_redirects=True)
@@ -214,6 +254,487 @@ class TestNbgwas_rest(unittest.TestCase):
         self.assertEqual(jdata[nbgwas_rest.NDEX_PARAM], 'someid')
         self.assertEqual(jdata[nbgwas_rest.SNP_LEVEL_SUMMARY_COL_LABEL_PARAM],
                          'hi,how,are')
+        self.assertEqual(jdata[nbgwas_rest.SOLVER_PARAM],
+                         nbgwas_rest.RANDOM_WALK_SOLVER)
+        self.assertEqual(jdata[nbgwas_rest.TOLERANCE_PARAM], None)
+        self.assertEqual(jdata[nbgwas_rest.MAX_ITERATIONS_PARAM], None)
+        self.assertEqual(jdata[nbgwas_rest.RANK_PARAM], None)
+        self.assertEqual(jdata[nbgwas_rest.PRECISION_PARAM], None)
+        self.assertEqual(jdata[nbgwas_rest.
+                               SNP_LEVEL_SUMMARY_COMPRESSION_PARAM], None)
+
+        bundlefile = os.path.join(tpath,
+                                  nbgwas_rest.SNP_LEVEL_SUMMARY_BUNDLE)
+        arrays, meta = snpio.read_snp_level_summary_bundle(bundlefile)
+        self.assertEqual(meta[snpio.COLUMNS_KEY], ['hi', 'how', 'are'])
+        self.assertEqual(arrays[snpio.PVALUE_ARRAY].tolist(), [0.5])
+
+    def test_post_gzip_snp_level_summary(self):
+        data = gzip.compress(b'chromosome basepair pvalue\n'
+                             b'2 3 0.5\n1 5 0.25\n')
+        pdict = {}
+        pdict[nbgwas_rest.NDEX_PARAM] = 'someid'
+        pdict['protein_coding'] = 'hg19'
+        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = (io.BytesIO(data),
+                                                      'yo.txt.gz')
+        rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=pdict,
+                            follow_redirects=True)
+        self.assertEqual(rv.status_code, 202)
+        uuidstr = re.sub('^.*/', '', rv.headers['Location'])
+        tpath = nbgwas_rest.get_task(uuidstr,
+                                     basedir=nbgwas_rest.get_submit_dir())
+        with open(os.path.join(tpath, nbgwas_rest.TASK_JSON), 'r') as f:
+            jdata = json.load(f)
+        self.assertEqual(jdata[nbgwas_rest.
+                               SNP_LEVEL_SUMMARY_COMPRESSION_PARAM],
+                         nbgwas_rest.GZIP_COMPRESSION)
+
+        # file is stored compressed
+        with open(os.path.join(tpath,
+                               nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM),
+                  'rb') as f:
+            self.assertEqual(f.read(), data)
+
+        # and parsed into bundle with default column labels
+        bundlefile = os.path.join(tpath,
+                                  nbgwas_rest.SNP_LEVEL_SUMMARY_BUNDLE)
+        arrays, meta = snpio.read_snp_level_summary_bundle(bundlefile)
+        self.assertEqual(meta[snpio.COLUMNS_KEY], ['chromosome', 'basepair',
+                                                   'pvalue'])
+        self.assertEqual(meta[snpio.CHROMOSOMES_KEY], ['1', '2'])
+        self.assertEqual(arrays[snpio.BASEPAIR_ARRAY].tolist(), [5, 3])
+
+    def test_get_snp_level_summary_column_labels(self):
+        self.assertEqual(nbgwas_rest.get_snp_level_summary_column_labels(None),
+                         ['chromosome', 'basepair', 'pvalue'])
+        self.assertEqual(nbgwas_rest.get_snp_level_summary_column_labels('a'),
+                         ['a', 'basepair', 'pvalue'])
+        self.assertEqual(nbgwas_rest.
+                         get_snp_level_summary_column_labels('a,b,c,d'),
+                         ['a', 'b', 'c'])
+
+    def test_get_protein_coding_chromosomes(self):
+        self.assertEqual(nbgwas_rest.get_protein_coding_chromosomes('hg19'),
+                         None)
+        nbgwas_rest.app.config[nbgwas_rest.PROTEIN_CODING_DIR_KEY] = \
+            self._temp_dir
+        self.assertEqual(nbgwas_rest.get_protein_coding_chromosomes(None),
+                         None)
+        self.assertEqual(nbgwas_rest.get_protein_coding_chromosomes('hg19'),
+                         None)
+        pc_file = os.path.join(self._temp_dir, 'hg19.txt')
+        with open(pc_file, 'w') as f:
+            f.write('A 1 10 20\nB X 5 30\nC 1 40 50\n')
+        self.assertEqual(nbgwas_rest.get_protein_coding_chromosomes('hg19'),
+                         {'1', 'X'})
+
+        # replaced file is read again, even if size is unchanged
+        with open(pc_file, 'w') as f:
+            f.write('A 1 10 20\nB 7 5 30\nC 1 40 50\n')
+        os.utime(pc_file, ns=(0, 0))
+        self.assertEqual(nbgwas_rest.get_protein_coding_chromosomes('hg19'),
+                         {'1', '7'})
+        with open(pc_file, 'w') as f:
+            f.write('A 1 10 20\nB Y 5 30\n')
+        self.assertEqual(nbgwas_rest.get_protein_coding_chromosomes('hg19'),
+                         {'1', 'Y'})
+
+        # compiled file is used if it exists
+        table = ProteinCodingTable.from_dataframe(
+            pd.DataFrame({'Chrom': ['2', 'Y'], 'Start': [1, 2],
+                          'End': [5, 6]}, index=['A', 'B']))
+        compiled_file = os.path.join(self._temp_dir, 'hg19' +
+                                     proteincoding.COMPILED_SUFFIX)
+        table.save(compiled_file)
+        self.assertEqual(nbgwas_rest.get_protein_coding_chromosomes('hg19'),
+                         {'2', 'Y'})
+
+        # as is a recompiled file
+        table = ProteinCodingTable.from_dataframe(
+            pd.DataFrame({'Chrom': ['3', 'Y'], 'Start': [1, 2],
+                          'End': [5, 6]}, index=['A', 'B']))
+        table.save(compiled_file)
+        os.utime(compiled_file, ns=(0, 0))
+        self.assertEqual(nbgwas_rest.get_protein_coding_chromosomes('hg19'),
+                         {'3', 'Y'})
+
+    def test_save_snp_level_summary(self):
+        data = gzip.compress(b'x,y,z\n2,9,0.5\n') + \
+            gzip.compress(b'1,3,0.25\n') + gzip.compress(b'')
+        params = {nbgwas_rest.SNP_LEVEL_SUMMARY_COL_LABEL_PARAM: 'x,y,z',
+                  nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM:
+                      FileStorage(stream=io.BytesIO(data), filename='yo.gz')}
+        self.assertEqual(nbgwas_rest.save_snp_level_summary(self._temp_dir,
+                                                            params),
+                         (nbgwas_rest.GZIP_COMPRESSION,
+                          hashlib.sha256(data).hexdigest()))
+
+        # upload is saved byte for byte
+        with open(os.path.join(self._temp_dir,
+                               nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM),
+                  'rb') as f:
+            self.assertEqual(f.read(), data)
+        bundlefile = os.path.join(self._temp_dir,
+                                  nbgwas_rest.SNP_LEVEL_SUMMARY_BUNDLE)
+        arrays, meta = snpio.read_snp_level_summary_bundle(bundlefile)
+        self.assertEqual(meta[snpio.COLUMNS_KEY], ['x', 'y', 'z'])
+        self.assertEqual(meta[snpio.CHROMOSOMES_KEY], ['1', '2'])
+        self.assertEqual(arrays[snpio.PVALUE_ARRAY].tolist(), [0.25, 0.5])
+
+        # larger than block size
+        data = b'chromosome basepair pvalue\n' + b'1 5 0.5\n' * 200000
+        params = {nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM:
+                  FileStorage(stream=io.BytesIO(data), filename='yo')}
+        self.assertEqual(nbgwas_rest.save_snp_level_summary(self._temp_dir,
+                                                            params),
+                         (None, hashlib.sha256(data).hexdigest()))
+        with open(os.path.join(self._temp_dir,
+                               nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM),
+                  'rb') as f:
+            self.assertEqual(f.read(), data)
+        arrays, meta = snpio.read_snp_level_summary_bundle(bundlefile)
+        self.assertEqual(len(arrays[snpio.PVALUE_ARRAY]), 200000)
+
+    def test_post_invalid_snp_level_summary(self):
+        nbgwas_rest.app.config[nbgwas_rest.PROTEIN_CODING_DIR_KEY] = \
+            self._temp_dir
+        with open(os.path.join(self._temp_dir, 'hg19.txt'), 'w') as f:
+            f.write('A 1 10 20\nB X 5 30\n')
+
+        header = b'chromosome basepair pvalue\n'
+        for data, msg in [(b'hi there',
+                           'Column(s) chromosome, basepair, pvalue not '
+                           'found in SNP level summary header: hi, there'),
+                          (header + b'1 5 abc\n', None),
+                          (header + b'1 5 0.5\n' + b'1 x 0.5\n',
+                           'Column basepair of SNP level summary cannot '
+                           'be coerced into int'),
+                          (header + b'1 5 0.5\n5 3 0.1\nY 1 0.1\n',
+                           'Chromosome(s) 5, Y not found in protein '
+                           'coding table'),
+                          (header, 'No SNPs found'),
+                          (gzip.compress(header + b'1 5 0.5\n')[:-10],
+                           None),
+                          (GZIP_MAGIC_BAD_METHOD, 'Unknown compression '
+                                                  'method')]:
+            pdict = {}
+            pdict[nbgwas_rest.NDEX_PARAM] = 'someid'
+            pdict['protein_coding'] = 'hg19'
+            pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = (io.BytesIO(data),
+                                                          'yo.txt')
+            rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=pdict,
+                                follow_redirects=True)
+            self.assertEqual(rv.status_code, 400)
+            prefix = 'Invalid ' + nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM + ': '
+            self.assertTrue(rv.json['message'].startswith(prefix))
+            if msg is not None:
+                self.assertEqual(rv.json['message'], prefix + msg)
+
+        # rejected tasks are removed
+        ipdir = os.path.join(nbgwas_rest.get_submit_dir(), '127.0.0.1')
+        self.assertEqual(os.listdir(ipdir), [])
+
+        # same file with known chromosomes is accepted
+        pdict = {}
+        pdict[nbgwas_rest.NDEX_PARAM] = 'someid'
+        pdict['protein_coding'] = 'hg19'
+        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = \
+            (io.BytesIO(header + b'1 5 0.5\nX 3 0.1\n'), 'yo.txt')
+        rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=pdict,
+                            follow_redirects=True)
+        self.assertEqual(rv.status_code, 202)
+
+    def test_post_snp_level_summary_with_missing_values(self):
+        nbgwas_rest.app.config[nbgwas_rest.PROTEIN_CODING_DIR_KEY] = \
+            self._temp_dir
+        with open(os.path.join(self._temp_dir, 'hg19.txt'), 'w') as f:
+            f.write('A 1 10 20\nB 2 5 30\n')
+
+        header = b'chromosome,basepair,pvalue\n'
+        for data, col, msg in [(b'1,100,0.01\n,200,0.5\n2,300,0.1\n',
+                                'chromosome', 'has missing values'),
+                               (b'1,100,0.01\n2,,0.5\n', 'basepair',
+                                'cannot be coerced into int'),
+                               (b'1,100,0.01\n2,200,\n', 'pvalue',
+                                'has missing values')]:
+            pdict = {}
+            pdict[nbgwas_rest.NDEX_PARAM] = 'someid'
+            pdict['protein_coding'] = 'hg19'
+            pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = \
+                (io.BytesIO(header + data), 'yo.txt')
+            rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=pdict,
+                                follow_redirects=True)
+            self.assertEqual(rv.status_code, 400)
+            self.assertEqual(rv.json['message'],
+                             'Invalid ' +
+                             nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM + ': ' +
+                             'Column ' + col + ' of SNP level summary ' +
+                             msg)
+
+        ipdir = os.path.join(nbgwas_rest.get_submit_dir(), '127.0.0.1')
+        self.assertEqual(os.listdir(ipdir), [])
+
+    def test_get_result_cache_key(self):
+        params = {nbgwas_rest.SNP_LEVEL_SUMMARY_SHA256_PARAM: 'abc',
+                  nbgwas_rest.NDEX_PARAM: 'someid',
+                  nbgwas_rest.PROTEIN_CODING_PARAM: 'hg19',
+                  nbgwas_rest.WINDOW_PARAM: 10000,
+                  nbgwas_rest.ALPHA_PARAM: None,
+                  nbgwas_rest.SNP_LEVEL_SUMMARY_COL_LABEL_PARAM: None,
+                  nbgwas_rest.UUID_PARAM: '1',
+                  nbgwas_rest.REMOTEIP_PARAM: '1.2.3.4'}
+        key = nbgwas_rest.get_result_cache_key(params)
+        self.assertEqual(len(key), 64)
+
+        # uuid, remote ip, and unset defaults do not change key
+        same = params.copy()
+        same[nbgwas_rest.UUID_PARAM] = '2'
+        same[nbgwas_rest.REMOTEIP_PARAM] = '5.6.7.8'
+        same[nbgwas_rest.WINDOW_PARAM] = '10000'
+        same[nbgwas_rest.SNP_LEVEL_SUMMARY_COL_LABEL_PARAM] = \
+            nbgwas_rest.SNP_LEVEL_SUMMARY_COL_LABELS
+        self.assertEqual(nbgwas_rest.get_result_cache_key(same), key)
+
+        for param, val in [(nbgwas_rest.SNP_LEVEL_SUMMARY_SHA256_PARAM,
+                            'abd'),
+                           (nbgwas_rest.NDEX_PARAM, 'otherid'),
+                           (nbgwas_rest.PROTEIN_CODING_PARAM, 'hg18'),
+                           (nbgwas_rest.WINDOW_PARAM, 100),
+                           (nbgwas_rest.ALPHA_PARAM, 0.5),
+                           (nbgwas_rest.SNP_LEVEL_SUMMARY_COL_LABEL_PARAM,
+                            'a,b,c'),
+                           (nbgwas_rest.SOLVER_PARAM,
+                            nbgwas_rest.POWER_SOLVER),
+                           (nbgwas_rest.PRECISION_PARAM,
+                            nbgwas_rest.FLOAT32_PRECISION)]:
+            other = params.copy()
+            other[param] = val
+            self.assertNotEqual(nbgwas_rest.get_result_cache_key(other), key)
+
+        # unset precision is precision task runner uses by default
+        same = params.copy()
+        same[nbgwas_rest.PRECISION_PARAM] = nbgwas_rest.FLOAT64_PRECISION
+        self.assertEqual(nbgwas_rest.get_result_cache_key(same), key)
+        nbgwas_rest.app.config[nbgwas_rest.PRECISION_KEY] = \
+            nbgwas_rest.FLOAT32_PRECISION
+        self.assertNotEqual(nbgwas_rest.get_result_cache_key(params), key)
+
+    def test_post_reuses_cached_result(self):
+        pdict = {}
+        pdict[nbgwas_rest.NDEX_PARAM] = 'someid'
+        pdict['protein_coding'] = 'hg19'
+        pdict[nbgwas_rest.ALPHA_PARAM] = 0.5
+        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = (io.BytesIO(SNPS),
+                                                      'yo.txt')
+        rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=dict(pdict),
+                            follow_redirects=True)
+        self.assertEqual(rv.status_code, 202)
+        firstid = re.sub('^.*/', '', rv.headers['Location'])
+        firstpath = nbgwas_rest.get_task(firstid,
+                                         basedir=nbgwas_rest.get_submit_dir())
+        with open(os.path.join(firstpath, nbgwas_rest.TASK_JSON), 'r') as f:
+            jdata = json.load(f)
+        self.assertEqual(jdata[nbgwas_rest.SNP_LEVEL_SUMMARY_SHA256_PARAM],
+                         hashlib.sha256(SNPS).hexdigest())
+        cachekey = jdata[nbgwas_rest.RESULT_CACHE_KEY_PARAM]
+        self.assertEqual(nbgwas_rest.get_cached_result_task(cachekey), None)
+
+        # first task still queued so resubmission is queued too
+        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = (io.BytesIO(SNPS),
+                                                      'yo.txt')
+        rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=dict(pdict),
+                            follow_redirects=True)
+        self.assertEqual(rv.status_code, 202)
+        secondid = re.sub('^.*/', '', rv.headers['Location'])
+        self.assertTrue(nbgwas_rest.get_task(secondid,
+                                             basedir=nbgwas_rest.
+                                             get_submit_dir()) is not None)
+
+        # complete second task as task runner would
+        secondpath = nbgwas_rest.get_task(secondid,
+                                          basedir=nbgwas_rest.
+                                          get_submit_dir())
+        donepath = os.path.join(nbgwas_rest.get_done_dir(), '127.0.0.1',
+                                secondid)
+        os.makedirs(os.path.dirname(donepath))
+        shutil.move(secondpath, donepath)
+        with open(os.path.join(donepath, nbgwas_rest.RESULT), 'w') as f:
+            json.dump({'hi': 'there'}, f)
+        with open(os.path.join(donepath, nbgwas_rest.TASK_JSON), 'r') as f:
+            jdata = json.load(f)
+        jdata[nbgwas_rest.NAGA_VERSION] = '0.4.1'
+        jdata[nbgwas_rest.PRECISION_PARAM] = nbgwas_rest.FLOAT64_PRECISION
+        with open(os.path.join(donepath, nbgwas_rest.TASK_JSON), 'w') as f:
+            json.dump(jdata, f)
+        self.assertEqual(nbgwas_rest.get_cached_result_task(cachekey)[0],
+                         donepath)
+
+        # resubmission goes straight to done with same result
+        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = (io.BytesIO(SNPS),
+                                                      'yo.txt')
+        rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=dict(pdict),
+                            follow_redirects=True)
+        self.assertEqual(rv.status_code, 202)
+        thirdid = re.sub('^.*/', '', rv.headers['Location'])
+        self.assertEqual(nbgwas_rest.get_task(thirdid,
+                                              basedir=nbgwas_rest.
+                                              get_submit_dir()), None)
+        rv = self._app.get(nbgwas_rest.SNP_ANALYZER_NS + '/' + thirdid)
+        self.assertEqual(rv.status_code, 200)
+        res = rv.json
+        self.assertEqual(res[nbgwas_rest.STATUS_RESULT_KEY],
+                         nbgwas_rest.DONE_STATUS)
+        self.assertEqual(res[nbgwas_rest.RESULT_KEY], {'hi': 'there'})
+        params = res[nbgwas_rest.PARAMETERS_KEY]
+        self.assertEqual(params[nbgwas_rest.RESULT_SOURCE_PARAM], secondid)
+        self.assertEqual(params[nbgwas_rest.NAGA_VERSION], '0.4.1')
+        self.assertEqual(params[nbgwas_rest.PRECISION_PARAM],
+                         nbgwas_rest.FLOAT64_PRECISION)
+        thirdpath = os.path.join(nbgwas_rest.get_done_dir(), '127.0.0.1',
+                                 thirdid)
+        self.assertEqual(sorted(os.listdir(thirdpath)),
+                         [nbgwas_rest.RESULT, nbgwas_rest.TASK_JSON])
+
+        # different parameters are not reused
+        pdict[nbgwas_rest.ALPHA_PARAM] = 0.4
+        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = (io.BytesIO(SNPS),
+                                                      'yo.txt')
+        rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=dict(pdict),
+                            follow_redirects=True)
+        fourthid = re.sub('^.*/', '', rv.headers['Location'])
+        self.assertTrue(nbgwas_rest.get_task(fourthid,
+                                             basedir=nbgwas_rest.
+                                             get_submit_dir()) is not None)
+
+        # nor are results of tasks that failed
+        jdata[nbgwas_rest.ERROR_PARAM] = 'some error'
+        with open(os.path.join(donepath, nbgwas_rest.TASK_JSON), 'w') as f:
+            json.dump(jdata, f)
+        self.assertEqual(nbgwas_rest.get_cached_result_task(cachekey), None)
+
+    def test_get_cached_result_task_stale_result(self):
+        pdict = {nbgwas_rest.NDEX_PARAM: 'someid',
+                 'protein_coding': 'hg19',
+                 nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM: (io.BytesIO(SNPS),
+                                                       'yo.txt')}
+        rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=dict(pdict),
+                            follow_redirects=True)
+        self.assertEqual(rv.status_code, 202)
+        firstid = re.sub('^.*/', '', rv.headers['Location'])
+
+        # complete task as task runner would
+        firstpath = nbgwas_rest.get_task(firstid,
+                                         basedir=nbgwas_rest.get_submit_dir())
+        donepath = os.path.join(nbgwas_rest.get_done_dir(), '127.0.0.1',
+                                firstid)
+        os.makedirs(os.path.dirname(donepath))
+        shutil.move(firstpath, donepath)
+        resultfile = os.path.join(donepath, nbgwas_rest.RESULT)
+        with open(resultfile, 'w') as f:
+            json.dump({'hi': 'there'}, f)
+        with open(os.path.join(donepath, nbgwas_rest.TASK_JSON), 'r') as f:
+            jdata = json.load(f)
+        jdata[nbgwas_rest.PRECISION_PARAM] = nbgwas_rest.FLOAT64_PRECISION
+        with open(os.path.join(donepath, nbgwas_rest.TASK_JSON), 'w') as f:
+            json.dump(jdata, f)
+        cachekey = jdata[nbgwas_rest.RESULT_CACHE_KEY_PARAM]
+
+        self.assertEqual(nbgwas_rest.
+                         get_cached_result_task(cachekey,
+                                                precision=nbgwas_rest.
+                                                FLOAT64_PRECISION)[0],
+                         donepath)
+
+        # task runner recorded another precision
+        self.assertEqual(nbgwas_rest.
+                         get_cached_result_task(cachekey,
+                                                precision=nbgwas_rest.
+                                                FLOAT32_PRECISION), None)
+
+        # result computed before network was updated on NDEx under
+        # the same uuid is reused only without max age
+        old = time.time() - 7200
+        os.utime(resultfile, (old, old))
+        nbgwas_rest.app.config[nbgwas_rest.RESULT_CACHE_MAX_AGE_KEY] = None
+        self.assertEqual(nbgwas_rest.get_cached_result_task(cachekey)[0],
+                         donepath)
+        nbgwas_rest.app.config[nbgwas_rest.RESULT_CACHE_MAX_AGE_KEY] = 3600
+        self.assertEqual(nbgwas_rest.get_cached_result_task(cachekey), None)
+        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = (io.BytesIO(SNPS),
+                                                      'yo.txt')
+        rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=dict(pdict),
+                            follow_redirects=True)
+        self.assertEqual(rv.status_code, 202)
+        secondid = re.sub('^.*/', '', rv.headers['Location'])
+        self.assertTrue(nbgwas_rest.get_task(secondid,
+                                             basedir=nbgwas_rest.
+                                             get_submit_dir()) is not None)
+
+    def test_post_with_solver(self):
+        pdict = {}
+        pdict[nbgwas_rest.NDEX_PARAM] = 'someid'
+        pdict['protein_coding'] = 'hg19'
+        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = (io.BytesIO(SNPS),
+                                                      'yo.txt')
+        pdict[nbgwas_rest.SOLVER_PARAM] = nbgwas_rest.KRYLOV_SOLVER
+        pdict[nbgwas_rest.TOLERANCE_PARAM] = 0.001
+        pdict[nbgwas_rest.MAX_ITERATIONS_PARAM] = 20
+        rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=pdict,
+                            follow_redirects=True)
+        self.assertEqual(rv.status_code, 202)
+        uuidstr = re.sub('^.*/', '', rv.headers['Location'])
+        tpath = nbgwas_rest.get_task(uuidstr,
+                                     basedir=nbgwas_rest.get_submit_dir())
+        with open(os.path.join(tpath, nbgwas_rest.TASK_JSON), 'r') as f:
+            jdata = json.load(f)
+        self.assertEqual(jdata[nbgwas_rest.SOLVER_PARAM],
+                         nbgwas_rest.KRYLOV_SOLVER)
+        self.assertEqual(jdata[nbgwas_rest.TOLERANCE_PARAM], 0.001)
+        self.assertEqual(jdata[nbgwas_rest.MAX_ITERATIONS_PARAM], 20)
+
+    def test_post_with_lowrank_solver(self):
+        pdict = {}
+        pdict[nbgwas_rest.NDEX_PARAM] = 'someid'
+        pdict['protein_coding'] = 'hg19'
+        pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = (io.BytesIO(SNPS),
+                                                      'yo.txt')
+        pdict[nbgwas_rest.SOLVER_PARAM] = nbgwas_rest.LOWRANK_SOLVER
+        pdict[nbgwas_rest.RANK_PARAM] = 50
+        pdict[nbgwas_rest.PRECISION_PARAM] = nbgwas_rest.FLOAT32_PRECISION
+        rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=pdict,
+                            follow_redirects=True)
+        self.assertEqual(rv.status_code, 202)
+        uuidstr = re.sub('^.*/', '', rv.headers['Location'])
+        tpath = nbgwas_rest.get_task(uuidstr,
+                                     basedir=nbgwas_rest.get_submit_dir())
+        with open(os.path.join(tpath, nbgwas_rest.TASK_JSON), 'r') as f:
+            jdata = json.load(f)
+        self.assertEqual(jdata[nbgwas_rest.SOLVER_PARAM],
+                         nbgwas_rest.LOWRANK_SOLVER)
+        self.assertEqual(jdata[nbgwas_rest.RANK_PARAM], 50)
+        self.assertEqual(jdata[nbgwas_rest.PRECISION_PARAM],
+                         nbgwas_rest.FLOAT32_PRECISION)
+
+    def test_post_with_invalid_solver_parameters(self):
+        for key, val in [(nbgwas_rest.SOLVER_PARAM, 'foo'),
+                         (nbgwas_rest.PRECISION_PARAM, 'float16'),
+                         (nbgwas_rest.TOLERANCE_PARAM, 0),
+                         (nbgwas_rest.MAX_ITERATIONS_PARAM, -1),
+                         (nbgwas_rest.RANK_PARAM, 0)]:
+            pdict = {}
+            pdict[nbgwas_rest.NDEX_PARAM] = 'someid'
+            pdict['protein_coding'] = 'hg19'
+            pdict[nbgwas_rest.SNP_LEVEL_SUMMARY_PARAM] = \
+                (io.BytesIO(SNPS), 'yo.txt')
+            pdict[key] = val
+            rv = self._app.post(nbgwas_rest.SNP_ANALYZER_NS, data=pdict,
+                                follow_redirects=True)
+            self.assertEqual(rv.status_code, 500)
+            if key not in [nbgwas_rest.SOLVER_PARAM,
+                           nbgwas_rest.PRECISION_PARAM]:
+                self.assertEqual(rv.json['message'],
+                                 'Unable to create task ' + key +
+                                 ' must be greater than 0')
 
     def test_get_id_none(self):
         rv = self._app.get(nbgwas_rest.SNP_ANALYZER_NS)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `proteincoding` module."""
+
+import os
+import gzip
+import unittest
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from nbgwas_rest import arraybundle
+from nbgwas_rest import proteincoding
+from nbgwas_rest.proteincoding import ProteinCodingTable
+
+
+class TestProteinCoding(unittest.TestCase):
+    """Tests for `proteincoding` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self._temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self._temp_dir)
+
+    def get_protein_coding(self):
+        return ('A 2 300 400\n'
+                'B 10 5 30\n'
+                'C X 50 60\n'
+                'D 2 100 200\n'
+                'A 10 1 2\n')
+
+    def test_read(self):
+        pcfile = os.path.join(self._temp_dir, 'pc.txt')
+        with open(pcfile, 'w') as f:
+            f.write(self.get_protein_coding())
+        table = ProteinCodingTable.read(pcfile)
+        self.assertEqual(table.get_number_of_genes(), 5)
+        self.assertEqual(table.get_chromosomes(), ['10', '2', 'X'])
+
+        expected = pd.read_csv(pcfile, sep=r'\s+',
+                               names=['Chrom', 'Start', 'End'],
+                               index_col=0)
+        res = table.to_dataframe()
+        self.assertEqual(res.index.tolist(), expected.index.tolist())
+        self.assertEqual(res['Chrom'].tolist(),
+                         expected['Chrom'].astype(str).tolist())
+        self.assertEqual(res['Start'].tolist(), expected['Start'].tolist())
+        self.assertEqual(res['End'].tolist(), expected['End'].tolist())
+
+        # each call returns a new table
+        res['Start'] = 0
+        self.assertEqual(table.to_dataframe()['Start'].tolist(),
+                         [300, 5, 50, 100, 1])
+
+        gzfile = os.path.join(self._temp_dir, 'pc.txt.gz')
+        with gzip.open(gzfile, 'wt') as f:
+            f.write(self.get_protein_coding())
+        pd.testing.assert_frame_equal(ProteinCodingTable.read(gzfile).
+                                      to_dataframe(), table.to_dataframe())
+        self.assertTrue(table.get_size() > 0)
+
+    def test_get_chromosome(self):
+        pcfile = os.path.join(self._temp_dir, 'pc.txt')
+        with open(pcfile, 'w') as f:
+            f.write(self.get_protein_coding())
+        table = ProteinCodingTable.read(pcfile)
+        starts, ends, genes = table.get_chromosome('2')
+        self.assertEqual(starts.tolist(), [100, 300])
+        self.assertEqual(ends.tolist(), [200, 400])
+        self.assertEqual(genes.tolist(), ['D', 'A'])
+
+        starts, ends, genes = table.get_chromosome('10')
+        self.assertEqual(starts.tolist(), [1, 5])
+        self.assertEqual(genes.tolist(), ['A', 'B'])
+
+        starts, ends, genes = table.get_chromosome('Y')
+        self.assertEqual(len(starts), 0)
+        self.assertEqual(len(ends), 0)
+        self.assertEqual(len(genes), 0)
+
+    def test_from_dataframe_bad_values(self):
+        pc_table = pd.DataFrame({'Chrom': ['1'], 'Start': ['x'],
+                                 'End': [200]}, index=['A'])
+        try:
+            ProteinCodingTable.from_dataframe(pc_table)
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), 'Columns start and end from `pc` '
+                                     'cannot be coerced into int!')
+
+    def test_empty_table(self):
+        pc_table = pd.DataFrame({'Chrom': [], 'Start': [],
+                                 'End': []}, index=[])
+        table = ProteinCodingTable.from_dataframe(pc_table)
+        self.assertEqual(table.get_number_of_genes(), 0)
+        self.assertEqual(table.get_chromosomes(), [])
+        self.assertEqual(len(table.get_chromosome('1')[0]), 0)
+        self.assertEqual(len(table.to_dataframe()), 0)
+        self.assertEqual(table.to_dataframe()['Start'].dtype, np.int64)
+
+    def test_compile_save_and_load(self):
+        pcfile = os.path.join(self._temp_dir, 'pc.txt')
+        with open(pcfile, 'w') as f:
+            f.write(self.get_protein_coding())
+            f.write('D 2 100 200\n'
+                    'D 2 100 250\n')
+        table = ProteinCodingTable.read(pcfile)
+        self.assertEqual(table.get_number_of_genes(), 7)
+        self.assertFalse(proteincoding.is_compiled(pcfile))
+
+        compiled = table.compile()
+        self.assertEqual(compiled.get_number_of_genes(), 6)
+        res = compiled.to_dataframe()
+        self.assertEqual(res.index.tolist(), ['A', 'B', 'D', 'D', 'A', 'C'])
+        self.assertEqual(res['Chrom'].tolist(),
+                         ['10', '10', '2', '2', '2', 'X'])
+        self.assertEqual(res['Start'].tolist(), [1, 5, 100, 100, 300, 50])
+        self.assertEqual(res['End'].tolist(), [2, 30, 200, 250, 400, 60])
+
+        outfile = os.path.join(self._temp_dir,
+                               'pc' + proteincoding.COMPILED_SUFFIX)
+        compiled.save(outfile, metadata={'source': 'pc.txt'})
+        self.assertTrue(proteincoding.is_compiled(outfile))
+        for loaded in [ProteinCodingTable.load(outfile),
+                       ProteinCodingTable.load(outfile, mmap=False),
+                       ProteinCodingTable.read(outfile)]:
+            pd.testing.assert_frame_equal(loaded.to_dataframe(), res)
+            self.assertEqual(loaded.get_chromosomes(), ['10', '2', 'X'])
+            starts, ends, genes = loaded.get_chromosome('2')
+            self.assertEqual(starts.tolist(), [100, 100, 300])
+            self.assertEqual(genes.tolist(), ['D', 'D', 'A'])
+
+        arrays, metadata = arraybundle.read_array_bundle(outfile)
+        self.assertEqual(metadata['source'], 'pc.txt')
+        self.assertEqual(metadata[proteincoding.VERSION_KEY],
+                         proteincoding.FORMAT_VERSION)
+        # names are stored once
+        self.assertEqual(arraybundle.
+                         decode_string_pool(arrays[proteincoding.NAMES_DATA],
+                                            arrays[proteincoding.
+                                                   NAMES_OFFSETS]),
+                         ['A', 'B', 'D', 'C'])
+
+    def test_load_not_compiled(self):
+        bundlefile = os.path.join(self._temp_dir, 'foo.bundle')
+        arraybundle.write_array_bundle(bundlefile,
+                                       {'x': np.arange(3)},
+                                       metadata={'format': 'other'})
+        try:
+            ProteinCodingTable.load(bundlefile)
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), bundlefile + ' is not a compiled '
+                                                  'protein coding file')
+
+    def test_compile_empty_table(self):
+        pc_table = pd.DataFrame({'Chrom': [], 'Start': [],
+                                 'End': []}, index=[])
+        table = ProteinCodingTable.from_dataframe(pc_table).compile()
+        outfile = os.path.join(self._temp_dir, 'empty.nagapc')
+        table.save(outfile)
+        loaded = ProteinCodingTable.load(outfile)
+        self.assertEqual(loaded.get_number_of_genes(), 0)
+        self.assertEqual(loaded.get_chromosomes(), [])
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `snpassign` module."""
+
+import os
+import unittest
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from nbgwas.tables import Snps
+
+from nbgwas_rest import snpio
+from nbgwas_rest import snpassign
+from nbgwas_rest.proteincoding import ProteinCodingTable
+from nbgwas_rest.snpassign import GeneIntervalIndex
+from nbgwas_rest.snpassign import GeneMinimumAccumulator
+
+
+class TestSnpAssign(unittest.TestCase):
+    """Tests for `snpassign` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self._temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self._temp_dir)
+
+    def get_random_tables(self):
+        rand = np.random.RandomState(3)
+        num_genes = 300
+        start = rand.randint(0, 100000, num_genes)
+        # some genes are on more than one chromosome
+        pc_table = pd.DataFrame({'Chrom': rand.choice(['1', '2', 'X'],
+                                                      num_genes),
+                                 'Start': start,
+                                 'End': start + rand.randint(1, 5000,
+                                                             num_genes)},
+                                index=['G' + str(i % 250)
+                                       for i in range(num_genes)])
+        num_snps = 5000
+        # few distinct pvalues so there are many ties
+        snp_table = pd.DataFrame({'chr': rand.choice(['1', '2', 'X'],
+                                                     num_snps),
+                                  'bp': rand.randint(0, 110000, num_snps),
+                                  'p': rand.choice([0.1, 0.01, 0.5, 1e-8],
+                                                   num_snps)})
+        return pc_table, snp_table
+
+    def test_assign_snps_to_genes_in_chunks_matches_nbgwas(self):
+        pc_table, snp_table = self.get_random_tables()
+        snps = Snps(snp_table.copy(), pc_table.copy(), snp_chrom_col='chr',
+                    snp_bp_col='bp', pval_col='p')
+        expected = snps.assign_snps_to_genes(window_size=500,
+                                             to_Gene=True).table
+
+        snpfile = os.path.join(self._temp_dir, 'snp')
+        snp_table.to_csv(snpfile, sep=' ', index=False)
+        for chunksize in [333, 4999, 100000]:
+            genes = snpassign.\
+                assign_snps_to_genes_in_chunks(snpfile, pc_table.copy(),
+                                               'chr', 'bp', 'p',
+                                               window_size=500,
+                                               chunksize=chunksize)
+            self.assertEqual(genes.pval_col, snpassign.PVALUE_COL)
+            self.assertEqual(genes.name_col, snpassign.GENE_COL)
+            pd.testing.assert_frame_equal(genes.table, expected)
+
+    def test_assign_snps_to_genes_in_chunks_missing_chromosome(self):
+        pc_table, snp_table = self.get_random_tables()
+        snp_table.loc[[10, 4000], 'chr'] = None
+        snpfile = os.path.join(self._temp_dir, 'snp')
+        snp_table.to_csv(snpfile, index=False)
+
+        # chunked and whole file paths reject the file the same way
+        try:
+            snpassign.assign_snps_to_genes(
+                snpio.read_snp_level_summary(snpfile, 'chr', 'bp', 'p'),
+                pc_table.copy(), 'chr', 'bp', 'p', window_size=500)
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            expected = str(e)
+        for chunksize in [333, 100000]:
+            try:
+                snpassign.\
+                    assign_snps_to_genes_in_chunks(snpfile, pc_table.copy(),
+                                                   'chr', 'bp', 'p',
+                                                   window_size=500,
+                                                   chunksize=chunksize)
+                self.fail('Expected ValueError')
+            except ValueError as e:
+                self.assertEqual(str(e), expected)
+
+    def test_assign_snps_to_genes_matches_nbgwas(self):
+        pc_table, snp_table = self.get_random_tables()
+        # SNPs right on the window extended gene boundaries
+        edges = pd.DataFrame({'chr': pc_table['Chrom'].values,
+                              'bp': pc_table['End'].values + 100,
+                              'p': 0.001})
+        snp_table = pd.concat([snp_table, edges], ignore_index=True)
+        for window_size in [0, 100, 20000]:
+            snps = Snps(snp_table.copy(), pc_table.copy(),
+                        snp_chrom_col='chr', snp_bp_col='bp', pval_col='p')
+            expected = snps.assign_snps_to_genes(window_size=window_size,
+                                                 to_Gene=True).table
+            genes = snpassign.assign_snps_to_genes(snp_table.copy(),
+                                                   pc_table.copy(),
+                                                   'chr', 'bp', 'p',
+                                                   window_size=window_size)
+            pd.testing.assert_frame_equal(genes.table, expected)
+
+    def test_assign_snps_to_genes_from_bundle_matches_nbgwas(self):
+        pc_table, snp_table = self.get_random_tables()
+        snps = Snps(snp_table.copy(), pc_table.copy(), snp_chrom_col='chr',
+                    snp_bp_col='bp', pval_col='p')
+        expected = snps.assign_snps_to_genes(window_size=500,
+                                             to_Gene=True).table
+
+        snpfile = os.path.join(self._temp_dir, 'snp')
+        snp_table.to_csv(snpfile, sep=' ', index=False)
+        bundlefile = os.path.join(self._temp_dir, 'snp.bundle')
+        snpio.write_snp_level_summary_bundle(snpfile, bundlefile,
+                                             'chr', 'bp', 'p')
+        arrays, metadata = snpio.read_snp_level_summary_bundle(bundlefile)
+        for chunksize in [333, 100000]:
+            genes = snpassign.\
+                assign_snps_to_genes_from_bundle(arrays, metadata,
+                                                 pc_table.copy(),
+                                                 window_size=500,
+                                                 chunksize=chunksize)
+            pd.testing.assert_frame_equal(genes.table, expected)
+
+    def test_genemininumaccumulator(self):
+        pc_table = pd.DataFrame({'Chrom': ['1', '1', '2'],
+                                 'Start': [100, 150, 100],
+                                 'End': [200, 300, 200]},
+                                index=['A', 'B', 'C'])
+        acc = GeneMinimumAccumulator(pc_table, window_size=10)
+        self.assertEqual(acc.get_number_of_genes(), 0)
+        acc.add(['1', '1', '2'], np.array([95, 160, 50]),
+                np.array([0.5, 0.2, 0.1]))
+        acc.add(np.array(['1', '1']), np.array([305, 170]),
+                np.array([0.01, 0.2]))
+        self.assertEqual(acc.get_number_of_genes(), 2)
+        table = acc.get_genes().table.set_index(snpassign.GENE_COL)
+        self.assertEqual(table[snpassign.NSNPS_COL].to_dict(),
+                         {'A': 3, 'B': 3})
+        self.assertEqual(table[snpassign.PVALUE_COL].to_dict(),
+                         {'A': 0.2, 'B': 0.01})
+        self.assertEqual(table[snpassign.POSITION_COL].to_dict(),
+                         {'A': 160, 'B': 305})
+        self.assertEqual(table[snpassign.START_END_COL].to_dict(),
+                         {'A': '100-200', 'B': '150-300'})
+
+    def test_genemininumaccumulator_unknown_chromosome(self):
+        pc_table = pd.DataFrame({'Chrom': ['1'], 'Start': [100],
+                                 'End': [200]}, index=['A'])
+        acc = GeneMinimumAccumulator(pc_table)
+        try:
+            acc.add(['1', '5'], np.array([1, 2]), np.array([0.1, 0.2]))
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), 'pc_chrom_col column from pc is '
+                                     'expected to be a superset of '
+                                     'snp_chrom_col from snp!')
+
+    def test_genemininumaccumulator_missing_chromosome(self):
+        pc_table = pd.DataFrame({'Chrom': ['1'], 'Start': [100],
+                                 'End': [200]}, index=['A'])
+        acc = GeneMinimumAccumulator(pc_table)
+        try:
+            acc.add(np.array(['1', None], dtype=object), np.array([1, 2]),
+                    np.array([0.1, 0.2]))
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), 'snp_chrom_col column from snp has '
+                                     'missing values!')
+
+    def test_genemininumaccumulator_bad_protein_coding(self):
+        pc_table = pd.DataFrame({'Chrom': ['1'], 'Start': ['x'],
+                                 'End': [200]}, index=['A'])
+        try:
+            GeneMinimumAccumulator(pc_table)
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), 'Columns start and end from `pc` '
+                                     'cannot be coerced into int!')
+
+    def test_geneintervalindex_find_overlaps(self):
+        pc_table = pd.DataFrame({'Chrom': ['1', '1', '1', '1', '2'],
+                                 'Start': [100, 1000, 150, 500, 100],
+                                 'End': [200, 5000, 300, 500, 200]},
+                                index=['A', 'B', 'C', 'A', 'D'])
+        index = GeneIntervalIndex(ProteinCodingTable.
+                                  from_dataframe(pc_table),
+                                  window_size=10)
+        self.assertEqual(list(index.get_gene_names()), ['A', 'B', 'C', 'D'])
+        snps, genes = index.find_overlaps('1', np.array([89, 90, 160, 209,
+                                                         210, 495, 4000]))
+        self.assertEqual(list(zip(snps.tolist(), genes.tolist())),
+                         [(1, 0), (2, 0), (2, 2), (3, 0), (3, 2), (4, 2),
+                          (5, 0), (6, 1)])
+        snps, genes = index.find_overlaps('2', np.array([], dtype=np.int64))
+        self.assertEqual(len(snps), 0)
+        self.assertEqual(len(genes), 0)
+
+    def test_geneintervalindex_find_overlaps_in_blocks(self):
+        # long gene B makes every gene starting after it a candidate
+        # of SNPs before its end
+        rs = np.random.RandomState(3)
+        starts = np.concatenate(([0, 10], rs.randint(20, 100000, 200)))
+        ends = starts + np.concatenate(([90000, 5],
+                                        rs.randint(-5, 3000, 200)))
+        names = ['A', 'B'] + ['G' + str(i % 150) for i in range(200)]
+        pc_table = pd.DataFrame({'Chrom': '1', 'Start': starts,
+                                 'End': ends}, index=names)
+        index = GeneIntervalIndex(ProteinCodingTable.
+                                  from_dataframe(pc_table),
+                                  window_size=25)
+        codes = {name: code for code, name
+                 in enumerate(index.get_gene_names())}
+        bps = np.sort(rs.randint(-100, 110000, 500))
+        expected = set()
+        for snp, bp in enumerate(bps):
+            for name, start, end in zip(names, starts - 25, ends + 25):
+                if start <= bp < end:
+                    expected.add((snp, codes[name]))
+
+        for max_candidates in [1, 2, 50, snpassign.MAX_CANDIDATES]:
+            snps, genes = index.find_overlaps('1', bps,
+                                              max_candidates=max_candidates)
+            res = list(zip(snps.tolist(), genes.tolist()))
+            self.assertEqual(len(res), len(set(res)))
+            self.assertEqual(set(res), expected)
+
+    def test_geneintervalindex_no_genes_on_chromosome(self):
+        pc_table = pd.DataFrame({'Chrom': ['1'], 'Start': [100],
+                                 'End': [200]}, index=['A'])
+        index = GeneIntervalIndex(ProteinCodingTable.
+                                  from_dataframe(pc_table))
+        try:
+            index.find_overlaps('5', np.array([1]))
+            self.fail('Expected RuntimeError')
+        except RuntimeError as e:
+            self.assertEqual(str(e), 'No proteins found for this '
+                                     'chromosome!')
+
+    def test_assign_snps_to_genes_with_executor_matches_nbgwas(self):
+        pc_table, snp_table = self.get_random_tables()
+        snps = Snps(snp_table.copy(), pc_table.copy(), snp_chrom_col='chr',
+                    snp_bp_col='bp', pval_col='p')
+        expected = snps.assign_snps_to_genes(window_size=500,
+                                             to_Gene=True).table
+
+        snpfile = os.path.join(self._temp_dir, 'snp')
+        snp_table.to_csv(snpfile, sep=' ', index=False)
+        bundlefile = os.path.join(self._temp_dir, 'snp.bundle')
+        snpio.write_snp_level_summary_bundle(snpfile, bundlefile,
+                                             'chr', 'bp', 'p')
+        arrays, metadata = snpio.read_snp_level_summary_bundle(bundlefile)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            genes = snpassign.assign_snps_to_genes(snp_table.copy(),
+                                                   pc_table.copy(),
+                                                   'chr', 'bp', 'p',
+                                                   window_size=500,
+                                                   executor=executor)
+            pd.testing.assert_frame_equal(genes.table, expected)
+
+            genes = snpassign.\
+                assign_snps_to_genes_in_chunks(snpfile, pc_table.copy(),
+                                               'chr', 'bp', 'p',
+                                               window_size=500,
+                                               chunksize=777,
+                                               executor=executor)
+            pd.testing.assert_frame_equal(genes.table, expected)
+
+            for chunksize in [7, 100000]:
+                genes = snpassign.\
+                    assign_snps_to_genes_from_bundle(arrays, metadata,
+                                                     pc_table.copy(),
+                                                     window_size=500,
+                                                     chunksize=chunksize,
+                                                     executor=executor)
+                pd.testing.assert_frame_equal(genes.table, expected)
+
+    def test_genemininumaccumulator_add_chromosome_parts(self):
+        pc_table = pd.DataFrame({'Chrom': ['1', '2'],
+                                 'Start': [100, 100],
+                                 'End': [200, 200]},
+                                index=['A', 'A'])
+        acc = GeneMinimumAccumulator(pc_table)
+        # parts in any order give the SNP with the lowest pvalue,
+        # then chromosome, then row
+        acc.add_chromosome_parts([('2', np.array([150]), np.array([0.1]),
+                                   np.array([0])),
+                                  ('1', np.array([120, 130]),
+                                   np.array([0.1, 0.1]), np.array([9, 4])),
+                                  ('1', np.array([500]), np.array([0.01]),
+                                   np.array([2]))])
+        table = acc.get_genes().table
+        self.assertEqual(table[snpassign.NSNPS_COL].tolist(), [3])
+        self.assertEqual(table[snpassign.PVALUE_COL].tolist(), [0.1])
+        self.assertEqual(table[snpassign.POSITION_COL].tolist(), [130])
+        try:
+            acc.add_chromosome_parts([('3', np.array([1]), np.array([0.1]),
+                                       np.array([0]))])
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertTrue('superset' in str(e))
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `snpio` module."""
+
+import io
+import os
+import gzip
+import unittest
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from nbgwas_rest import snpio
+
+
+class TestSnpIO(unittest.TestCase):
+    """Tests for `snpio` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self._temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self._temp_dir)
+
+    def test_sniff_delimiter(self):
+        self.assertEqual(snpio.sniff_delimiter('a,b,c\n'), snpio.COMMA)
+        self.assertEqual(snpio.sniff_delimiter('a , b\tc\n'), snpio.COMMA)
+        self.assertEqual(snpio.sniff_delimiter('a b\tc\n'),
+                         snpio.WHITESPACE)
+        self.assertEqual(snpio.sniff_delimiter(''), snpio.WHITESPACE)
+
+    def test_parse_header(self):
+        self.assertEqual(snpio.parse_header('a,b,c\n'), ['a', 'b', 'c'])
+        self.assertEqual(snpio.parse_header(' a , b,c \n'), ['a', 'b', 'c'])
+        self.assertEqual(snpio.parse_header('  a b\t\tc\n'), ['a', 'b', 'c'])
+        self.assertEqual(snpio.parse_header('a b c\n',
+                                            delimiter=snpio.COMMA),
+                         ['a b c'])
+
+    def test_get_column_indices(self):
+        self.assertEqual(snpio.get_column_indices(['a', 'b', 'c'],
+                                                  ['c', 'a']), [2, 0])
+        try:
+            snpio.get_column_indices(['a', 'b'], ['b', 'x', 'y'])
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), 'Column(s) x, y not found in SNP level '
+                                     'summary header: a, b')
+
+    def test_read_snp_level_summary_whitespace(self):
+        snpfile = os.path.join(self._temp_dir, 'snp')
+        with open(snpfile, 'w') as f:
+            f.write('snpid chromosome basepair a1 pvalue\n'
+                    'rs1  1  742584  A  0.761033\n'
+                    '  rs2\t1\t744045\tG\t1e-300\n'
+                    '\n'
+                    'rs3 X 10 T 0.5\n')
+        res = snpio.read_snp_level_summary(snpfile, 'chromosome',
+                                           'basepair', 'pvalue')
+        self.assertEqual(sorted(res.columns),
+                         ['basepair', 'chromosome', 'pvalue'])
+        self.assertEqual(res['chromosome'].tolist(), ['1', '1', 'X'])
+        self.assertEqual(res['basepair'].dtype, np.int64)
+        self.assertEqual(res['basepair'].tolist(), [742584, 744045, 10])
+        self.assertEqual(res['pvalue'].dtype, np.float64)
+        self.assertEqual(res['pvalue'].tolist(), [0.761033, 1e-300, 0.5])
+
+    def test_get_read_csv_kwargs(self):
+        columns = ['snpid', 'chromosome', 'basepair', 'pvalue']
+        res = snpio.get_read_csv_kwargs(columns, snpio.WHITESPACE,
+                                        'chromosome', 'basepair', 'pvalue')
+        # delim_whitespace was removed in pandas 3
+        self.assertTrue('delim_whitespace' not in res)
+        self.assertEqual(res['sep'], snpio.WHITESPACE)
+        self.assertEqual(res['engine'], 'c')
+        self.assertEqual(res['usecols'], ['chromosome', 'basepair',
+                                          'pvalue'])
+
+        res = snpio.get_read_csv_kwargs(columns, snpio.COMMA,
+                                        'chromosome', 'basepair', 'pvalue')
+        self.assertEqual(res['sep'], snpio.COMMA)
+        self.assertTrue(res['skipinitialspace'])
+
+        try:
+            snpio.get_read_csv_kwargs(columns, snpio.COMMA,
+                                      'chr', 'basepair', 'pvalue')
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertTrue('chr' in str(e))
+
+    def test_read_snp_level_summary_comma(self):
+        snp = io.StringIO('chr,bp,p,other\n'
+                          '1,5,0.5,x\n'
+                          '2,6,0.25,y\n')
+        res = snpio.read_snp_level_summary(snp, 'chr', 'bp', 'p')
+        self.assertEqual(res['chr'].tolist(), ['1', '2'])
+        self.assertEqual(res['bp'].tolist(), [5, 6])
+        self.assertEqual(res['p'].tolist(), [0.5, 0.25])
+
+        # whitespace around commas
+        snp = io.StringIO('id , chr,bp , p\n'
+                          'x, 1 ,  5 , 0.5 \n'
+                          'y,X ,6,1e-8\n')
+        res = snpio.read_snp_level_summary(snp, 'chr', 'bp', 'p')
+        self.assertEqual(res['chr'].tolist(), ['1', 'X'])
+        self.assertEqual(res['bp'].tolist(), [5, 6])
+        self.assertEqual(res['p'].tolist(), [0.5, 1e-8])
+
+    def test_read_snp_level_summary_missing_column(self):
+        snp = io.StringIO('chr bp pval\n1 5 0.5\n')
+        try:
+            snpio.read_snp_level_summary(snp, 'chr', 'bp', 'p')
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), 'Column(s) p not found in SNP level '
+                                     'summary header: chr, bp, pval')
+
+    def test_read_snp_level_summary_bad_values(self):
+        snp = io.StringIO('chr bp p\n1 abc 0.5\n')
+        try:
+            snpio.read_snp_level_summary(snp, 'chr', 'bp', 'p')
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), 'Column bp of SNP level summary '
+                                     'cannot be coerced into int')
+
+        snp = io.StringIO('chr bp p\n1 5 .\n')
+        try:
+            snpio.read_snp_level_summary(snp, 'chr', 'bp', 'p')
+            self.fail('Expected ValueError')
+        except ValueError:
+            pass
+
+    def test_read_snp_level_summary_chunks(self):
+        snpfile = os.path.join(self._temp_dir, 'snp')
+        with open(snpfile, 'w') as f:
+            f.write('chr, bp ,p\n')
+            for i in range(10):
+                f.write(str(i % 3) + ' , ' + str(i) + ',0.' + str(i) + '\n')
+        chunks = list(snpio.read_snp_level_summary_chunks(snpfile, 'chr',
+                                                          'bp', 'p', 4))
+        self.assertEqual([len(c) for c in chunks], [4, 4, 2])
+        res = snpio.read_snp_level_summary(snpfile, 'chr', 'bp', 'p')
+        combined = pd.concat(chunks)
+        self.assertEqual(combined['chr'].tolist(), res['chr'].tolist())
+        self.assertEqual(combined['chr'].tolist()[:4], ['0', '1', '2', '0'])
+        self.assertEqual(combined['bp'].tolist(), list(range(10)))
+        self.assertEqual(combined['bp'].dtype, np.int64)
+        self.assertEqual(combined['p'].tolist(), res['p'].tolist())
+
+        try:
+            next(snpio.read_snp_level_summary_chunks(snpfile, 'chr', 'bp',
+                                                     'pval', 4))
+            self.fail('Expected ValueError')
+        except ValueError as e:
+            self.assertEqual(str(e), 'Column(s) pval not found in SNP level '
+                                     'summary header: chr, bp, p')
+
+    def test_read_snp_level_summary_gzip(self):
+        plainfile = os.path.join(self._temp_dir, 'snp')
+        with open(plainfile, 'w') as f:
+            f.write('chr bp p\n1 5 0.5\n2 6 0.25\n')
+        self.assertFalse(snpio.is_gzip_file(plainfile))
+
+        gzfile = os.path.join(self._temp_dir, 'snp.gz')
+        with gzip.open(gzfile, 'wt') as f:
+            f.write('chr bp p\n1 5 0.5\n2 6 0.25\n')
+        self.assertTrue(snpio.is_gzip_file(gzfile))
+        res = snpio.read_snp_level_summary(gzfile, 'chr', 'bp', 'p')
+        self.assertEqual(res['chr'].tolist(), ['1', '2'])
+        self.assertEqual(res['bp'].tolist(), [5, 6])
+        self.assertEqual(res['p'].tolist(), [0.5, 0.25])
+
+        # bgzip writes a series of gzip members
+        bgzfile = os.path.join(self._temp_dir, 'snp.bgz')
+        with open(bgzfile, 'wb') as f:
+            f.write(gzip.compress(b'chr,bp,p\n1,5,0.5\n'))
+            f.write(gzip.compress(b'2,6,0.25\n3,7,'))
+            f.write(gzip.compress(b'0.125\n'))
+        self.assertTrue(snpio.is_gzip_file(bgzfile))
+        res = snpio.read_snp_level_summary(bgzfile, 'chr', 'bp', 'p')
+        self.assertEqual(res['chr'].tolist(), ['1', '2', '3'])
+        self.assertEqual(res['bp'].tolist(), [5, 6, 7])
+        self.assertEqual(res['p'].tolist(), [0.5, 0.25, 0.125])
+
+        chunks = list(snpio.read_snp_level_summary_chunks(bgzfile, 'chr',
+                                                          'bp', 'p', 2))
+        self.assertEqual([len(c) for c in chunks], [2, 1])
+        self.assertEqual(pd.concat(chunks)['bp'].tolist(), [5, 6, 7])
+
+    def test_write_read_snp_level_summary_bundle(self):
+        snpfile = os.path.join(self._temp_dir, 'snp')
+        with open(snpfile, 'w') as f:
+            f.write('id,chr,bp,p\n'
+                    'a,X,5,0.5\n'
+                    'b,10,7,0.25\n'
+                    'c,2,9,0.125\n'
+                    'd,X,1,1e-8\n'
+                    'e,10,7,0.75\n'
+                    'f,2,3,1.0\n')
+        bundlefile = os.path.join(self._temp_dir, 'snp.bundle')
+        for chunksize in [1, 4, 100]:
+            res = snpio.write_snp_level_summary_bundle(snpfile, bundlefile,
+                                                       'chr', 'bp', 'p',
+                                                       chunksize=chunksize)
+            self.assertEqual(res, 6)
+            arrays, meta = snpio.read_snp_level_summary_bundle(bundlefile)
+            self.assertEqual(meta[snpio.CHROMOSOMES_KEY], ['10', '2', 'X'])
+            self.assertEqual(meta[snpio.COLUMNS_KEY], ['chr', 'bp', 'p'])
+
+            # sorted by chromosome then basepair keeping file order
+            # of SNPs at same position
+            self.assertEqual(arrays[snpio.CHROMOSOME_ARRAY].tolist(),
+                             [0, 0, 1, 1, 2, 2])
+            self.assertEqual(arrays[snpio.BASEPAIR_ARRAY].tolist(),
+                             [7, 7, 3, 9, 1, 5])
+            self.assertEqual(arrays[snpio.PVALUE_ARRAY].tolist(),
+                             [0.25, 0.75, 1.0, 0.125, 1e-8, 0.5])
+            self.assertEqual(arrays[snpio.ROW_ARRAY].tolist(),
+                             [1, 4, 5, 2, 3, 0])
+
+            res = snpio.get_snp_table_from_bundle(arrays, meta, 'c', 'b',
+                                                  'p')
+            expected = snpio.read_snp_level_summary(snpfile, 'chr', 'bp',
+                                                    'p')
+            expected.columns = ['c', 'b', 'p']
+            pd.testing.assert_frame_equal(res, expected)
+
+    def test_write_snp_level_summary_bundle_no_snps(self):
+        snpfile = os.path.join(self._temp_dir, 'snp')
+        with open(snpfile, 'w') as f:
+            f.write('chr bp p\n')
+        bundlefile = os.path.join(self._temp_dir, 'snp.bundle')
+        self.assertEqual(snpio.write_snp_level_summary_bundle(snpfile,
+                                                              bundlefile,
+                                                              'chr', 'bp',
+                                                              'p'), 0)
+        arrays, meta = snpio.read_snp_level_summary_bundle(bundlefile)
+        self.assertEqual(meta[snpio.CHROMOSOMES_KEY], [])
+        res = snpio.get_snp_table_from_bundle(arrays, meta, 'chr', 'bp', 'p')
+        self.assertEqual(len(res), 0)
+        self.assertEqual(list(res.columns), ['chr', 'bp', 'p'])
+
+    def test_write_snp_level_summary_bundle_bad_file(self):
+        snpfile = os.path.join(self._temp_dir, 'snp')
+        with open(snpfile, 'w') as f:
+            f.write('chr bp p\n1 abc 0.5\n')
+        bundlefile = os.path.join(self._temp_dir, 'snp.bundle')
+        try:
+            snpio.write_snp_level_summary_bundle(snpfile, bundlefile,
+                                                 'chr', 'bp', 'p')
+            self.fail('Expected ValueError')
+        except ValueError:
+            pass
+        self.assertFalse(os.path.exists(bundlefile))
+
+    def test_write_snp_level_summary_bundle_missing_values(self):
+        bundlefile = os.path.join(self._temp_dir, 'snp.bundle')
+        snpfile = os.path.join(self._temp_dir, 'snp')
+        for data, col in [('1,100,0.01\n,200,0.5\n2,300,0.1\n', 'chr'),
+                          ('1,100,0.01\n2,200,\n', 'p'),
+                          ('1,100,0.01\n2,NA,0.5\n', 'bp')]:
+            with open(snpfile, 'w') as f:
+                f.write('chr,bp,p\n' + data)
+            try:
+                snpio.write_snp_level_summary_bundle(snpfile, bundlefile,
+                                                     'chr', 'bp', 'p')
+                self.fail('Expected ValueError')
+            except ValueError as e:
+                self.assertTrue(col in str(e))
+            self.assertFalse(os.path.exists(bundlefile))